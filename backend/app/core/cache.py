@@ -0,0 +1,135 @@
+"""
+Cache dei risultati indirizzata per contenuto.
+
+Usa Redis (settings.REDIS_URL) quando raggiungibile; altrimenti ripiega su
+una LRU in memoria di dimensione limitata, così in sviluppo e nei test le
+funzionalità restano utilizzabili senza Redis. Se Redis non risponde la
+connessione viene ritentata dopo REDIS_RETRY_SECONDS, così un processo
+partito prima di Redis torna a condividere cache e metriche.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+
+
+def content_key(namespace: str, **parts: Any) -> str:
+    """Chiave deterministica: sha256 del JSON canonico delle parti"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+class LRUCache:
+    """LRU thread-safe con numero massimo di elementi e scadenza opzionale"""
+
+    def __init__(self, max_items: int = 1024):
+        self.max_items = max_items
+        self._data: "OrderedDict[str, Tuple[Optional[float], str]]" = OrderedDict()  # (scadenza, valore)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl_seconds: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + ttl_seconds if ttl_seconds is not None else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class ResultCache:
+    """Cache JSON con Redis e fallback LRU in processo"""
+
+    METRICS_KEY = "cache:metrics"
+    REDIS_RETRY_SECONDS = 30
+
+    def __init__(self, redis_url: Optional[str] = None, max_local_items: int = 1024):
+        self.redis_url = redis_url
+        self.local = LRUCache(max_local_items)
+        self._local_metrics: Counter = Counter()
+        self._metrics_lock = threading.Lock()
+        self._redis = None
+        self._redis_retry_at = 0.0  # monotonic: prossimo tentativo di connessione
+
+    def _get_redis(self):
+        # Connessione pigra: l'import del modulo non deve mai toccare la rete
+        if self._redis is None and self.redis_url and time.monotonic() >= self._redis_retry_at:
+            self._redis_retry_at = time.monotonic() + self.REDIS_RETRY_SECONDS
+            try:
+                import redis
+                client = redis.Redis.from_url(self.redis_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+                client.ping()
+                self._redis = client
+            except Exception as e:
+                print(f"⚠️  Redis cache non disponibile, uso LRU in memoria "
+                      f"(nuovo tentativo fra {self.REDIS_RETRY_SECONDS}s): {e}")
+        return self._redis
+
+    def get_json(self, key: str) -> Optional[Any]:
+        raw = None
+        client = self._get_redis()
+        if client is not None:
+            try:
+                raw = client.get(key)
+            except Exception:
+                raw = None
+        if raw is None:
+            raw = self.local.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    def set_json(self, key: str, value: Any, ttl_seconds: int) -> None:
+        raw = json.dumps(value, ensure_ascii=False)
+        self.local.set(key, raw, ttl_seconds)
+        client = self._get_redis()
+        if client is not None:
+            try:
+                client.set(key, raw, ex=ttl_seconds)
+            except Exception:
+                pass
+
+    # --- Metriche (hit/miss) ---
+
+    def incr(self, metric: str, amount: int = 1) -> None:
+        """Contatore locale; su Redis anche aggregato fra tutti i worker"""
+        with self._metrics_lock:
+            self._local_metrics[metric] += amount
+        client = self._get_redis()
+        if client is not None:
+            try:
+                client.hincrby(self.METRICS_KEY, metric, amount)
+            except Exception:
+                pass
+
+    def metrics(self) -> Dict[str, int]:
+        client = self._get_redis()
+        if client is not None:
+            try:
+                raw = client.hgetall(self.METRICS_KEY)
+                return {k.decode(): int(v) for k, v in raw.items()}
+            except Exception:
+                pass
+        with self._metrics_lock:
+            return dict(self._local_metrics)
+
+
+result_cache = ResultCache(settings.REDIS_URL)
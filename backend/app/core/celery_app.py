@@ -1,4 +1,5 @@
 from celery import Celery
+from celery.signals import task_postrun, worker_process_init, worker_process_shutdown
 from app.core.config import settings
 
 # Create Celery app - with fallback if Redis not available
@@ -10,6 +11,9 @@ try:
         include=[
             "app.services.ai",
             "app.services.notifications",
+            "app.services.email_outbox",
+            "app.services.notification_digest",
+            "app.services.blobs",
             "app.services.reports"
         ]
     )
@@ -35,14 +39,26 @@ celery_app.conf.update(
 
 # Beat schedule for periodic tasks
 celery_app.conf.beat_schedule = {
+    "dispatch-email-outbox": {
+        "task": "app.services.email_outbox.dispatch_email_outbox",
+        "schedule": float(settings.EMAIL_OUTBOX_POLL_SECONDS),
+    },
     "send-lesson-reminders": {
         "task": "app.services.notifications.send_lesson_reminders",
-        "schedule": 60.0 * 60,  # Every hour
+        "schedule": 60.0,  # legge solo i promemoria scaduti (lesson_reminders)
+    },
+    "send-notification-digests": {
+        "task": "app.services.notification_digest.send_notification_digests",
+        "schedule": float(settings.NOTIFICATION_DIGEST_POLL_SECONDS),
     },
     "generate-monthly-reports": {
         "task": "app.services.reports.generate_monthly_reports",
         "schedule": 60.0 * 60 * 24,  # Daily (will check if it's the 1st of month)
     },
+    "collect-unreferenced-blobs": {
+        "task": "app.services.blobs.collect_unreferenced_blobs",
+        "schedule": float(settings.BLOB_GC_INTERVAL_SECONDS),
+    },
     "cleanup-expired-files": {
         "task": "app.services.storage.cleanup_expired_files",
         "schedule": 60.0 * 60 * 24,  # Daily
@@ -54,4 +70,30 @@ celery_app.conf.task_routes = {
     "app.services.ai.*": {"queue": "ai_queue"},
     "app.services.reports.*": {"queue": "reports_queue"},
     "app.services.notifications.*": {"queue": "notifications_queue"},
+    "app.services.email_outbox.*": {"queue": "notifications_queue"},
+    "app.services.notification_digest.*": {"queue": "notifications_queue"},
 }
+
+
+@worker_process_init.connect
+def precompile_templates(**kwargs):
+    """Ogni processo del worker carica i template compilati (cache del bytecode) prima dei task"""
+    from app.core.templates import precompile_templates as precompile
+
+    precompile()
+
+
+@task_postrun.connect
+def flush_ai_usage_after_task(**kwargs):
+    """Le righe di ai_usage del task vengono scritte subito: nei figli prefork atexit non viene eseguito"""
+    from app.core.usage import usage_recorder
+
+    usage_recorder.flush()
+
+
+@worker_process_shutdown.connect
+def flush_ai_usage_on_shutdown(**kwargs):
+    """Ultime righe di ai_usage rimaste nel buffer del processo del worker"""
+    from app.core.usage import usage_recorder
+
+    usage_recorder.flush()
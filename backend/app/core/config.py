@@ -41,6 +41,22 @@ class Settings(BaseSettings):
     S3_BUCKET: str = "ai-tutor"
     S3_REGION: str = "us-east-1"
     S3_USE_SSL: bool = False
+    S3_MULTIPART_PART_SIZE: int = 8 * 1024 * 1024  # parti del multipart upload (minimo S3: 5MB)
+    STORAGE_BACKEND: str = ""  # "" = S3 se configurato, altrimenti filesystem; oppure s3 | minio | filesystem | memory
+    STORAGE_MAX_CONNECTIONS: int = 32  # pool HTTP del client e chiamate allo storage in parallelo
+    STORAGE_CONNECT_TIMEOUT: float = 5.0
+    STORAGE_READ_TIMEOUT: float = 60.0
+    # Upload: letti e inoltrati allo storage a blocchi, mai interi in memoria
+    MAX_UPLOAD_SIZE_BYTES: int = 10 * 1024 * 1024
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+    DOWNLOAD_CHUNK_SIZE: int = 256 * 1024  # blocchi inviati al client nei download
+    # Download: "proxy" (i byte passano dall'API) o "redirect" (302 a un URL prefirmato, solo S3/MinIO)
+    STORAGE_DOWNLOAD_MODE: str = "proxy"
+    PRESIGNED_URL_EXPIRES_SECONDS: int = 300
+    PRESIGNED_URL_REFRESH_MARGIN_SECONDS: int = 60  # un URL in cache si rigenera quando sta per scadere
+    # Blob deduplicati: quelli senza riferimenti vengono rimossi dopo BLOB_GC_GRACE_SECONDS
+    BLOB_GC_INTERVAL_SECONDS: int = 60 * 60
+    BLOB_GC_GRACE_SECONDS: int = 60 * 60
 
     # Email (opzionale per deployment iniziale)
     SMTP_HOST: str = ""
@@ -48,10 +64,65 @@ class Settings(BaseSettings):
     SMTP_USER: str = ""
     SMTP_PASSWORD: str = ""
     EMAIL_FROM: str = "noreply@aitutor.com"
+    SMTP_USE_TLS: bool = True
+    SMTP_TIMEOUT_SECONDS: int = 30
+    # Sessioni SMTP autenticate riusate tra gli invii
+    SMTP_POOL_SIZE: int = 4
+    SMTP_POOL_MAX_IDLE_SECONDS: int = 240  # oltre, la sessione si considera chiusa dal server
+    # Outbox: dispatcher periodico su notifications_queue
+    EMAIL_OUTBOX_POLL_SECONDS: int = 10
+    EMAIL_OUTBOX_BATCH_SIZE: int = 50
+    EMAIL_OUTBOX_MAX_BATCHES_PER_RUN: int = 20
+    EMAIL_OUTBOX_MAX_ATTEMPTS: int = 8
+    EMAIL_OUTBOX_RETRY_BASE_SECONDS: int = 60
+    EMAIL_OUTBOX_RETRY_MAX_SECONDS: int = 6 * 60 * 60
+    # Promemoria lezioni: anticipi (ore) programmati alla conferma, controllati ogni minuto
+    LESSON_REMINDER_HOURS_BEFORE: List[int] = [24, 1]
+    LESSON_REMINDER_BATCH_SIZE: int = 200
+    # Digest delle notifiche: un'email di riepilogo per destinatario per finestra
+    NOTIFICATION_DIGEST_WINDOW_MINUTES: int = 60
+    NOTIFICATION_DIGEST_DEFAULT_ROLES: List[str] = ["tutor"]  # digest attivo se l'utente non ha preferenze
+    NOTIFICATION_IMMEDIATE_KINDS: List[str] = ["lesson_reminder"]  # mai rimandate al digest
+    NOTIFICATION_DIGEST_POLL_SECONDS: int = 60
+    NOTIFICATION_DIGEST_BATCH_SIZE: int = 100  # destinatari per giro
+
+    # Template Jinja compilati: cache su disco condivisa tra i processi (vuoto: cartella temporanea)
+    TEMPLATE_BYTECODE_CACHE_DIR: str = ""
 
     # AI Services
+    LLM_PROVIDER: str = "openai"  # "openai" | "fake" (deterministico, per test e benchmark)
+    LLM_FAKE_LATENCY_SECONDS: float = 0.5
+    LLM_FAKE_TOKEN_INTERVAL_SECONDS: float = 0.0
+    LLM_FAKE_COMPLETION_TOKENS: int = 300
     OPENAI_API_KEY: str | None = None
     OPENAI_MODEL: str | None = None
+    OPENAI_TIMEOUT_SECONDS: float = 60.0
+    OPENAI_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    LLM_MAX_CONCURRENCY: int = 16  # chiamate simultanee per processo
+    LLM_MAX_CONCURRENCY_PER_TUTOR: int = 2
+    LLM_MAX_RETRIES: int = 3
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_TTL_SECONDS: int = 60 * 60 * 24 * 7  # 7 giorni
+    LLM_USAGE_ENABLED: bool = True  # righe in ai_usage per ogni chiamata
+    LLM_USAGE_BATCH_SIZE: int = 50
+    LLM_USAGE_FLUSH_SECONDS: float = 10.0
+    # USD per milione di token (input, output), per la stima dei costi in ai_usage
+    LLM_PRICES_PER_MILLION: dict = {
+        "gpt-4o-mini": [0.15, 0.60],
+        "gpt-4o": [2.50, 10.00],
+    }
+    NOTES_CHUNK_TOKENS: int = 3000  # oltre questa soglia la trascrizione passa dal map-reduce
+    NOTES_CHUNK_OVERLAP_TOKENS: int = 200
+    NOTES_MAP_CONCURRENCY: int = 4
+
+    # Report mensili: studenti per task su reports_queue
+    REPORTS_CHUNK_SIZE: int = 20
+    # Dopo quanto un report rimasto "generating" (worker morto) può essere ripreso
+    REPORTS_CLAIM_TIMEOUT_SECONDS: int = 1800
+
+    # Rendering PDF (WeasyPrint): processi del pool dedicato (0 = nel processo chiamante)
+    PDF_RENDER_WORKERS: int = 2
+    PDF_RENDER_TIMEOUT_SECONDS: int = 120
 
     # Agora Video SDK
     AGORA_APP_ID: str = "4d3c5454d08847ed9536332dad1b6759"
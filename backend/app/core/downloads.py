@@ -0,0 +1,213 @@
+"""
+Risposte di download dallo storage, a blocchi e con supporto a Range.
+
+Il contenuto non viene mai letto tutto in memoria: il corpo dello storage
+arriva al client in blocchi di DOWNLOAD_CHUNK_SIZE. Un header ``Range``
+(un solo intervallo) produce una risposta 206, così download interrotti e
+visualizzatori PDF chiedono solo i byte che servono; ``If-Range`` evita di
+unire pezzi di versioni diverse. Per FileSystemStorage il file viene servito
+da disco con FileResponse, o con l'estensione ASGI ``http.response.pathsend``
+(zero-copy) quando il server la supporta.
+
+Con STORAGE_DOWNLOAD_MODE="redirect" e uno storage che sa prefirmare (S3,
+MinIO) l'API autorizza la richiesta e risponde 302 verso un URL prefirmato
+di breve durata: i byte non passano più dall'applicazione. Gli URL restano
+in cache per oggetto finché non sono vicini alla scadenza.
+"""
+import calendar
+import os
+import time
+from email.utils import formatdate
+from typing import AsyncIterator, BinaryIO, Dict, Iterator, Optional, Tuple
+
+import anyio
+from fastapi import Request
+from fastapi.responses import FileResponse, RedirectResponse, Response, StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.storage import ObjectInfo, StorageInterface, run_storage, storage
+
+
+class RangeNotSatisfiable(Exception):
+    """Intervallo richiesto fuori dal file (risposta 416)"""
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Intervallo ``bytes=a-b`` come (inizio, fine) inclusi. None se l'header va
+    ignorato (più intervalli o sintassi non valida): si risponde con il file intero.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, separator, last = spec.strip().partition("-")
+    if not separator:
+        return None
+    try:
+        if not first:
+            suffix = int(last)  # bytes=-N: gli ultimi N byte
+            if suffix <= 0 or size == 0:
+                raise RangeNotSatisfiable()
+            return max(size - suffix, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def _http_date(info: ObjectInfo) -> Optional[str]:
+    if info.last_modified is None:
+        return None
+    return formatdate(calendar.timegm(info.last_modified.utctimetuple()), usegmt=True)
+
+
+def _range_applies(request: Request, info: ObjectInfo) -> bool:
+    """If-Range: l'intervallo vale solo se il file è ancora quello che il client ha già in parte"""
+    validator = request.headers.get("if-range")
+    if validator is None:
+        return True
+    return validator.strip() in (info.etag, _http_date(info))
+
+
+def _read_chunks(stream: BinaryIO, length: int) -> Iterator[bytes]:
+    try:
+        remaining = length
+        while remaining > 0:
+            chunk = stream.read(min(settings.DOWNLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        stream.close()
+        release = getattr(stream, "release_conn", None)  # risposta urllib3 di MinIO
+        if release:
+            release()
+
+
+async def _stream_chunks(stream: BinaryIO, length: int) -> AsyncIterator[bytes]:
+    """_read_chunks con ogni lettura sui thread dello storage (run_storage)"""
+    chunks = _read_chunks(stream, length)
+    try:
+        while True:
+            chunk = await run_storage(next, chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        await run_storage(chunks.close)
+
+
+class LocalFileResponse(FileResponse):
+    """FileResponse che usa http.response.pathsend (zero-copy) se il server ASGI lo supporta"""
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if "http.response.pathsend" not in scope.get("extensions", {}) or scope["method"].upper() == "HEAD":
+            await super().__call__(scope, receive, send)
+            return
+        if self.stat_result is None:
+            self.set_stat_headers(await anyio.to_thread.run_sync(os.stat, self.path))
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        await send({"type": "http.response.pathsend", "path": str(self.path)})
+        if self.background is not None:
+            await self.background()
+
+
+async def storage_response(
+    request: Request,
+    file_path: str,
+    media_type: str,
+    filename: str,
+    info: Optional[ObjectInfo] = None,
+    target: Optional[StorageInterface] = None,
+) -> Response:
+    """Risposta per un file dello storage: 200 intero, 206 parziale o 416"""
+    target = target or storage
+    info = info or await run_storage(target.stat, file_path)
+    headers: Dict[str, str] = {
+        "Accept-Ranges": "bytes",
+        "ETag": info.etag,
+        "Content-Disposition": f'attachment; filename="{filename}"',
+    }
+    if info.last_modified is not None:
+        headers["Last-Modified"] = _http_date(info)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if range_header and _range_applies(request, info):
+        try:
+            byte_range = parse_range(range_header, info.size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{info.size}"})
+
+    local_path = target.local_path(file_path)
+    if byte_range is None and local_path is not None:
+        return LocalFileResponse(local_path, media_type=media_type, headers=headers)
+
+    start, end = byte_range or (0, info.size - 1)
+    headers["Content-Length"] = str(end - start + 1)
+    if byte_range is not None:
+        headers["Content-Range"] = f"bytes {start}-{end}/{info.size}"
+    stream = await run_storage(target.download_range, file_path, start, end if byte_range else None)
+    return StreamingResponse(
+        _stream_chunks(stream, end - start + 1),
+        status_code=206 if byte_range is not None else 200,
+        media_type=media_type,
+        headers=headers,
+    )
+
+
+class PresignedURLCache:
+    """URL prefirmati per oggetto, riusati finché mancano più di PRESIGNED_URL_REFRESH_MARGIN_SECONDS alla scadenza"""
+
+    def __init__(self, max_items: int = 4096):
+        self._urls = LRUCache(max_items)  # valore: "<scadenza epoch> <url>"
+        self.generated = 0
+
+    def get(self, target: StorageInterface, file_path: str, filename: str, media_type: str) -> str:
+        key = f"{file_path}\n{filename}\n{media_type}"
+        now = time.time()
+        cached = self._urls.get(key)
+        if cached is not None:
+            expires_at, _, url = cached.partition(" ")
+            if float(expires_at) - settings.PRESIGNED_URL_REFRESH_MARGIN_SECONDS > now:
+                return url
+
+        expires_in = settings.PRESIGNED_URL_EXPIRES_SECONDS
+        url = target.get_presigned_url(file_path, expires_in, filename=filename, content_type=media_type)
+        self.generated += 1
+        self._urls.set(key, f"{now + expires_in:.0f} {url}")
+        return url
+
+    def clear(self) -> None:
+        self._urls.clear()
+
+
+presigned_urls = PresignedURLCache()
+
+
+async def download_response(
+    request: Request,
+    file_path: str,
+    media_type: str,
+    filename: str,
+    info: Optional[ObjectInfo] = None,
+    target: Optional[StorageInterface] = None,
+) -> Response:
+    """
+    Download di un file già autorizzato: 302 verso un URL prefirmato in modalità
+    redirect (se lo storage lo supporta), altrimenti i byte passano dall'API
+    """
+    target = target or storage
+    if settings.STORAGE_DOWNLOAD_MODE == "redirect" and target.supports_presigned_urls:
+        url = await run_storage(presigned_urls.get, target, file_path, filename, media_type)
+        # Il redirect non va messo in cache: l'URL scade e l'accesso va riverificato
+        return RedirectResponse(url, status_code=302, headers={"Cache-Control": "private, no-store"})
+    return await storage_response(request, file_path, media_type, filename, info=info, target=target)
@@ -1,56 +1,188 @@
-from typing import Dict, Any, Optional
+"""
+Invio delle email transazionali via SMTP.
+
+Le connessioni SMTP sono costose (TCP + STARTTLS + LOGIN): ``SMTPConnectionPool``
+ne tiene aperte fino a SMTP_POOL_SIZE, già autenticate, e le riusa tra un
+invio e l'altro. Una connessione rimasta inattiva viene verificata con NOOP
+prima dell'uso e sostituita se il server l'ha chiusa. ``send_many`` invia
+un gruppo di messaggi sulla stessa sessione.
+"""
+from typing import Callable, Dict, Any, Iterator, List, Optional
+from contextlib import contextmanager
+from dataclasses import dataclass
+import atexit
 import smtplib
+import threading
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from jinja2 import Environment, FileSystemLoader
 from app.core.config import settings
-import os
+from app.core.templates import render_email
+
+
+@dataclass
+class OutgoingEmail:
+    to: str
+    subject: str
+    html_content: str
+    text_content: Optional[str] = None
+    error: Optional[str] = None  # motivo dell'ultimo invio fallito (impostato da send_many)
+
+
+class PooledSMTP:
+    """Sessione presa in prestito dal pool; se il server la chiude si riconnette e riprova una volta"""
+
+    def __init__(self, pool: "SMTPConnectionPool", server: smtplib.SMTP):
+        self.pool = pool
+        self.server = server
+
+    def send_message(self, msg) -> None:
+        try:
+            self.server.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            self.server.close()
+            self.server = self.pool._open()
+            self.server.send_message(msg)
+
+
+class SMTPConnectionPool:
+    """Pool di sessioni SMTP autenticate, una per thread alla volta"""
+
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        max_idle_seconds: Optional[float] = None,
+        factory: Optional[Callable[[], smtplib.SMTP]] = None,
+    ):
+        self.size = size or settings.SMTP_POOL_SIZE
+        self.max_idle_seconds = settings.SMTP_POOL_MAX_IDLE_SECONDS if max_idle_seconds is None else max_idle_seconds
+        self._factory = factory or self._connect
+        self._idle: List[tuple] = []  # (connessione, istante di rilascio)
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=settings.SMTP_TIMEOUT_SECONDS)
+        if settings.SMTP_USE_TLS:
+            server.starttls()
+        if settings.SMTP_USER:
+            server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+        return server
+
+    def _open(self) -> smtplib.SMTP:
+        server = self._factory()
+        self.connections_opened += 1
+        return server
+
+    @staticmethod
+    def _close(server: smtplib.SMTP) -> None:
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    @staticmethod
+    def _is_alive(server: smtplib.SMTP) -> bool:
+        try:
+            return server.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _checkout(self) -> smtplib.SMTP:
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                server, released_at = self._idle.pop()
+            idle_for = time.monotonic() - released_at
+            if idle_for < 1:
+                return server  # appena rilasciata: il controllo costerebbe un round trip inutile
+            if idle_for <= self.max_idle_seconds and self._is_alive(server):
+                return server
+            self._close(server)  # scaduta o chiusa dal server
+        return self._open()
+
+    @contextmanager
+    def connection(self) -> Iterator[PooledSMTP]:
+        """Sessione in uso esclusivo; in caso di errore viene scartata invece che riusata"""
+        self._slots.acquire()
+        try:
+            lease = PooledSMTP(self, self._checkout())
+            try:
+                yield lease
+            except Exception:
+                self._close(lease.server)
+                raise
+            with self._lock:
+                self._idle.append((lease.server, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def close_all(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server, _ in idle:
+            self._close(server)
 
 
 class EmailService:
     """Email service for sending transactional emails"""
     
-    def __init__(self):
+    def __init__(self, pool: Optional[SMTPConnectionPool] = None):
         self.smtp_host = settings.SMTP_HOST
         self.smtp_port = settings.SMTP_PORT
         self.smtp_user = settings.SMTP_USER
         self.smtp_password = settings.SMTP_PASSWORD
         self.email_from = settings.EMAIL_FROM
+        self.pool = pool or SMTPConnectionPool()
+    
+    def _build_message(self, email: OutgoingEmail) -> MIMEMultipart:
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = email.subject
+        msg['From'] = self.email_from
+        msg['To'] = email.to
         
-        # Setup Jinja2 for email templates
-        template_dir = os.path.join(os.path.dirname(__file__), "..", "templates", "email")
-        self.jinja_env = Environment(loader=FileSystemLoader(template_dir))
+        if email.text_content:
+            msg.attach(MIMEText(email.text_content, 'plain'))
+        msg.attach(MIMEText(email.html_content, 'html'))
+        return msg
     
     def _send_email(self, to: str, subject: str, html_content: str, text_content: Optional[str] = None) -> bool:
         """Send email via SMTP"""
+        return self.send_many([OutgoingEmail(to, subject, html_content, text_content)])[0]
+    
+    def send_many(self, emails: List[OutgoingEmail]) -> List[bool]:
+        """
+        Invia i messaggi in sequenza sulla stessa sessione SMTP del pool.
+        Restituisce l'esito di ciascuno (il motivo di un fallimento finisce in
+        ``email.error``): un destinatario rifiutato non ferma gli altri.
+        """
+        results = [False] * len(emails)
+        if not emails:
+            return results
         try:
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = subject
-            msg['From'] = self.email_from
-            msg['To'] = to
-            
-            if text_content:
-                part1 = MIMEText(text_content, 'plain')
-                msg.attach(part1)
-            
-            part2 = MIMEText(html_content, 'html')
-            msg.attach(part2)
-            
-            with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.smtp_user, self.smtp_password)
-                server.send_message(msg)
-            
-            return True
+            with self.pool.connection() as server:
+                for i, email in enumerate(emails):
+                    try:
+                        server.send_message(self._build_message(email))
+                    except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                        print(f"Failed to send email to {email.to}: {e}")
+                        email.error = str(e)
+                        continue
+                    email.error = None
+                    results[i] = True
         except Exception as e:
             print(f"Failed to send email: {e}")
-            return False
+            for email, sent in zip(emails, results, strict=True):
+                if not sent:
+                    email.error = str(e)
+        return results
     
     def _render_template(self, template_name: str, context: Dict[str, Any]) -> str:
         """Render email template with context"""
         try:
-            template = self.jinja_env.get_template(template_name)
-            return template.render(**context)
+            return render_email(template_name, context)
         except Exception as e:
             print(f"Failed to render template {template_name}: {e}")
             return f"Error rendering template: {template_name}"
@@ -71,6 +203,10 @@ class EmailService:
     def send_lesson_confirmation(self, to: str, student_name: str, tutor_name: str, 
                                lesson_datetime: str, room_url: str) -> bool:
         """Send lesson confirmation email"""
+        return self.send_many([self.lesson_confirmation_email(to, student_name, tutor_name, lesson_datetime, room_url)])[0]
+    
+    def lesson_confirmation_email(self, to: str, student_name: str, tutor_name: str,
+                                  lesson_datetime: str, room_url: str) -> OutgoingEmail:
         context = {
             "student_name": student_name,
             "tutor_name": tutor_name,
@@ -82,11 +218,15 @@ class EmailService:
         html_content = self._render_template("lesson_confirmed.html", context)
         subject = f"Lezione confermata - {lesson_datetime}"
         
-        return self._send_email(to, subject, html_content)
+        return OutgoingEmail(to, subject, html_content)
     
     def send_lesson_reminder(self, to: str, student_name: str, tutor_name: str,
                            lesson_datetime: str, room_url: str, hours_before: int) -> bool:
         """Send lesson reminder email"""
+        return self.send_many([self.lesson_reminder_email(to, student_name, tutor_name, lesson_datetime, room_url, hours_before)])[0]
+    
+    def lesson_reminder_email(self, to: str, student_name: str, tutor_name: str,
+                              lesson_datetime: str, room_url: str, hours_before: int) -> OutgoingEmail:
         context = {
             "student_name": student_name,
             "tutor_name": tutor_name,
@@ -99,7 +239,7 @@ class EmailService:
         html_content = self._render_template("lesson_reminder.html", context)
         subject = f"Promemoria lezione tra {hours_before}h - {lesson_datetime}"
         
-        return self._send_email(to, subject, html_content)
+        return OutgoingEmail(to, subject, html_content)
     
     def send_payment_receipt(self, to: str, student_name: str, amount: float, 
                            currency: str, lesson_datetime: str) -> bool:
@@ -136,6 +276,10 @@ class EmailService:
     def send_assignment_notification(self, to: str, student_name: str, tutor_name: str,
                                    assignment_title: str, due_date: str) -> bool:
         """Send new assignment notification"""
+        return self.send_many([self.assignment_notification_email(to, student_name, tutor_name, assignment_title, due_date)])[0]
+    
+    def assignment_notification_email(self, to: str, student_name: str, tutor_name: str,
+                                      assignment_title: str, due_date: str) -> OutgoingEmail:
         context = {
             "student_name": student_name,
             "tutor_name": tutor_name,
@@ -147,8 +291,27 @@ class EmailService:
         html_content = self._render_template("assignment_notification.html", context)
         subject = f"Nuovo compito assegnato - {assignment_title}"
         
-        return self._send_email(to, subject, html_content)
+        return OutgoingEmail(to, subject, html_content)
+
+    def notification_digest_email(self, to: str, recipient_name: str,
+                                  items: List[Dict[str, Any]]) -> OutgoingEmail:
+        """Riepilogo di più notifiche in un'unica email; ``items`` contiene kind e contesto di ciascuna"""
+        sections: Dict[str, List[Dict[str, Any]]] = {}
+        for item in items:
+            sections.setdefault(item["kind"], []).append(item)
+        context = {
+            "recipient_name": recipient_name,
+            "items": items,
+            "sections": sections,
+            "platform_url": settings.FRONTEND_URL
+        }
+
+        html_content = self._render_template("notification_digest.html", context)
+        subject = f"Riepilogo notifiche - {len(items)} aggiornamenti"
+
+        return OutgoingEmail(to, subject, html_content)
 
 
 # Global email service instance
 email_service = EmailService()
+atexit.register(email_service.pool.close_all)
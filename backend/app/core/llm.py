@@ -0,0 +1,297 @@
+"""
+Client LLM condiviso.
+
+Il modello vero e proprio è un provider intercambiabile (settings.LLM_PROVIDER,
+vedi app/core/llm_providers.py): OpenAI in produzione, un fake deterministico
+per test e benchmark offline. Ogni chiamata ha un timeout, passa da un
+semaforo globale e da uno per tutor, e ritenta gli errori transitori del
+provider con backoff esponenziale e jitter.
+
+Le risposte passano da una cache indirizzata per contenuto (hash di modello,
+temperatura, max_tokens e messaggi system/user): Redis con fallback LRU in
+processo. ``cache=False`` salta la lettura (es. "rigenera") ma aggiorna la
+voce; ``cache_stats()`` riporta hit e miss.
+
+Ogni chiamata (anche i hit di cache) finisce nella tabella ai_usage con
+modello, token, durata, feature e tutor (vedi app/core/usage.py).
+
+I chiamanti sincroni (servizi, task Celery, endpoint `def`) usano
+``complete_sync``, che esegue la chiamata su un event loop dedicato in un
+thread di background invece di crearne uno nuovo a ogni richiesta.
+"""
+import asyncio
+import functools
+import random
+import threading
+import time
+import weakref
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from app.core.cache import ResultCache, content_key, result_cache
+from app.core.config import settings
+from app.core.llm_providers import LLMProvider, LLMResult, build_provider, estimate_tokens
+from app.core.usage import UsageRecorder, usage_recorder
+
+
+class LLMUnavailableError(RuntimeError):
+    """Provider LLM non configurato (es. OpenAI senza API key)"""
+
+
+class _LoopState:
+    """Semafori legati a un singolo event loop"""
+
+    def __init__(self):
+        self.global_limit = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+        # Riferimenti deboli: il semaforo di un tutor vive solo finché una sua chiamata
+        # lo tiene (in attesa o in corso); quando è inattivo sparisce e il dizionario non cresce
+        self.tutor_limits: "weakref.WeakValueDictionary[int, asyncio.Semaphore]" = weakref.WeakValueDictionary()
+
+    def tutor_limit(self, tutor_id: int) -> asyncio.Semaphore:
+        limit = self.tutor_limits.get(tutor_id)
+        if limit is None:
+            limit = self.tutor_limits[tutor_id] = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY_PER_TUTOR)
+        return limit
+
+
+class LLMClient:
+    def __init__(
+        self,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        cache: Optional[ResultCache] = None,
+        provider: Optional[LLMProvider] = None,
+        recorder: Optional[UsageRecorder] = None,
+    ):
+        # transport: solo per il provider OpenAI (MockTransport nei test)
+        self.provider = provider or build_provider(transport=transport)
+        self.cache = cache or result_cache
+        self.recorder = recorder or usage_recorder
+        self._states: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]" = weakref.WeakKeyDictionary()
+        self._background_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_enabled(self) -> bool:
+        return self.provider.is_enabled
+
+    def _state(self) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        state = self._states.get(loop)
+        if state is None:
+            state = self._states[loop] = _LoopState()
+        return state
+
+    async def complete(
+        self,
+        messages: List[Dict[str, str]],
+        *,
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        timeout: Optional[float] = None,
+        tutor_id: Optional[int] = None,
+        cache: bool = True,
+        feature: str = "other",
+    ) -> str:
+        """Completion chat; restituisce il testo della risposta"""
+        if not self.is_enabled:
+            raise LLMUnavailableError(f"Provider LLM '{self.provider.name}' non configurato")
+
+        started = time.perf_counter()
+        model = model or settings.OPENAI_MODEL or "gpt-4o-mini"
+        key = self._cache_key(model, temperature, max_tokens, messages)
+        cached = await self._cache_lookup(key, cache)
+        if cached is not None:
+            self._record(feature, model, tutor_id, LLMResult(cached), started, cache_hit=True)
+            return cached
+
+        state = self._state()
+        tutor_limit = state.tutor_limit(tutor_id) if tutor_id is not None else None
+
+        if tutor_limit is not None:
+            await tutor_limit.acquire()
+        try:
+            async with state.global_limit:
+                result = await self._with_retries(
+                    self.provider.complete, messages, model, temperature, max_tokens, timeout
+                )
+        finally:
+            if tutor_limit is not None:
+                tutor_limit.release()
+
+        self._record(feature, model, tutor_id, result, started, messages=messages)
+        await self._cache_store(key, result.text)
+        return result.text
+
+    async def stream(
+        self,
+        messages: List[Dict[str, str]],
+        *,
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        timeout: Optional[float] = None,
+        tutor_id: Optional[int] = None,
+        cache: bool = True,
+        feature: str = "other",
+    ) -> AsyncIterator[str]:
+        """
+        Completion in streaming: produce i frammenti di testo man mano che arrivano.
+
+        Si ritenta solo l'apertura dello stream. Se il consumatore smette di
+        iterare (es. client disconnesso), la risposta upstream viene chiusa.
+        Un hit di cache produce l'intero testo in un unico frammento; il
+        testo viene salvato in cache solo se lo stream arriva in fondo.
+        """
+        if not self.is_enabled:
+            raise LLMUnavailableError(f"Provider LLM '{self.provider.name}' non configurato")
+
+        started = time.perf_counter()
+        model = model or settings.OPENAI_MODEL or "gpt-4o-mini"
+        key = self._cache_key(model, temperature, max_tokens, messages)
+        cached = await self._cache_lookup(key, cache)
+        if cached is not None:
+            self._record(feature, model, tutor_id, LLMResult(cached), started, cache_hit=True)
+            yield cached
+            return
+
+        parts: List[str] = []
+        usage = LLMResult(text="")
+        state = self._state()
+        tutor_limit = state.tutor_limit(tutor_id) if tutor_id is not None else None
+
+        if tutor_limit is not None:
+            await tutor_limit.acquire()
+        try:
+            async with state.global_limit:
+                deltas = await self._with_retries(
+                    self.provider.open_stream, messages, model, temperature, max_tokens, timeout,
+                    usage=usage
+                )
+                try:
+                    async for delta in deltas:
+                        parts.append(delta)
+                        yield delta
+                finally:
+                    await deltas.aclose()
+                    # Anche uno stream interrotto consuma token: si registra comunque
+                    usage.text = "".join(parts)
+                    self._record(feature, model, tutor_id, usage, started, messages=messages)
+        finally:
+            if tutor_limit is not None:
+                tutor_limit.release()
+
+        await self._cache_store(key, "".join(parts).strip())
+
+    # --- Cache ---
+
+    @staticmethod
+    def _cache_key(model: str, temperature: float, max_tokens: int, messages: List[Dict[str, str]]) -> str:
+        return content_key(
+            "llm:completion",
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            system=[m["content"] for m in messages if m["role"] == "system"],
+            user=[m["content"] for m in messages if m["role"] != "system"],
+        )
+
+    async def _cache_lookup(self, key: str, use_cache: bool) -> Optional[str]:
+        if not settings.LLM_CACHE_ENABLED:
+            return None
+        if not use_cache:
+            await asyncio.to_thread(self.cache.incr, "llm.bypass")
+            return None
+        # Redis è sincrono: fuori dall'event loop
+        cached = await asyncio.to_thread(self.cache.get_json, key)
+        await asyncio.to_thread(self.cache.incr, "llm.hit" if cached is not None else "llm.miss")
+        return cached
+
+    async def _cache_store(self, key: str, text: str) -> None:
+        if settings.LLM_CACHE_ENABLED and text:
+            await asyncio.to_thread(self.cache.set_json, key, text, settings.LLM_CACHE_TTL_SECONDS)
+
+    def cache_stats(self) -> Dict[str, float]:
+        metrics = self.cache.metrics()
+        hits, misses = metrics.get("llm.hit", 0), metrics.get("llm.miss", 0)
+        return {
+            "hits": hits,
+            "misses": misses,
+            "bypassed": metrics.get("llm.bypass", 0),
+            "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        }
+
+    # --- Strumentazione ---
+
+    def _record(
+        self,
+        feature: str,
+        model: str,
+        tutor_id: Optional[int],
+        result: LLMResult,
+        started: float,
+        cache_hit: bool = False,
+        messages: Optional[List[Dict[str, str]]] = None,
+    ) -> None:
+        prompt_tokens, completion_tokens = result.prompt_tokens, result.completion_tokens
+        if not cache_hit and not completion_tokens:
+            # Il provider non ha riportato l'uso (es. stream senza chunk finale): stima
+            prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages or [])
+            completion_tokens = estimate_tokens(result.text) if result.text else 0
+        record = functools.partial(
+            self.recorder.record,
+            feature=feature,
+            model=model,
+            tutor_id=tutor_id,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            latency_ms=int((time.perf_counter() - started) * 1000),
+            cache_hit=cache_hit,
+        )
+        # Fuori dall'event loop e senza attendere: un flush su DB non rallenta la risposta
+        asyncio.get_running_loop().run_in_executor(None, record)
+
+    async def _with_retries(self, call, messages, model, temperature, max_tokens, timeout, **extra):
+        attempt = 0
+        while True:
+            try:
+                return await call(
+                    messages,
+                    model=model,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    timeout=timeout,
+                    **extra,
+                )
+            except self.provider.retryable_errors:
+                if attempt >= settings.LLM_MAX_RETRIES:
+                    raise
+                await asyncio.sleep(backoff_delay(attempt))
+                attempt += 1
+
+    # --- Ponte per chiamanti sincroni ---
+
+    def _get_background_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._background_loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="llm-loop", daemon=True)
+                thread.start()
+                self._background_loop = loop
+            return self._background_loop
+
+    def complete_sync(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """Versione bloccante di ``complete`` (da NON usare dentro un event loop)"""
+        future = asyncio.run_coroutine_threadsafe(
+            self.complete(messages, **kwargs), self._get_background_loop()
+        )
+        return future.result()
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 20.0) -> float:
+    """Full jitter: attesa casuale in [0, min(cap, base * 2^attempt)]"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+llm_client = LLMClient()
@@ -0,0 +1,217 @@
+"""
+Provider LLM intercambiabili, scelti con ``settings.LLM_PROVIDER``.
+
+- ``openai``: AsyncOpenAI, un client per event loop (connessioni riusate).
+- ``fake``: modello locale deterministico, senza rete né costi. Stesso
+  input -> stesso testo; latenza e numero di token configurabili
+  (LLM_FAKE_*), per misurare il throughput delle pipeline AI offline.
+
+``LLMClient`` (app/core/llm.py) resta l'unico punto d'accesso: cache,
+semafori e retry valgono per qualsiasi provider.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import weakref
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+from app.core.config import settings
+
+Messages = List[Dict[str, str]]
+
+
+@dataclass
+class LLMResult:
+    text: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+def estimate_tokens(text: str) -> int:
+    """Stima grezza (~4 caratteri per token) quando il provider non la fornisce"""
+    return len(text) // 4 + 1
+
+
+class LLMProvider(ABC):
+    """Interfaccia comune dei provider"""
+
+    name = "base"
+    # Errori transitori che LLMClient può ritentare
+    retryable_errors: Tuple[type, ...] = ()
+
+    @property
+    def is_enabled(self) -> bool:
+        return True
+
+    @abstractmethod
+    async def complete(
+        self, messages: Messages, *, model: str, temperature: float,
+        max_tokens: int, timeout: Optional[float]
+    ) -> LLMResult:
+        pass
+
+    @abstractmethod
+    async def open_stream(
+        self, messages: Messages, *, model: str, temperature: float,
+        max_tokens: int, timeout: Optional[float], usage: LLMResult
+    ) -> AsyncIterator[str]:
+        """
+        Apre lo stream (qui avvengono gli errori ritentabili) e ne restituisce i
+        frammenti; i conteggi di token, se noti, vanno in ``usage``.
+        """
+        pass
+
+
+class OpenAIProvider(LLMProvider):
+    name = "openai"
+    retryable_errors = (
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.RateLimitError,
+        openai.InternalServerError,
+    )
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self._transport = transport
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
+
+    @property
+    def is_enabled(self) -> bool:
+        return bool(settings.OPENAI_API_KEY)
+
+    def _client(self) -> AsyncOpenAI:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = self._clients[loop] = AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                max_retries=0,  # i retry li gestisce LLMClient, con jitter
+                timeout=httpx.Timeout(settings.OPENAI_TIMEOUT_SECONDS, connect=settings.OPENAI_CONNECT_TIMEOUT_SECONDS),
+                http_client=httpx.AsyncClient(
+                    transport=self._transport,
+                    limits=httpx.Limits(
+                        max_connections=settings.LLM_MAX_CONCURRENCY,
+                        max_keepalive_connections=settings.LLM_MAX_CONCURRENCY,
+                    )
+                ),
+            )
+        return client
+
+    async def complete(self, messages, *, model, temperature, max_tokens, timeout) -> LLMResult:
+        response = await self._client().chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=timeout,
+        )
+        usage = response.usage
+        return LLMResult(
+            text=(response.choices[0].message.content or "").strip(),
+            prompt_tokens=usage.prompt_tokens if usage else 0,
+            completion_tokens=usage.completion_tokens if usage else 0,
+        )
+
+    async def open_stream(self, messages, *, model, temperature, max_tokens, timeout, usage) -> AsyncIterator[str]:
+        response = await self._client().chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=timeout,
+            stream=True,
+            stream_options={"include_usage": True},  # ultimo chunk con i conteggi
+        )
+        return self._deltas(response, usage)
+
+    @staticmethod
+    async def _deltas(response, usage: LLMResult) -> AsyncIterator[str]:
+        try:
+            async for chunk in response:
+                if chunk.usage:
+                    usage.prompt_tokens = chunk.usage.prompt_tokens
+                    usage.completion_tokens = chunk.usage.completion_tokens
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await response.close()
+
+
+FAKE_VOCABULARY = (
+    "lezione", "concetto", "esempio", "formula", "esercizio", "definizione",
+    "studente", "metodo", "risultato", "teorema", "funzione", "grafico",
+    "equazione", "ripasso", "problema", "soluzione", "passaggio", "verifica",
+)
+
+
+class FakeProvider(LLMProvider):
+    """
+    Modello finto deterministico: il testo dipende solo da modello e messaggi.
+
+    ``latency`` è il tempo prima della risposta (o del primo token),
+    ``token_interval`` l'attesa tra un token e l'altro in streaming,
+    ``completion_tokens`` la lunghezza della risposta (limitata da max_tokens).
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        latency: Optional[float] = None,
+        token_interval: Optional[float] = None,
+        completion_tokens: Optional[int] = None,
+    ):
+        self.latency = settings.LLM_FAKE_LATENCY_SECONDS if latency is None else latency
+        self.token_interval = settings.LLM_FAKE_TOKEN_INTERVAL_SECONDS if token_interval is None else token_interval
+        self.completion_tokens = completion_tokens or settings.LLM_FAKE_COMPLETION_TOKENS
+
+    def _tokens(self, messages: Messages, model: str, max_tokens: int) -> List[str]:
+        seed = hashlib.sha256(
+            json.dumps([model, messages], sort_keys=True, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+        rng = random.Random(seed)
+        count = max(1, min(self.completion_tokens, max_tokens))
+        words = [rng.choice(FAKE_VOCABULARY) for _ in range(count - 1)]
+        return [f"[{seed[:8]}]"] + [f" {word}" for word in words]
+
+    async def complete(self, messages, *, model, temperature, max_tokens, timeout) -> LLMResult:
+        tokens = self._tokens(messages, model, max_tokens)
+        await asyncio.sleep(self.latency + self.token_interval * len(tokens))
+        return LLMResult(
+            text="".join(tokens),
+            prompt_tokens=sum(estimate_tokens(m["content"]) for m in messages),
+            completion_tokens=len(tokens),
+        )
+
+    async def open_stream(self, messages, *, model, temperature, max_tokens, timeout, usage) -> AsyncIterator[str]:
+        tokens = self._tokens(messages, model, max_tokens)
+        usage.prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+        usage.completion_tokens = len(tokens)
+        await asyncio.sleep(self.latency)
+        return self._deltas(tokens)
+
+    async def _deltas(self, tokens: List[str]) -> AsyncIterator[str]:
+        for i, token in enumerate(tokens):
+            if i and self.token_interval:
+                await asyncio.sleep(self.token_interval)
+            yield token
+
+
+def build_provider(
+    name: Optional[str] = None,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+) -> LLMProvider:
+    """Provider configurato in settings.LLM_PROVIDER (``openai`` | ``fake``)"""
+    name = (name or settings.LLM_PROVIDER).lower()
+    if name == "openai":
+        return OpenAIProvider(transport)
+    if name == "fake":
+        return FakeProvider()
+    raise ValueError(f"LLM_PROVIDER non supportato: {name}")
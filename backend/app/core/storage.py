@@ -1,13 +1,91 @@
+"""
+Storage dei file caricati (S3/MinIO o filesystem locale).
+
+Oltre a ``upload_file`` (contenuto già disponibile, es. PDF generati) ogni
+backend offre ``open_upload``: un ``UploadWriter`` che riceve il contenuto
+a blocchi, così gli upload degli utenti arrivano allo storage senza essere
+mai tenuti interi in memoria. S3 usa il multipart upload (un blocco di
+S3_MULTIPART_PART_SIZE alla volta), MinIO un ``put_object`` in streaming
+alimentato da una coda limitata, il filesystem scrive direttamente sul file.
+``stream_upload`` legge l'upload a blocchi, controlla il limite di
+dimensione mentre legge e calcola dimensione e SHA-256 al volo. Per i
+download ``stat`` e ``download_range`` permettono di servire intervalli di
+byte senza leggere l'oggetto intero (app.core.downloads).
+
+I client S3/MinIO sono sincroni: dagli endpoint async le chiamate passano da
+``run_storage``, che le esegue su un thread con al massimo
+STORAGE_MAX_CONNECTIONS chiamate insieme, quante sono le connessioni del
+pool HTTP del client; così nessun thread resta fermo ad aspettare una
+connessione libera e il threadpool di default resta agli endpoint sincroni.
+Lo storage condiviso nasce al primo uso (``get_storage``): l'import non apre
+connessioni. ``prepare`` viene chiamato una volta all'avvio (su MinIO crea il
+bucket se manca), ``check_ready`` è la verifica in sola lettura usata da
+/api/health/storage. ``InMemoryStorage`` serve a test e benchmark.
+"""
 from abc import ABC, abstractmethod
-from typing import BinaryIO, Optional
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Callable, Dict, Optional
 from minio import Minio
 from minio.error import S3Error
+import anyio
+import asyncio
 import boto3
+import certifi
+import urllib3
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from app.core.config import settings
+import functools
+import hashlib
+import io
+import queue
+import shutil
+import threading
 import uuid
 import os
-from datetime import timedelta
+import weakref
+from datetime import datetime, timedelta
+
+
+def _new_object_name(filename: str) -> str:
+    """Nome univoco dell'oggetto, con l'estensione del file originale"""
+    return f"{uuid.uuid4()}{os.path.splitext(filename)[1]}"
+
+
+class UploadTooLarge(Exception):
+    """Upload oltre il limite di dimensione: interrotto e scartato"""
+
+
+@dataclass
+class StoredUpload:
+    path: str
+    size: int
+    sha256: str
+
+
+@dataclass
+class ObjectInfo:
+    size: int
+    etag: str  # tra virgolette, pronto per l'header ETag
+    last_modified: Optional[datetime] = None  # UTC
+
+
+class UploadWriter(ABC):
+    """Nuovo oggetto scritto a blocchi: ``write`` ripetute, poi ``commit`` (o ``abort``)"""
+
+    @abstractmethod
+    def write(self, chunk: bytes) -> None:
+        pass
+
+    @abstractmethod
+    def commit(self) -> str:
+        """Completa l'oggetto e restituisce il path da salvare in File.stored_path"""
+        pass
+
+    @abstractmethod
+    def abort(self) -> None:
+        """Scarta quanto scritto finora"""
+        pass
 
 
 class StorageInterface(ABC):
@@ -18,11 +96,19 @@ class StorageInterface(ABC):
         """Upload file and return path"""
         pass
     
+    supports_presigned_urls = False  # URL prefirmati serviti direttamente dallo storage
+
     @abstractmethod
-    def get_presigned_url(self, file_path: str, expires_in: int = 3600) -> str:
-        """Get presigned URL for file access"""
+    def get_presigned_url(self, file_path: str, expires_in: int = 3600,
+                          filename: Optional[str] = None, content_type: Optional[str] = None) -> str:
+        """Get presigned URL for file access (filename/content_type override the download headers)"""
         pass
     
+    @abstractmethod
+    def open_upload(self, filename: str, content_type: str) -> UploadWriter:
+        """Start a chunked upload of a new file"""
+        pass
+
     @abstractmethod
     def delete_file(self, file_path: str) -> bool:
         """Delete file"""
@@ -33,26 +119,132 @@ class StorageInterface(ABC):
         """Download file as stream"""
         pass
 
+    @abstractmethod
+    def stat(self, file_path: str) -> ObjectInfo:
+        """Size, ETag and last modification of a stored file"""
+        pass
+
+    @abstractmethod
+    def download_range(self, file_path: str, start: int = 0, end: Optional[int] = None) -> BinaryIO:
+        """Stream of the bytes start..end (inclusive; end None means until the end of the file)"""
+        pass
+
+    def local_path(self, file_path: str) -> Optional[str]:
+        """Absolute path on local disk, if the backend has one (lets the server send the file directly)"""
+        return None
+
+    def check_ready(self) -> None:
+        """Raise if the backend cannot serve requests (read-only readiness check, may use the network)"""
+        return None
+
+    def prepare(self) -> None:
+        """One-time setup at application startup; raises like check_ready if the backend is not usable"""
+        self.check_ready()
+
+
+class _QueueReader:
+    """File-like per put_object: legge i blocchi messi in coda dal writer"""
+
+    def __init__(self, chunks: "queue.Queue"):
+        self._chunks = chunks
+        self._buffer = bytearray()
+        self._finished = False
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._finished and (size < 0 or len(self._buffer) < size):
+            chunk = self._chunks.get()
+            if chunk is None:
+                self._finished = True
+            elif isinstance(chunk, BaseException):
+                raise chunk  # upload annullato: put_object interrompe anche il multipart
+            else:
+                self._buffer += chunk
+        size = len(self._buffer) if size < 0 else size
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+
+class MinIOUploadWriter(UploadWriter):
+    """put_object in streaming su un thread; la coda limitata tiene costante la memoria"""
+
+    def __init__(self, client: Minio, object_name: str, content_type: str):
+        self.object_name = object_name
+        self._chunks: "queue.Queue" = queue.Queue(maxsize=4)
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, args=(client, content_type), daemon=True)
+        self._thread.start()
+
+    def _run(self, client: Minio, content_type: str) -> None:
+        try:
+            client.put_object(
+                bucket_name=settings.S3_BUCKET,
+                object_name=self.object_name,
+                data=_QueueReader(self._chunks),
+                length=-1,
+                part_size=settings.S3_MULTIPART_PART_SIZE,
+                content_type=content_type
+            )
+        except BaseException as e:
+            self._error = e
+
+    def _put(self, item) -> None:
+        # Se put_object è fallito nessuno svuota più la coda: non restare bloccati
+        while self._thread.is_alive():
+            try:
+                self._chunks.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def write(self, chunk: bytes) -> None:
+        self._put(chunk)
+        if self._error is not None:
+            raise Exception(f"Failed to upload file: {self._error}") from self._error
+
+    def commit(self) -> str:
+        self._put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise Exception(f"Failed to upload file: {self._error}") from self._error
+        return self.object_name
+
+    def abort(self) -> None:
+        self._put(Exception("upload annullato"))
+        self._thread.join()
+
 
 class MinIOStorage(StorageInterface):
     """MinIO storage implementation for development"""
+
+    supports_presigned_urls = True
     
     def __init__(self):
+        # Nessuna chiamata di rete qui: il bucket si crea in prepare, all'avvio
         self.client = Minio(
             settings.S3_ENDPOINT_URL.replace("http://", "").replace("https://", ""),
             access_key=settings.S3_ACCESS_KEY,
             secret_key=settings.S3_SECRET_KEY,
-            secure=settings.S3_USE_SSL
+            secure=settings.S3_USE_SSL,
+            region=settings.S3_REGION,  # evita la richiesta della regione prima di ogni firma
+            http_client=urllib3.PoolManager(
+                maxsize=settings.STORAGE_MAX_CONNECTIONS,
+                timeout=urllib3.Timeout(connect=settings.STORAGE_CONNECT_TIMEOUT, read=settings.STORAGE_READ_TIMEOUT),
+                retries=urllib3.Retry(total=3, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504]),
+                cert_reqs="CERT_REQUIRED",
+                ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where()
+            )
         )
-        self._ensure_bucket_exists()
     
-    def _ensure_bucket_exists(self):
-        """Ensure bucket exists"""
-        try:
-            if not self.client.bucket_exists(settings.S3_BUCKET):
-                self.client.make_bucket(settings.S3_BUCKET)
-        except S3Error as e:
-            print(f"Error creating bucket: {e}")
+    def check_ready(self) -> None:
+        """Bucket exists (read-only: a missing bucket is reported, not created)"""
+        if not self.client.bucket_exists(settings.S3_BUCKET):
+            raise Exception(f"Bucket {settings.S3_BUCKET} does not exist")
+
+    def prepare(self) -> None:
+        """Create the bucket if missing"""
+        if not self.client.bucket_exists(settings.S3_BUCKET):
+            self.client.make_bucket(settings.S3_BUCKET)
     
     def upload_file(self, file_data: BinaryIO, filename: str, content_type: str) -> str:
         """Upload file to MinIO"""
@@ -75,19 +267,30 @@ class MinIOStorage(StorageInterface):
             )
             return file_path
         except S3Error as e:
-            raise Exception(f"Failed to upload file: {e}")
+            raise Exception(f"Failed to upload file: {e}") from e
+
+    def open_upload(self, filename: str, content_type: str) -> UploadWriter:
+        """Chunked upload streamed into put_object"""
+        return MinIOUploadWriter(self.client, f"uploads/{_new_object_name(filename)}", content_type)
     
-    def get_presigned_url(self, file_path: str, expires_in: int = 3600) -> str:
+    def get_presigned_url(self, file_path: str, expires_in: int = 3600,
+                          filename: Optional[str] = None, content_type: Optional[str] = None) -> str:
         """Get presigned URL for file access"""
+        response_headers = {}
+        if filename:
+            response_headers["response-content-disposition"] = f'attachment; filename="{filename}"'
+        if content_type:
+            response_headers["response-content-type"] = content_type
         try:
             url = self.client.presigned_get_object(
                 bucket_name=settings.S3_BUCKET,
                 object_name=file_path,
-                expires=timedelta(seconds=expires_in)
+                expires=timedelta(seconds=expires_in),
+                response_headers=response_headers or None
             )
             return url
         except S3Error as e:
-            raise Exception(f"Failed to generate presigned URL: {e}")
+            raise Exception(f"Failed to generate presigned URL: {e}") from e
     
     def delete_file(self, file_path: str) -> bool:
         """Delete file from MinIO"""
@@ -104,20 +307,116 @@ class MinIOStorage(StorageInterface):
             response = self.client.get_object(settings.S3_BUCKET, file_path)
             return response
         except S3Error as e:
-            raise Exception(f"Failed to download file: {e}")
+            raise Exception(f"Failed to download file: {e}") from e
+
+    def stat(self, file_path: str) -> ObjectInfo:
+        """Object metadata from MinIO"""
+        try:
+            info = self.client.stat_object(settings.S3_BUCKET, file_path)
+        except S3Error as e:
+            raise Exception(f"Failed to read file metadata: {e}") from e
+        last_modified = info.last_modified.replace(tzinfo=None) if info.last_modified else None
+        return ObjectInfo(size=info.size, etag=f'"{info.etag.strip(chr(34))}"', last_modified=last_modified)
+
+    def download_range(self, file_path: str, start: int = 0, end: Optional[int] = None) -> BinaryIO:
+        """Download a byte range as stream"""
+        try:
+            length = 0 if end is None else end - start + 1  # 0: fino alla fine
+            return self.client.get_object(settings.S3_BUCKET, file_path, offset=start, length=length)
+        except S3Error as e:
+            raise Exception(f"Failed to download file: {e}") from e
+
+
+class S3MultipartUploadWriter(UploadWriter):
+    """
+    Multipart upload S3: i blocchi si accumulano fino a S3_MULTIPART_PART_SIZE
+    (minimo 5MB imposto da S3) e partono come parte. Un file più piccolo di una
+    parte va con un solo put_object, senza il costo del multipart.
+    """
+
+    def __init__(self, client, key: str, content_type: str, part_size: Optional[int] = None):
+        self.client = client
+        self.key = key
+        self.content_type = content_type
+        self.part_size = part_size or settings.S3_MULTIPART_PART_SIZE
+        self._buffer = bytearray()
+        self._upload_id: Optional[str] = None
+        self._parts = []
+
+    def _upload_part(self) -> None:
+        if self._upload_id is None:
+            self._upload_id = self.client.create_multipart_upload(
+                Bucket=settings.S3_BUCKET, Key=self.key, ContentType=self.content_type
+            )["UploadId"]
+        part_number = len(self._parts) + 1
+        response = self.client.upload_part(
+            Bucket=settings.S3_BUCKET, Key=self.key, UploadId=self._upload_id,
+            PartNumber=part_number, Body=bytes(self._buffer)
+        )
+        self._parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+        self._buffer.clear()
+
+    def write(self, chunk: bytes) -> None:
+        self._buffer += chunk
+        if len(self._buffer) >= self.part_size:
+            try:
+                self._upload_part()
+            except ClientError as e:
+                raise Exception(f"Failed to upload file: {e}") from e
+
+    def commit(self) -> str:
+        try:
+            if self._upload_id is None:
+                self.client.put_object(
+                    Bucket=settings.S3_BUCKET, Key=self.key, Body=bytes(self._buffer), ContentType=self.content_type
+                )
+                return self.key
+            if self._buffer:
+                self._upload_part()
+            self.client.complete_multipart_upload(
+                Bucket=settings.S3_BUCKET, Key=self.key, UploadId=self._upload_id,
+                MultipartUpload={"Parts": self._parts}
+            )
+            return self.key
+        except ClientError as e:
+            raise Exception(f"Failed to upload file: {e}") from e
+
+    def abort(self) -> None:
+        self._buffer.clear()
+        if self._upload_id is not None:
+            try:
+                self.client.abort_multipart_upload(Bucket=settings.S3_BUCKET, Key=self.key, UploadId=self._upload_id)
+            except ClientError as e:
+                print(f"Failed to abort multipart upload {self.key}: {e}")
 
 
 class S3Storage(StorageInterface):
     """AWS S3 storage implementation for production"""
+
+    supports_presigned_urls = True
     
     def __init__(self):
         self.client = boto3.client(
             's3',
-            endpoint_url=settings.S3_ENDPOINT_URL if settings.S3_ENDPOINT_URL != "https://s3.amazonaws.com" else None,
+            endpoint_url=settings.S3_ENDPOINT_URL if settings.S3_ENDPOINT_URL not in ("", "https://s3.amazonaws.com") else None,
             aws_access_key_id=settings.S3_ACCESS_KEY,
             aws_secret_access_key=settings.S3_SECRET_KEY,
-            region_name=settings.S3_REGION
+            region_name=settings.S3_REGION,
+            config=Config(
+                max_pool_connections=settings.STORAGE_MAX_CONNECTIONS,  # default botocore: 10
+                connect_timeout=settings.STORAGE_CONNECT_TIMEOUT,
+                read_timeout=settings.STORAGE_READ_TIMEOUT,
+                retries={'max_attempts': 3, 'mode': 'standard'},
+                tcp_keepalive=True
+            )
         )
+
+    def check_ready(self) -> None:
+        """Bucket reachable with the configured credentials (HEAD)"""
+        try:
+            self.client.head_bucket(Bucket=settings.S3_BUCKET)
+        except ClientError as e:
+            raise Exception(f"Bucket {settings.S3_BUCKET} not reachable: {e}") from e
     
     def upload_file(self, file_data: BinaryIO, filename: str, content_type: str) -> str:
         """Upload file to S3"""
@@ -136,19 +435,29 @@ class S3Storage(StorageInterface):
             )
             return file_path
         except ClientError as e:
-            raise Exception(f"Failed to upload file: {e}")
+            raise Exception(f"Failed to upload file: {e}") from e
+
+    def open_upload(self, filename: str, content_type: str) -> UploadWriter:
+        """Chunked upload through S3 multipart"""
+        return S3MultipartUploadWriter(self.client, f"uploads/{_new_object_name(filename)}", content_type)
     
-    def get_presigned_url(self, file_path: str, expires_in: int = 3600) -> str:
+    def get_presigned_url(self, file_path: str, expires_in: int = 3600,
+                          filename: Optional[str] = None, content_type: Optional[str] = None) -> str:
         """Get presigned URL for file access"""
+        params = {'Bucket': settings.S3_BUCKET, 'Key': file_path}
+        if filename:
+            params['ResponseContentDisposition'] = f'attachment; filename="{filename}"'
+        if content_type:
+            params['ResponseContentType'] = content_type
         try:
             url = self.client.generate_presigned_url(
                 'get_object',
-                Params={'Bucket': settings.S3_BUCKET, 'Key': file_path},
+                Params=params,
                 ExpiresIn=expires_in
             )
             return url
         except ClientError as e:
-            raise Exception(f"Failed to generate presigned URL: {e}")
+            raise Exception(f"Failed to generate presigned URL: {e}") from e
     
     def delete_file(self, file_path: str) -> bool:
         """Delete file from S3"""
@@ -165,14 +474,60 @@ class S3Storage(StorageInterface):
             response = self.client.get_object(Bucket=settings.S3_BUCKET, Key=file_path)
             return response['Body']
         except ClientError as e:
-            raise Exception(f"Failed to download file: {e}")
+            raise Exception(f"Failed to download file: {e}") from e
+
+    def stat(self, file_path: str) -> ObjectInfo:
+        """Object metadata from S3 (HEAD)"""
+        try:
+            response = self.client.head_object(Bucket=settings.S3_BUCKET, Key=file_path)
+        except ClientError as e:
+            raise Exception(f"Failed to read file metadata: {e}") from e
+        last_modified = response.get('LastModified')
+        return ObjectInfo(
+            size=response['ContentLength'],
+            etag=response['ETag'],
+            last_modified=last_modified.replace(tzinfo=None) if last_modified else None
+        )
+
+    def download_range(self, file_path: str, start: int = 0, end: Optional[int] = None) -> BinaryIO:
+        """Download a byte range as stream"""
+        params = {'Bucket': settings.S3_BUCKET, 'Key': file_path}
+        if start or end is not None:
+            params['Range'] = f"bytes={start}-{'' if end is None else end}"
+        try:
+            return self.client.get_object(**params)['Body']
+        except ClientError as e:
+            raise Exception(f"Failed to download file: {e}") from e
+
+
+class FileSystemUploadWriter(UploadWriter):
+    """Scrittura diretta sul file finale; abort lo rimuove"""
+
+    def __init__(self, base_path: str, object_name: str):
+        self.object_name = object_name
+        self.full_path = os.path.join(base_path, object_name)
+        self._file = open(self.full_path, "wb")
+
+    def write(self, chunk: bytes) -> None:
+        self._file.write(chunk)
+
+    def commit(self) -> str:
+        self._file.close()
+        return f"uploads/{self.object_name}"
+
+    def abort(self) -> None:
+        self._file.close()
+        try:
+            os.remove(self.full_path)
+        except OSError:
+            pass
 
 
 class FileSystemStorage(StorageInterface):
     """Local filesystem storage for development/testing"""
     
-    def __init__(self):
-        self.base_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "uploads")
+    def __init__(self, base_path: Optional[str] = None):
+        self.base_path = base_path or os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "uploads")
         os.makedirs(self.base_path, exist_ok=True)
     
     def upload_file(self, file_data: BinaryIO, filename: str, content_type: str) -> str:
@@ -182,32 +537,205 @@ class FileSystemStorage(StorageInterface):
         file_path = os.path.join(self.base_path, unique_filename)
         
         with open(file_path, "wb") as f:
-            f.write(file_data.read())
+            shutil.copyfileobj(file_data, f)
         
         return f"uploads/{unique_filename}"
+
+    def open_upload(self, filename: str, content_type: str) -> UploadWriter:
+        """Chunked upload written straight to disk"""
+        return FileSystemUploadWriter(self.base_path, _new_object_name(filename))
     
-    def get_presigned_url(self, file_path: str, expires_in: int = 3600) -> str:
+    def get_presigned_url(self, file_path: str, expires_in: int = 3600,
+                          filename: Optional[str] = None, content_type: Optional[str] = None) -> str:
         """Return local file path (no presigning needed)"""
         return f"/api/files/{file_path}"
     
     def delete_file(self, file_path: str) -> bool:
         """Delete file from filesystem"""
         try:
-            full_path = os.path.join(self.base_path, file_path.replace("uploads/", ""))
-            os.remove(full_path)
+            os.remove(self._full_path(file_path))
             return True
+        except FileNotFoundError:
+            return True  # già assente: come delete_object su S3
         except OSError:
             return False
     
     def download_stream(self, file_path: str) -> BinaryIO:
         """Download file as stream"""
-        full_path = os.path.join(self.base_path, file_path.replace("uploads/", ""))
-        return open(full_path, "rb")
+        return open(self._full_path(file_path), "rb")
+
+    def stat(self, file_path: str) -> ObjectInfo:
+        """File metadata from the filesystem"""
+        result = os.stat(self._full_path(file_path))
+        return ObjectInfo(
+            size=result.st_size,
+            etag=f'"{int(result.st_mtime_ns):x}-{result.st_size:x}"',
+            last_modified=datetime.utcfromtimestamp(result.st_mtime)
+        )
+
+    def download_range(self, file_path: str, start: int = 0, end: Optional[int] = None) -> BinaryIO:
+        """Open the file positioned at start (the caller stops reading at end)"""
+        stream = open(self._full_path(file_path), "rb")
+        stream.seek(start)
+        return stream
+
+    def _full_path(self, file_path: str) -> str:
+        return os.path.abspath(os.path.join(self.base_path, file_path.replace("uploads/", "")))
+
+    def local_path(self, file_path: str) -> Optional[str]:
+        return self._full_path(file_path)
+
+    def check_ready(self) -> None:
+        """Upload directory present and writable"""
+        if not os.access(self.base_path, os.W_OK):
+            raise Exception(f"Upload directory {self.base_path} is not writable")
+
+
+class InMemoryUploadWriter(UploadWriter):
+    """Blocchi accumulati in memoria e pubblicati al commit"""
+
+    def __init__(self, target: "InMemoryStorage", object_name: str, content_type: str):
+        self.target = target
+        self.object_name = object_name
+        self.content_type = content_type
+        self._buffer = io.BytesIO()
+
+    def write(self, chunk: bytes) -> None:
+        self._buffer.write(chunk)
+
+    def commit(self) -> str:
+        self.target._put(self.object_name, self._buffer.getvalue(), self.content_type)
+        return self.object_name
+
+    def abort(self) -> None:
+        self._buffer = io.BytesIO()
+
+
+class InMemoryStorage(StorageInterface):
+    """
+    Storage nel processo, per test e benchmark. ``latency`` (secondi) simula
+    il tempo di rete di ogni chiamata, per misurare l'effetto dell'offload.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self._objects: Dict[str, tuple] = {}  # path -> (contenuto, content type, ultima modifica)
+        self._lock = threading.Lock()
+
+    def _wait(self) -> None:
+        if self.latency:
+            threading.Event().wait(self.latency)
+
+    def _put(self, file_path: str, content: bytes, content_type: str) -> None:
+        self._wait()
+        with self._lock:
+            self._objects[file_path] = (content, content_type, datetime.utcnow().replace(microsecond=0))
+
+    def _get(self, file_path: str) -> tuple:
+        self._wait()
+        with self._lock:
+            try:
+                return self._objects[file_path]
+            except KeyError:
+                # Come FileSystemStorage, che apre un file inesistente
+                raise FileNotFoundError(f"Failed to download file: {file_path} not found") from None
+
+    def upload_file(self, file_data: BinaryIO, filename: str, content_type: str) -> str:
+        """Store file in memory"""
+        file_data.seek(0)
+        file_path = f"uploads/{_new_object_name(filename)}"
+        self._put(file_path, file_data.read(), content_type)
+        return file_path
+
+    def open_upload(self, filename: str, content_type: str) -> UploadWriter:
+        """Chunked upload collected in memory"""
+        return InMemoryUploadWriter(self, f"uploads/{_new_object_name(filename)}", content_type)
+
+    def get_presigned_url(self, file_path: str, expires_in: int = 3600,
+                          filename: Optional[str] = None, content_type: Optional[str] = None) -> str:
+        """Return API path (no presigning needed)"""
+        return f"/api/files/{file_path}"
+
+    def delete_file(self, file_path: str) -> bool:
+        """Delete file from memory"""
+        self._wait()
+        with self._lock:
+            self._objects.pop(file_path, None)
+        return True
+
+    def download_stream(self, file_path: str) -> BinaryIO:
+        """Download file as stream"""
+        return io.BytesIO(self._get(file_path)[0])
+
+    def stat(self, file_path: str) -> ObjectInfo:
+        """Object metadata"""
+        content, _, last_modified = self._get(file_path)
+        return ObjectInfo(size=len(content), etag=f'"{hashlib.md5(content).hexdigest()}"', last_modified=last_modified)
+
+    def download_range(self, file_path: str, start: int = 0, end: Optional[int] = None) -> BinaryIO:
+        """Download a byte range as stream"""
+        content = self._get(file_path)[0]
+        return io.BytesIO(content[start:None if end is None else end + 1])
+
+
+# --- Chiamate allo storage dagli endpoint async ---
+
+_limiters: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def _storage_limiter() -> anyio.CapacityLimiter:
+    loop = asyncio.get_running_loop()
+    limiter = _limiters.get(loop)
+    if limiter is None:
+        limiter = _limiters[loop] = anyio.CapacityLimiter(settings.STORAGE_MAX_CONNECTIONS)
+    return limiter
+
+
+async def run_storage(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Esegue una chiamata bloccante allo storage su un thread, al massimo STORAGE_MAX_CONNECTIONS insieme"""
+    return await anyio.to_thread.run_sync(functools.partial(func, *args, **kwargs), limiter=_storage_limiter())
+
+
+async def stream_upload(
+    source,
+    filename: str,
+    content_type: str,
+    max_bytes: Optional[int] = None,
+    target: Optional[StorageInterface] = None,
+) -> StoredUpload:
+    """
+    Copia ``source`` (un oggetto con ``async read(n)``, es. UploadFile) nello
+    storage a blocchi di UPLOAD_CHUNK_SIZE. Dimensione e SHA-256 si calcolano
+    durante la copia; oltre ``max_bytes`` l'upload viene annullato e si solleva
+    UploadTooLarge. La memoria usata non dipende dalla dimensione del file.
+    """
+    target = target or storage
+    max_bytes = max_bytes or settings.MAX_UPLOAD_SIZE_BYTES
+    writer = await run_storage(target.open_upload, filename, content_type)
+    size, digest = 0, hashlib.sha256()
+    try:
+        while True:
+            chunk = await source.read(settings.UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f"Il file supera il limite di {max_bytes} byte")
+            digest.update(chunk)
+            await run_storage(writer.write, chunk)
+        path = await run_storage(writer.commit)
+    except BaseException:
+        await run_storage(writer.abort)
+        raise
+    return StoredUpload(path=path, size=size, sha256=digest.hexdigest())
 
 
 # Storage factory
-def get_storage() -> StorageInterface:
+def create_storage() -> StorageInterface:
     """Get storage implementation based on environment"""
+    backends = {"s3": S3Storage, "minio": MinIOStorage, "filesystem": FileSystemStorage, "memory": InMemoryStorage}
+    if settings.STORAGE_BACKEND:
+        return backends[settings.STORAGE_BACKEND]()
     # Use S3 only if credentials are configured
     if settings.S3_ENDPOINT_URL and settings.S3_ACCESS_KEY and settings.S3_SECRET_KEY:
         return S3Storage()
@@ -216,5 +744,26 @@ def get_storage() -> StorageInterface:
         return FileSystemStorage()
 
 
+_storage: Optional[StorageInterface] = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> StorageInterface:
+    """Storage del processo, creato al primo uso (client e pool di connessioni condivisi)"""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = create_storage()
+    return _storage
+
+
+class _SharedStorage:
+    """Rimanda a get_storage(): chi importa ``storage`` non crea il client all'import"""
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(get_storage(), name)
+
+
 # Global storage instance
-storage = get_storage()
+storage: StorageInterface = _SharedStorage()  # type: ignore[assignment]
@@ -0,0 +1,157 @@
+"""
+Rendering condiviso dei template Jinja (backend/templates).
+
+Due ambienti per processo, creati una volta sola: i documenti PDF
+(templates/) e le email (templates/email). Entrambi usano autoescape per
+l'HTML, niente controllo dei file a ogni richiesta (auto_reload=False) e
+una ``FileSystemBytecodeCache`` su disco, così un processo nuovo (worker
+Celery, processo del pool PDF, riavvio dell'API) carica i template già
+compilati invece di ricompilarli. ``precompile_templates`` li compila
+tutti all'avvio.
+
+Molti client di posta ignorano il blocco <style>: il loader delle email
+applica le regole semplici di base.html (tag e .classe) come attributi
+style direttamente sul sorgente dei template. La trasformazione avviene
+una volta, prima della compilazione, quindi i layout con lo stile già
+inline restano nella cache e il rendering non costa nulla in più.
+"""
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from jinja2 import BaseLoader, Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
+
+from app.core.config import settings
+
+TEMPLATE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "templates"))
+EMAIL_TEMPLATE_DIR = os.path.join(TEMPLATE_DIR, "email")
+EMAIL_LAYOUT = "base.html"
+
+_STYLE_BLOCK = re.compile(r"<style[^>]*>(.*?)</style>", re.S)
+_CSS_RULE = re.compile(r"([^{}]+)\{([^{}]*)\}")
+_SIMPLE_SELECTOR = re.compile(r"\.?[A-Za-z][\w-]*")
+_START_TAG = re.compile(r"<([A-Za-z][A-Za-z0-9]*)(\s[^<>]*?)?(/?)>")
+_CLASS_ATTR = re.compile(r'\sclass="([^"]*)"')
+_STYLE_ATTR = re.compile(r'\sstyle="([^"]*)"')
+
+
+def layout_styles(layout_source: str) -> Dict[str, str]:
+    """Regole del layout applicabili inline: selettore (tag o .classe) -> dichiarazioni"""
+    rules: Dict[str, str] = {}
+    for block in _STYLE_BLOCK.findall(layout_source):
+        for selector, body in _CSS_RULE.findall(block):
+            selector = selector.strip()
+            # :hover, discendenti e simili non si possono esprimere inline: restano nello <style>
+            if not _SIMPLE_SELECTOR.fullmatch(selector):
+                continue
+            declarations = [" ".join(d.split()).replace('"', "'") for d in body.split(";") if d.strip()]
+            rules[selector] = "; ".join(filter(None, [rules.get(selector)] + declarations))
+    return rules
+
+
+def inline_styles(source: str, rules: Dict[str, str]) -> str:
+    """Aggiunge ai tag l'attributo style delle regole che li riguardano (lo stile già inline vince)"""
+
+    def apply(match: "re.Match") -> str:
+        tag, attrs, closing = match.group(1), match.group(2) or "", match.group(3)
+        styles = [rules[tag.lower()]] if tag.lower() in rules else []
+        class_attr = _CLASS_ATTR.search(attrs)
+        if class_attr:
+            styles += [rules[f".{name}"] for name in class_attr.group(1).split() if f".{name}" in rules]
+        if not styles:
+            return match.group(0)
+        style_attr = _STYLE_ATTR.search(attrs)
+        if style_attr:
+            styles.append(style_attr.group(1).strip().rstrip(";"))
+            attrs = attrs[:style_attr.start()] + attrs[style_attr.end():]
+        return f'<{tag}{attrs} style="{"; ".join(styles)}"{closing}>'
+
+    return _START_TAG.sub(apply, source)
+
+
+class InlinedEmailLoader(FileSystemLoader):
+    """Loader delle email: restituisce il sorgente con lo stile di base.html già inline"""
+
+    def __init__(self, searchpath: str = EMAIL_TEMPLATE_DIR, layout: str = EMAIL_LAYOUT):
+        super().__init__(searchpath)
+        self.layout = layout
+        self._rules: Optional[Dict[str, str]] = None
+
+    def layout_rules(self, environment: Environment) -> Dict[str, str]:
+        if self._rules is None:
+            source, _, _ = super().get_source(environment, self.layout)
+            self._rules = layout_styles(source)
+        return self._rules
+
+    def get_source(self, environment: Environment, template: str):
+        source, filename, uptodate = super().get_source(environment, template)
+        return inline_styles(source, self.layout_rules(environment)), filename, uptodate
+
+
+def create_env(loader: BaseLoader, bytecode_cache: Optional[FileSystemBytecodeCache] = None) -> Environment:
+    return Environment(
+        loader=loader,
+        autoescape=select_autoescape(["html"]),
+        auto_reload=False,  # niente stat del file a ogni get_template
+        bytecode_cache=bytecode_cache,
+        cache_size=-1,  # tutti i template restano compilati in memoria
+    )
+
+
+def bytecode_cache(directory: Optional[str] = None) -> FileSystemBytecodeCache:
+    directory = directory or settings.TEMPLATE_BYTECODE_CACHE_DIR or os.path.join(
+        tempfile.gettempdir(), "tutoring-jinja-bytecode"
+    )
+    os.makedirs(directory, exist_ok=True)
+    return FileSystemBytecodeCache(directory)
+
+
+# --- Ambienti del processo ---
+
+_envs: Dict[str, Environment] = {}
+_lock = threading.Lock()
+
+
+def _shared_env(name: str) -> Environment:
+    env = _envs.get(name)
+    if env is None:
+        with _lock:
+            env = _envs.get(name)
+            if env is None:
+                loader = InlinedEmailLoader() if name == "email" else FileSystemLoader(TEMPLATE_DIR)
+                env = _envs[name] = create_env(loader, bytecode_cache())
+    return env
+
+
+def document_env() -> Environment:
+    """Template dei documenti PDF (templates/)"""
+    return _shared_env("document")
+
+
+def email_env() -> Environment:
+    """Template delle email (templates/email), con lo stile del layout inline"""
+    return _shared_env("email")
+
+
+def render_document(template_name: str, context: Dict[str, Any]) -> str:
+    return document_env().get_template(template_name).render(**context)
+
+
+def render_email(template_name: str, context: Dict[str, Any]) -> str:
+    return email_env().get_template(template_name).render(**context)
+
+
+def precompile_templates() -> Dict[str, float]:
+    """Compila (o carica dalla cache su disco) tutti i template HTML di entrambi gli ambienti"""
+    started = time.perf_counter()
+    count = 0
+    for env in (document_env(), email_env()):
+        for name in env.list_templates(extensions=["html"]):
+            if env is document_env() and name.startswith("email/"):
+                continue  # le email passano dal loader con lo stile inline
+            env.get_template(name)
+            count += 1
+    return {"templates": count, "seconds": time.perf_counter() - started}
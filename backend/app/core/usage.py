@@ -0,0 +1,102 @@
+"""
+Registro dell'uso dei modelli AI (token, latenza, cache) nella tabella ai_usage.
+
+Le righe si accumulano in memoria e vengono scritte con un solo INSERT
+multiplo quando il buffer raggiunge LLM_USAGE_BATCH_SIZE o è passato
+LLM_USAGE_FLUSH_SECONDS dall'ultima scrittura; il resto viene scritto
+all'uscita del processo (API) o alla fine di ogni task e alla chiusura del
+processo del worker Celery (app/core/celery_app.py), dove atexit non gira.
+Un errore di scrittura non deve mai far fallire la chiamata AI: le righe
+vengono scartate con un avviso.
+"""
+import atexit
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+
+class UsageRecorder:
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        batch_size: Optional[int] = None,
+        flush_seconds: Optional[float] = None,
+    ):
+        self._session_factory = session_factory
+        self.batch_size = batch_size or settings.LLM_USAGE_BATCH_SIZE
+        self.flush_seconds = settings.LLM_USAGE_FLUSH_SECONDS if flush_seconds is None else flush_seconds
+        self._buffer: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def record(
+        self,
+        *,
+        feature: str,
+        model: str,
+        tutor_id: Optional[int],
+        prompt_tokens: int,
+        completion_tokens: int,
+        latency_ms: int,
+        cache_hit: bool,
+    ) -> None:
+        if not settings.LLM_USAGE_ENABLED:
+            return
+        with self._lock:
+            self._buffer.append({
+                "created_at": datetime.utcnow(),
+                "feature": feature[:32],
+                "model": model[:64],
+                "tutor_id": tutor_id,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "latency_ms": latency_ms,
+                "cache_hit": cache_hit,
+            })
+            due = (
+                len(self._buffer) >= self.batch_size
+                or time.monotonic() - self._last_flush >= self.flush_seconds
+            )
+        if due:
+            self.flush()
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._buffer)
+
+    def flush(self) -> int:
+        """Scrive le righe in attesa; restituisce quante ne ha scritte"""
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+        if not rows:
+            return 0
+
+        from app.models.ai_usage import AIUsage
+
+        if self._session_factory is None:
+            from app.core.db import SessionLocal
+            self._session_factory = SessionLocal
+
+        db = self._session_factory()
+        try:
+            db.execute(insert(AIUsage), rows)
+            db.commit()
+            return len(rows)
+        except Exception as e:
+            db.rollback()
+            print(f"⚠️  Impossibile salvare {len(rows)} righe di ai_usage: {e}")
+            return 0
+        finally:
+            db.close()
+
+
+usage_recorder = UsageRecorder()
+atexit.register(usage_recorder.flush)
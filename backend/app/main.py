@@ -5,7 +5,7 @@ from fastapi.responses import JSONResponse
 from app.core.config import settings
 from app.routers import (
     auth, users, lessons, availability, payments, assignments, files, feedback, reports, 
-    tutor, parent, admin, health, video, cleanup
+    tutor, parent, admin, health, video, cleanup, search
 )
 import logging
 import os
@@ -77,6 +77,36 @@ async def run_migrations():
         # Non blocchiamo l'avvio dell'app se le migrazioni falliscono
 
 
+@app.on_event("startup")
+def precompile_templates():
+    """Compila i template email e PDF prima del primo rendering"""
+    from app.core.templates import precompile_templates as precompile
+
+    stats = precompile()
+    logger.info(f"🧩 {stats['templates']} template compilati in {stats['seconds'] * 1000:.0f} ms")
+
+
+@app.on_event("startup")
+def prepare_storage():
+    """Prepara lo storage una volta all'avvio (su MinIO crea il bucket se manca)"""
+    from app.core.storage import get_storage
+
+    try:
+        get_storage().prepare()
+        logger.info("🗄️ Storage pronto")
+    except Exception as e:
+        # Non blocca l'avvio: /api/health/storage continuerà a segnalarlo
+        logger.error(f"❌ Storage non pronto: {e}")
+
+
+@app.on_event("shutdown")
+def flush_ai_usage():
+    """Scrive le ultime righe di ai_usage rimaste nel buffer"""
+    from app.core.usage import usage_recorder
+
+    usage_recorder.flush()
+
+
 # CORS middleware - Configurazione aggiornata
 # CORS middleware - Configurazione da variabili d'ambiente
 # CORS middleware - Usa variabile d'ambiente
@@ -146,6 +176,7 @@ app.include_router(tutor.router, prefix="/api/tutor", tags=["tutor"])
 app.include_router(parent.router, prefix="/api/parent", tags=["parent"])
 app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
 app.include_router(video.router, prefix="/api/video", tags=["video"])
+app.include_router(search.router, prefix="/api/search", tags=["search"])
 app.include_router(cleanup.router, tags=["cleanup"])
 
 # Root endpoint  
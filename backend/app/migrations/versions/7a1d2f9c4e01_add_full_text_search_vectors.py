@@ -0,0 +1,64 @@
+"""Add full-text search vectors to lessons and assignments
+
+Revision ID: 7a1d2f9c4e01
+Revises: 333b78b976da
+Create Date: 2026-10-19 09:12:44.318502
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a1d2f9c4e01'
+down_revision: Union[str, None] = '333b78b976da'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Colonne generate (STORED): Postgres le ricalcola a ogni INSERT/UPDATE,
+# quindi l'indice resta allineato senza trigger né codice applicativo.
+LESSONS_VECTOR = (
+    "setweight(to_tsvector('italian', coalesce(subject, '')), 'A') || "
+    "setweight(to_tsvector('italian', coalesce(notes_text, '')), 'B')"
+)
+ASSIGNMENTS_VECTOR = (
+    "setweight(to_tsvector('italian', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('italian', coalesce(description, '')), 'B') || "
+    "setweight(to_tsvector('italian', coalesce(instructions, '')), 'C')"
+)
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        # SQLite (test): la ricerca usa l'indice invertito in memoria
+        return
+
+    op.execute(
+        f"ALTER TABLE lessons ADD COLUMN search_vector tsvector "
+        f"GENERATED ALWAYS AS ({LESSONS_VECTOR}) STORED"
+    )
+    op.create_index(
+        'ix_lessons_search_vector', 'lessons', ['search_vector'],
+        unique=False, postgresql_using='gin'
+    )
+
+    op.execute(
+        f"ALTER TABLE assignments ADD COLUMN search_vector tsvector "
+        f"GENERATED ALWAYS AS ({ASSIGNMENTS_VECTOR}) STORED"
+    )
+    op.create_index(
+        'ix_assignments_search_vector', 'assignments', ['search_vector'],
+        unique=False, postgresql_using='gin'
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.drop_index('ix_assignments_search_vector', table_name='assignments')
+    op.drop_column('assignments', 'search_vector')
+    op.drop_index('ix_lessons_search_vector', table_name='lessons')
+    op.drop_column('lessons', 'search_vector')
@@ -0,0 +1,53 @@
+"""Add notification preferences and pending digest notifications
+
+Revision ID: a8d3e6f1c2b4
+Revises: f2c6a9d4b1e3
+Create Date: 2026-10-22 10:41:07.215318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8d3e6f1c2b4'
+down_revision: Union[str, None] = 'f2c6a9d4b1e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('notification_preferences',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('digest_enabled', sa.Boolean(), nullable=False),
+    sa.Column('digest_window_minutes', sa.Integer(), nullable=True),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id')
+    )
+    op.create_index(op.f('ix_notification_preferences_id'), 'notification_preferences', ['id'], unique=False)
+    op.create_table('pending_notifications',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=50), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('deliver_after', sa.DateTime(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_pending_notifications_deliver_after', 'pending_notifications', ['deliver_after'], unique=False)
+    op.create_index('ix_pending_notifications_user_id', 'pending_notifications', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_pending_notifications_user_id', table_name='pending_notifications')
+    op.drop_index('ix_pending_notifications_deliver_after', table_name='pending_notifications')
+    op.drop_table('pending_notifications')
+    op.drop_index(op.f('ix_notification_preferences_id'), table_name='notification_preferences')
+    op.drop_table('notification_preferences')
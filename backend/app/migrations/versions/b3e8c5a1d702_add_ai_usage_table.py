@@ -0,0 +1,39 @@
+"""Add ai_usage table for AI call instrumentation
+
+Revision ID: b3e8c5a1d702
+Revises: 7a1d2f9c4e01
+Create Date: 2026-10-19 15:40:12.904113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e8c5a1d702'
+down_revision: Union[str, None] = '7a1d2f9c4e01'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('ai_usage',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('feature', sa.String(length=32), nullable=False),
+    sa.Column('model', sa.String(length=64), nullable=False),
+    sa.Column('tutor_id', sa.Integer(), nullable=True),
+    sa.Column('prompt_tokens', sa.Integer(), nullable=False),
+    sa.Column('completion_tokens', sa.Integer(), nullable=False),
+    sa.Column('latency_ms', sa.Integer(), nullable=False),
+    sa.Column('cache_hit', sa.Boolean(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_ai_usage_created_at_feature', 'ai_usage', ['created_at', 'feature'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ai_usage_created_at_feature', table_name='ai_usage')
+    op.drop_table('ai_usage')
@@ -0,0 +1,27 @@
+"""Add files.checksum_sha256
+
+Revision ID: b3f7c1d9e4a6
+Revises: a8d3e6f1c2b4
+Create Date: 2026-10-22 16:20:44.930217
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f7c1d9e4a6'
+down_revision: Union[str, None] = 'a8d3e6f1c2b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Nullable: i file caricati prima di questa revisione non hanno checksum
+    op.add_column('files', sa.Column('checksum_sha256', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('files', 'checksum_sha256')
@@ -0,0 +1,61 @@
+"""Add blobs table for content-deduplicated file storage
+
+Revision ID: c4e8a2f6d1b7
+Revises: b3f7c1d9e4a6
+Create Date: 2026-10-23 09:12:36.584120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e8a2f6d1b7'
+down_revision: Union[str, None] = 'b3f7c1d9e4a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('blobs',
+    sa.Column('sha256', sa.String(length=64), nullable=True),
+    sa.Column('stored_path', sa.String(length=500), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('unreferenced_since', sa.DateTime(), nullable=True),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('sha256'),
+    sa.UniqueConstraint('stored_path')
+    )
+    op.create_index(op.f('ix_blobs_id'), 'blobs', ['id'], unique=False)
+    op.create_index(op.f('ix_blobs_unreferenced_since'), 'blobs', ['unreferenced_since'], unique=False)
+    op.add_column('files', sa.Column('blob_id', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_files_blob_id'), 'files', ['blob_id'], unique=False)
+    op.create_foreign_key('fk_files_blob_id_blobs', 'files', 'blobs', ['blob_id'], ['id'])
+
+    # Un blob per ogni oggetto già presente. Il checksum resta vuoto: lo calcola
+    # scripts/backfill_blob_checksums.py, che unisce anche i contenuti duplicati
+    op.execute("""
+        INSERT INTO blobs (sha256, stored_path, size, ref_count, created_at, updated_at)
+        SELECT NULL, stored_path, MAX(file_size), COUNT(*), MIN(created_at), MIN(created_at)
+        FROM files
+        GROUP BY stored_path
+    """)
+    op.execute("""
+        UPDATE files
+        SET blob_id = (SELECT blobs.id FROM blobs WHERE blobs.stored_path = files.stored_path)
+    """)
+
+
+def downgrade() -> None:
+    op.drop_constraint('fk_files_blob_id_blobs', 'files', type_='foreignkey')
+    op.drop_index(op.f('ix_files_blob_id'), table_name='files')
+    op.drop_column('files', 'blob_id')
+    op.drop_index(op.f('ix_blobs_unreferenced_since'), table_name='blobs')
+    op.drop_index(op.f('ix_blobs_id'), table_name='blobs')
+    op.drop_table('blobs')
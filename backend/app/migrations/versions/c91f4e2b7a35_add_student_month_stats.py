@@ -0,0 +1,110 @@
+"""Add student_month_stats aggregate table
+
+La tabella viene popolata dallo storico già qui (lezioni completate,
+feedback, compiti valutati), perché i report mensili leggono i contatori
+da student_month_stats: vuota, ogni report mostrerebbe zero lezioni.
+scripts/rebuild_student_month_stats.py resta per correggere una deriva.
+
+Revision ID: c91f4e2b7a35
+Revises: b3e8c5a1d702
+Create Date: 2026-10-20 10:05:37.118240
+
+"""
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Sequence, Union
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c91f4e2b7a35'
+down_revision: Union[str, None] = 'b3e8c5a1d702'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('student_month_stats',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('student_id', sa.Integer(), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Integer(), nullable=False),
+    sa.Column('lessons_completed', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('minutes', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('subjects', sa.Text(), nullable=False, server_default='{}'),
+    sa.Column('rating_sum', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('rating_count', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('assignments_graded', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('grade_sum', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['student_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('student_id', 'year', 'month', name='uq_student_month_stats_student_period')
+    )
+    _backfill()
+
+
+def _backfill() -> None:
+    """Stessi conteggi di StudentMonthStatsService.rebuild, con tabelle minime (niente modelli ORM)"""
+    lessons = sa.table('lessons',
+        sa.column('id', sa.Integer), sa.column('student_id', sa.Integer), sa.column('subject', sa.String),
+        sa.column('status', sa.String), sa.column('start_at', sa.DateTime), sa.column('end_at', sa.DateTime))
+    feedback = sa.table('feedback', sa.column('lesson_id', sa.Integer), sa.column('rating', sa.Integer))
+    submissions = sa.table('assignment_submissions',
+        sa.column('student_id', sa.Integer), sa.column('status', sa.String),
+        sa.column('grade', sa.Integer), sa.column('graded_at', sa.DateTime))
+    stats = sa.table('student_month_stats',
+        sa.column('student_id', sa.Integer), sa.column('year', sa.Integer), sa.column('month', sa.Integer),
+        sa.column('lessons_completed', sa.Integer), sa.column('minutes', sa.Integer), sa.column('subjects', sa.Text),
+        sa.column('rating_sum', sa.Integer), sa.column('rating_count', sa.Integer),
+        sa.column('assignments_graded', sa.Integer), sa.column('grade_sum', sa.Integer),
+        sa.column('updated_at', sa.DateTime))
+
+    bind = op.get_bind()
+    rows = defaultdict(lambda: {
+        'lessons_completed': 0, 'minutes': 0, 'subjects': Counter(),
+        'rating_sum': 0, 'rating_count': 0, 'assignments_graded': 0, 'grade_sum': 0
+    })
+
+    for student_id, subject, start_at, end_at in bind.execute(
+        sa.select(lessons.c.student_id, lessons.c.subject, lessons.c.start_at, lessons.c.end_at)
+        .where(lessons.c.status == 'completed')
+    ):
+        row = rows[(student_id, start_at.year, start_at.month)]
+        row['lessons_completed'] += 1
+        row['minutes'] += int((end_at - start_at).total_seconds() / 60) if end_at else 0
+        row['subjects'][subject] += 1
+
+    for student_id, status, grade, graded_at in bind.execute(
+        sa.select(submissions.c.student_id, submissions.c.status, submissions.c.grade, submissions.c.graded_at)
+        .where(submissions.c.graded_at.isnot(None))
+    ):
+        row = rows[(student_id, graded_at.year, graded_at.month)]
+        if status == 'graded' and grade is not None:
+            row['assignments_graded'] += 1
+            row['grade_sum'] += grade
+
+    # Voti solo per i mesi già presenti, come rebuild_all
+    for student_id, start_at, rating in bind.execute(
+        sa.select(lessons.c.student_id, lessons.c.start_at, feedback.c.rating)
+        .select_from(feedback.join(lessons, lessons.c.id == feedback.c.lesson_id))
+    ):
+        key = (student_id, start_at.year, start_at.month)
+        if key in rows:
+            rows[key]['rating_sum'] += rating
+            rows[key]['rating_count'] += 1
+
+    if rows:
+        now = datetime.utcnow()
+        bind.execute(stats.insert(), [
+            {**row, 'student_id': student_id, 'year': year, 'month': month, 'updated_at': now,
+             'subjects': json.dumps(row['subjects'], ensure_ascii=False, sort_keys=True)}
+            for (student_id, year, month), row in sorted(rows.items())
+        ])
+
+
+def downgrade() -> None:
+    op.drop_table('student_month_stats')
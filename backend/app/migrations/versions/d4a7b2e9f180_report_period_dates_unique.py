@@ -0,0 +1,70 @@
+"""Store report periods as dates, unique per student and period
+
+Revision ID: d4a7b2e9f180
+Revises: c91f4e2b7a35
+Create Date: 2026-10-20 15:41:09.527713
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a7b2e9f180'
+down_revision: Union[str, None] = 'c91f4e2b7a35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Duplicati creati dal vecchio check-then-insert: per ogni studente e mese si
+# tiene il report pubblicato (o il più recente) e si eliminano gli altri.
+DEDUPLICATE = """
+DELETE FROM reports WHERE id IN (
+    SELECT id FROM (
+        SELECT id, ROW_NUMBER() OVER (
+            PARTITION BY student_id, {period_start}
+            ORDER BY CASE WHEN status = 'published' THEN 0 ELSE 1 END, id DESC
+        ) AS position
+        FROM reports
+    ) ranked
+    WHERE position > 1
+)
+"""
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(DEDUPLICATE.format(period_start="date_trunc('month', period_start)"))
+        op.alter_column('reports', 'period_start', type_=sa.Date(),
+                        postgresql_using="date_trunc('month', period_start)::date")
+        # Fine periodo ricalcolata: ultimo giorno reale del mese (anche febbraio)
+        op.alter_column('reports', 'period_end', type_=sa.Date(),
+                        postgresql_using="(date_trunc('month', period_start) + interval '1 month - 1 day')::date")
+        op.create_unique_constraint('uq_reports_student_period_start', 'reports', ['student_id', 'period_start'])
+        op.create_index('ix_reports_period_start_status', 'reports', ['period_start', 'status'], unique=False)
+        return
+
+    # SQLite (test): la tabella viene ricreata da batch_alter_table
+    op.execute(DEDUPLICATE.format(period_start="strftime('%Y-%m', period_start)"))
+    with op.batch_alter_table('reports') as batch_op:
+        batch_op.alter_column('period_start', type_=sa.Date())
+        batch_op.alter_column('period_end', type_=sa.Date())
+        batch_op.create_unique_constraint('uq_reports_student_period_start', ['student_id', 'period_start'])
+        batch_op.create_index('ix_reports_period_start_status', ['period_start', 'status'], unique=False)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_reports_period_start_status', table_name='reports')
+        op.drop_constraint('uq_reports_student_period_start', 'reports', type_='unique')
+        op.alter_column('reports', 'period_end', type_=sa.DateTime(), postgresql_using='period_end::timestamp')
+        op.alter_column('reports', 'period_start', type_=sa.DateTime(), postgresql_using='period_start::timestamp')
+        return
+
+    with op.batch_alter_table('reports') as batch_op:
+        batch_op.drop_index('ix_reports_period_start_status')
+        batch_op.drop_constraint('uq_reports_student_period_start', type_='unique')
+        batch_op.alter_column('period_end', type_=sa.DateTime())
+        batch_op.alter_column('period_start', type_=sa.DateTime())
@@ -0,0 +1,41 @@
+"""Add monthly_report_runs
+
+Revision ID: d7b2e5a9c3f4
+Revises: c4e8a2f6d1b7
+Create Date: 2026-10-24 11:05:18.402736
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7b2e5a9c3f4'
+down_revision: Union[str, None] = 'c4e8a2f6d1b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('monthly_report_runs',
+    sa.Column('period_start', sa.Date(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('students', sa.Integer(), nullable=False),
+    sa.Column('chunks', sa.Integer(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('summary', sa.Text(), nullable=True),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('period_start')
+    )
+    op.create_index(op.f('ix_monthly_report_runs_id'), 'monthly_report_runs', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_monthly_report_runs_id'), table_name='monthly_report_runs')
+    op.drop_table('monthly_report_runs')
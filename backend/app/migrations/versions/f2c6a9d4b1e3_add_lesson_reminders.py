@@ -0,0 +1,56 @@
+"""Add lesson_reminders timer table
+
+Revision ID: f2c6a9d4b1e3
+Revises: e5b9c3d1a8f2
+Create Date: 2026-10-21 14:02:31.884571
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c6a9d4b1e3'
+down_revision: Union[str, None] = 'e5b9c3d1a8f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Anticipi di default (LESSON_REMINDER_HOURS_BEFORE) per le lezioni già confermate
+BACKFILL_HOURS_BEFORE = (24, 1)
+
+
+def upgrade() -> None:
+    op.create_table('lesson_reminders',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('lesson_id', sa.Integer(), nullable=False),
+    sa.Column('hours_before', sa.Integer(), nullable=False),
+    sa.Column('due_at', sa.DateTime(), nullable=False),
+    sa.Column('status', sa.Enum('scheduled', 'sent', 'cancelled', name='lessonreminderstatus'), nullable=False),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['lesson_id'], ['lessons.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('lesson_id', 'hours_before', name='uq_lesson_reminders_lesson_hours')
+    )
+    op.create_index('ix_lesson_reminders_status_due_at', 'lesson_reminders', ['status', 'due_at'], unique=False)
+
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    # Lezioni confermate future: promemoria non ancora scaduti
+    for hours in BACKFILL_HOURS_BEFORE:
+        op.execute(f"""
+            INSERT INTO lesson_reminders (lesson_id, hours_before, due_at, status, created_at)
+            SELECT id, {hours}, start_at - interval '{hours} hours', 'scheduled', now() at time zone 'utc'
+            FROM lessons
+            WHERE status = 'confirmed'
+              AND start_at - interval '{hours} hours' > now() at time zone 'utc'
+        """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_lesson_reminders_status_due_at', table_name='lesson_reminders')
+    op.drop_table('lesson_reminders')
+    sa.Enum(name='lessonreminderstatus').drop(op.get_bind(), checkfirst=True)
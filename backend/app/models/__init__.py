@@ -5,8 +5,14 @@ from .assignment import Assignment, AssignmentSubmission
 from .availability import Availability
 from .feedback import Feedback
 from .payment import Payment
-from .report import Report
+from .report import Report, MonthlyReportRun
 from .file import File
+from .blob import Blob
+from .ai_usage import AIUsage
+from .student_month_stats import StudentMonthStats
+from .email_outbox import EmailOutbox, EmailOutboxStatus
+from .lesson_reminder import LessonReminder, LessonReminderStatus
+from .notification import NotificationPreference, PendingNotification
 
 # Import all models to ensure they are registered with SQLAlchemy
 __all__ = [
@@ -24,5 +30,15 @@ __all__ = [
     "Feedback",
     "Payment",
     "Report",
+    "MonthlyReportRun",
     "File",
+    "Blob",
+    "AIUsage",
+    "StudentMonthStats",
+    "EmailOutbox",
+    "EmailOutboxStatus",
+    "LessonReminder",
+    "LessonReminderStatus",
+    "NotificationPreference",
+    "PendingNotification",
 ]
@@ -0,0 +1,23 @@
+from sqlalchemy import Integer, String, Boolean, DateTime, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from app.models.base import Base
+
+
+class AIUsage(Base):
+    """Una riga per chiamata al modello (scritte a blocchi da UsageRecorder)"""
+    __tablename__ = "ai_usage"
+    __table_args__ = (
+        Index("ix_ai_usage_created_at_feature", "created_at", "feature"),
+    )
+
+    # Tabella compatta e solo in append: niente updated_at né FK (il tutor può essere cancellato)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    feature: Mapped[str] = mapped_column(String(32), nullable=False)
+    model: Mapped[str] = mapped_column(String(64), nullable=False)
+    tutor_id: Mapped[int] = mapped_column(Integer, nullable=True)
+    prompt_tokens: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    completion_tokens: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    latency_ms: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    cache_hit: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
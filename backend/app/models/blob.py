@@ -0,0 +1,18 @@
+from sqlalchemy import String, Integer, DateTime
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from datetime import datetime
+from app.models.base import Base, BaseModel
+
+
+class Blob(Base, BaseModel):
+    """Contenuto salvato una sola volta nello storage, condiviso dai File con lo stesso SHA-256"""
+    __tablename__ = "blobs"
+
+    sha256: Mapped[str] = mapped_column(String(64), nullable=True, unique=True)  # None: blob migrato, checksum da calcolare
+    stored_path: Mapped[str] = mapped_column(String(500), nullable=False, unique=True)  # Path in storage
+    size: Mapped[int] = mapped_column(Integer, nullable=False)
+    ref_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)  # File che lo usano
+    unreferenced_since: Mapped[datetime] = mapped_column(DateTime, nullable=True, index=True)  # ref_count sceso a 0
+
+    # Relationships
+    files = relationship("File", back_populates="blob")
@@ -0,0 +1,32 @@
+from sqlalchemy import Integer, String, Text, DateTime, Enum, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from app.models.base import Base, BaseModel
+import enum
+
+
+class EmailOutboxStatus(str, enum.Enum):
+    pending = "pending"
+    sent = "sent"
+    failed = "failed"  # tentativi esauriti
+
+
+class EmailOutbox(Base, BaseModel):
+    """
+    Email da inviare, scritte nella stessa transazione della modifica che le
+    genera e spedite dal dispatcher su notifications_queue (EmailOutboxService).
+    """
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    to_address: Mapped[str] = mapped_column(String(255), nullable=False)
+    subject: Mapped[str] = mapped_column(String(255), nullable=False)
+    html_content: Mapped[str] = mapped_column(Text, nullable=False)
+    text_content: Mapped[str] = mapped_column(Text, nullable=True)
+    status: Mapped[EmailOutboxStatus] = mapped_column(Enum(EmailOutboxStatus), default=EmailOutboxStatus.pending, nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    last_error: Mapped[str] = mapped_column(Text, nullable=True)
+    sent_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
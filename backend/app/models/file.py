@@ -9,14 +9,17 @@ class File(Base, BaseModel):
     
     owner_user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
     original_filename: Mapped[str] = mapped_column(String(255), nullable=False)
-    stored_path: Mapped[str] = mapped_column(String(500), nullable=False)  # Path in storage
+    stored_path: Mapped[str] = mapped_column(String(500), nullable=False)  # Path in storage (= blob.stored_path)
+    blob_id: Mapped[int] = mapped_column(ForeignKey("blobs.id"), nullable=True, index=True)
     content_type: Mapped[str] = mapped_column(String(100), nullable=False)
     file_size: Mapped[int] = mapped_column(Integer, nullable=False)  # Size in bytes
+    checksum_sha256: Mapped[str] = mapped_column(String(64), nullable=True)  # Calcolato durante l'upload
     is_public: Mapped[bool] = mapped_column(default=False)  # Can be accessed without auth
     expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)  # For temporary files
     
     # Relationships
     owner = relationship("User", back_populates="files")
+    blob = relationship("Blob", back_populates="files")
     
     @property
     def file_size_display(self) -> str:
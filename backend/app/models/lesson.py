@@ -1,5 +1,5 @@
-from sqlalchemy import String, Enum, DateTime, ForeignKey, Float, Text, Boolean
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import String, Enum, DateTime, ForeignKey, Float, Text, Boolean, func
+from sqlalchemy.orm import Mapped, mapped_column, relationship, column_property
 from datetime import datetime, timedelta
 from app.models.base import Base, BaseModel
 import enum
@@ -24,10 +24,11 @@ class Lesson(Base, BaseModel):
     end_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
     status: Mapped[LessonStatus] = mapped_column(Enum(LessonStatus), default=LessonStatus.pending_payment)
     room_slug: Mapped[str] = mapped_column(String(100), nullable=True)  # Jitsi room identifier
-    notes_text: Mapped[str] = mapped_column(Text, nullable=True)  # AI-generated notes
+    # Testi lunghi: caricati solo su richiesta (undefer_group("notes") nei dettagli)
+    notes_text: Mapped[str] = mapped_column(Text, nullable=True, deferred=True, deferred_group="notes")  # AI-generated notes
     notes_pdf_path: Mapped[str] = mapped_column(String(500), nullable=True)  # Path to PDF notes
-    tutor_notes: Mapped[str] = mapped_column(Text, nullable=True)  # Tutor's manual notes/seed for AI
-    objectives: Mapped[str] = mapped_column(Text, nullable=True)  # Lesson objectives
+    tutor_notes: Mapped[str] = mapped_column(Text, nullable=True, deferred=True, deferred_group="notes")  # Tutor's manual notes/seed for AI
+    objectives: Mapped[str] = mapped_column(Text, nullable=True, deferred=True, deferred_group="notes")  # Lesson objectives
     price: Mapped[float] = mapped_column(Float, nullable=True)  # Price in EUR
     
     # Relationships
@@ -36,6 +37,10 @@ class Lesson(Base, BaseModel):
     payments = relationship("Payment", back_populates="lesson", cascade="all, delete-orphan")
     feedback = relationship("Feedback", back_populates="lesson", cascade="all, delete-orphan")
     
+    # Colonne calcolate dal DB per le liste: evitano di trasferire il testo completo
+    has_notes: Mapped[bool] = column_property(notes_text.column.isnot(None))
+    notes_preview: Mapped[str] = column_property(func.substr(notes_text.column, 1, 200), deferred=True)
+    
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         if not self.room_slug:
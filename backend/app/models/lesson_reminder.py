@@ -0,0 +1,36 @@
+from sqlalchemy import Integer, DateTime, Enum, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from datetime import datetime
+from app.models.base import Base
+import enum
+
+
+class LessonReminderStatus(str, enum.Enum):
+    scheduled = "scheduled"
+    sent = "sent"
+    cancelled = "cancelled"
+
+
+class LessonReminder(Base):
+    """
+    Promemoria programmato di una lezione (uno per anticipo, es. 24h e 1h).
+    La riga è anche il registro degli invii: una volta "sent" non viene
+    più ripresa, quindi lo stesso promemoria non parte due volte.
+    """
+    __tablename__ = "lesson_reminders"
+    __table_args__ = (
+        UniqueConstraint("lesson_id", "hours_before", name="uq_lesson_reminders_lesson_hours"),
+        Index("ix_lesson_reminders_status_due_at", "status", "due_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    lesson_id: Mapped[int] = mapped_column(ForeignKey("lessons.id", ondelete="CASCADE"), nullable=False)
+    hours_before: Mapped[int] = mapped_column(Integer, nullable=False)
+    due_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    status: Mapped[LessonReminderStatus] = mapped_column(
+        Enum(LessonReminderStatus), default=LessonReminderStatus.scheduled, nullable=False
+    )
+    sent_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+    lesson = relationship("Lesson")
@@ -0,0 +1,40 @@
+from sqlalchemy import Integer, String, Text, DateTime, Boolean, ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from datetime import datetime
+from app.models.base import Base, BaseModel
+
+
+class NotificationPreference(Base, BaseModel):
+    """
+    Preferenze di notifica dell'utente. Senza riga valgono i default
+    (digest attivo per i ruoli in NOTIFICATION_DIGEST_DEFAULT_ROLES).
+    """
+    __tablename__ = "notification_preferences"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), unique=True, nullable=False)
+    digest_enabled: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+    digest_window_minutes: Mapped[int] = mapped_column(Integer, nullable=True)  # None: NOTIFICATION_DIGEST_WINDOW_MINUTES
+
+    user = relationship("User")
+
+
+class PendingNotification(Base):
+    """
+    Notifica in attesa del prossimo digest del destinatario. Conserva solo il
+    contesto del template: il rendering avviene una volta, nell'email di
+    riepilogo, e la riga viene eliminata quando il digest entra nell'outbox.
+    """
+    __tablename__ = "pending_notifications"
+    __table_args__ = (
+        Index("ix_pending_notifications_deliver_after", "deliver_after"),
+        Index("ix_pending_notifications_user_id", "user_id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    kind: Mapped[str] = mapped_column(String(50), nullable=False)
+    payload: Mapped[str] = mapped_column(Text, nullable=False)  # JSON: contesto del template
+    deliver_after: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+    user = relationship("User")
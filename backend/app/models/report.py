@@ -1,8 +1,10 @@
-from sqlalchemy import String, Text, DateTime, ForeignKey, Enum, Integer
+from sqlalchemy import String, Text, Date, DateTime, ForeignKey, Enum, Integer, Index, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from datetime import datetime
+from datetime import date, datetime
+from typing import Any, Dict
 from app.models.base import Base, BaseModel
 import enum
+import json
 
 
 class ReportStatus(str, enum.Enum):
@@ -14,10 +16,15 @@ class ReportStatus(str, enum.Enum):
 
 class Report(Base, BaseModel):
     __tablename__ = "reports"
+    __table_args__ = (
+        # Un report per studente e periodo: è il vincolo su cui si basa il claim atomico
+        UniqueConstraint("student_id", "period_start", name="uq_reports_student_period_start"),
+        Index("ix_reports_period_start_status", "period_start", "status"),
+    )
     
     student_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
-    period_start: Mapped[datetime] = mapped_column(DateTime, nullable=False)
-    period_end: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    period_start: Mapped[date] = mapped_column(Date, nullable=False)  # primo giorno del periodo
+    period_end: Mapped[date] = mapped_column(Date, nullable=False)  # ultimo giorno (incluso)
     title: Mapped[str] = mapped_column(String(200), nullable=False)
     text: Mapped[str] = mapped_column(Text, nullable=True)  # AI-generated report text
     pdf_path: Mapped[str] = mapped_column(String(500), nullable=True)  # Path to PDF report
@@ -39,3 +46,31 @@ class Report(Base, BaseModel):
         if start_str == end_str:
             return start_str
         return f"{start_str} - {end_str}"
+
+
+class MonthlyReportRun(Base, BaseModel):
+    """Ultimo run dei report mensili di un periodo: scritto dai worker, letto dall'API"""
+    __tablename__ = "monthly_report_runs"
+
+    period_start: Mapped[date] = mapped_column(Date, nullable=False, unique=True)
+    status: Mapped[str] = mapped_column(String(20), nullable=False)  # running | completed
+    students: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    chunks: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    started_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    finished_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    summary: Mapped[str] = mapped_column(Text, nullable=True)  # JSON string, riepilogo del chord
+
+    def as_dict(self) -> Dict[str, Any]:
+        run = {
+            "status": self.status,
+            "year": self.period_start.year,
+            "month": self.period_start.month,
+            "students": self.students,
+            "chunks": self.chunks,
+            "started_at": self.started_at.isoformat(),
+        }
+        if self.finished_at is not None:
+            run["finished_at"] = self.finished_at.isoformat()
+        if self.summary:
+            run.update(json.loads(self.summary))
+        return run
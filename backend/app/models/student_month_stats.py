@@ -0,0 +1,54 @@
+from sqlalchemy import Integer, Text, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from typing import Dict
+import json
+from app.models.base import Base
+
+
+class StudentMonthStats(Base):
+    """
+    Aggregati mensili di uno studente, aggiornati nella stessa transazione di
+    completamento lezione e valutazione compiti; i voti dei feedback arrivano
+    dalla ricostruzione (StudentMonthStatsService).
+    """
+    __tablename__ = "student_month_stats"
+    __table_args__ = (
+        UniqueConstraint("student_id", "year", "month", name="uq_student_month_stats_student_period"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    student_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    year: Mapped[int] = mapped_column(Integer, nullable=False)
+    month: Mapped[int] = mapped_column(Integer, nullable=False)
+    lessons_completed: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    minutes: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    subjects: Mapped[str] = mapped_column(Text, default="{}", nullable=False)  # JSON {materia: lezioni}
+    rating_sum: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    rating_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    assignments_graded: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    grade_sum: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    COUNTERS = ("lessons_completed", "minutes", "rating_sum", "rating_count", "assignments_graded", "grade_sum")
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # Contatori a zero già sull'oggetto (anche non salvato), non solo all'INSERT
+        for counter in self.COUNTERS:
+            if getattr(self, counter) is None:
+                setattr(self, counter, 0)
+        if self.subjects is None:
+            self.subjects = "{}"
+
+    @property
+    def subject_counts(self) -> Dict[str, int]:
+        return json.loads(self.subjects or "{}")
+
+    @property
+    def average_rating(self) -> float:
+        return round(self.rating_sum / self.rating_count, 2) if self.rating_count else 0.0
+
+    @property
+    def average_grade(self) -> float:
+        return round(self.grade_sum / self.assignments_graded, 1) if self.assignments_graded else 0.0
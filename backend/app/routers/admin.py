@@ -8,7 +8,7 @@ from app.models.lesson import Lesson
 from app.models.payment import Payment
 from app.schemas.admin import (
     AdminStatsResponse, UserListResponse, UserUpdateStatus,
-    LessonListResponse, PaymentListResponse, PaymentRefund
+    LessonListResponse, PaymentListResponse, PaymentRefund, AIUsageRollupResponse
 )
 
 router = APIRouter()
@@ -155,4 +155,24 @@ async def refund_payment(
     
     admin_service = AdminService(db)
     result = admin_service.refund_payment(payment_id, refund_data.reason)
-    return result
\ No newline at end of file
+    return result
+
+@router.get("/ai/cache-stats")
+async def get_ai_cache_stats(
+    current_user: User = Depends(require_roles([Role.admin]))
+):
+    """Hit/miss della cache delle risposte AI"""
+    from app.core.llm import llm_client
+
+    return llm_client.cache_stats()
+
+@router.get("/ai/usage", response_model=AIUsageRollupResponse)
+async def get_ai_usage(
+    days: int = Query(30, ge=1, le=365),
+    current_user: User = Depends(require_roles([Role.admin])),
+    db: Session = Depends(get_db)
+):
+    """Token, latenza e costo stimato delle chiamate AI, per giorno e per feature"""
+    from app.services.ai_usage import AIUsageService
+
+    return AIUsageService(db).rollup(days)
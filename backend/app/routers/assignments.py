@@ -5,13 +5,18 @@ from typing import List, Optional
 from app.core.dependencies import get_db
 from app.core.security import get_current_user, require_role
 from app.models.user import User, Role
-from app.services.assignments import AssignmentService
+from app.services.assignments import AssignmentService, AssignmentAssembler
 from app.schemas.assignment import (
-    AssignmentCreate, AssignmentUpdate, AssignmentResponse, AssignmentListResponse,
+    AssignmentCreate, AssignmentBulkCreate, AssignmentUpdate, AssignmentResponse, AssignmentListResponse,
     AssignmentSubmissionCreate, AssignmentSubmissionUpdate, AssignmentSubmissionResponse,
-    AssignmentGrading, AssignmentGenerateRequest, AssignmentDraftResponse
+    AssignmentGrading, AssignmentGenerateRequest, AssignmentDraftResponse,
+    AssignmentGenerateJobResponse
 )
-from app.services.ai import generate_assignment_with_openai
+from app.core.celery_app import celery_app
+from app.services.ai import (
+    assignment_job_owner, generate_assignment_draft, get_cached_assignment_draft, start_assignment_draft_job
+)
+from app.services.notifications import send_assignment_notifications_task
 
 router = APIRouter()
 
@@ -26,37 +31,27 @@ def create_assignment(
     assignment_service = AssignmentService(db)
     assignment = assignment_service.create_assignment(assignment_data, current_user.id)
     
-    # Ottieni i nomi per la risposta (dai profili)
-    tutor = db.query(User).filter(User.id == assignment.tutor_id).first()
-    student = db.query(User).filter(User.id == assignment.student_id).first()
-    tutor_name = "Tutor"
-    student_name = "Studente"
-    if tutor and tutor.tutor_profile:
-        tutor_name = f"{tutor.tutor_profile.first_name} {tutor.tutor_profile.last_name}".strip()
-    elif tutor:
-        tutor_name = tutor.email
-    if student and student.student_profile:
-        student_name = f"{student.student_profile.first_name} {student.student_profile.last_name}".strip()
-    elif student:
-        student_name = student.email
+    return AssignmentAssembler(db).assignment(assignment, with_submissions=False)
 
-    return AssignmentResponse(
-        id=assignment.id,
-        title=assignment.title,
-        description=assignment.description,
-        instructions=assignment.instructions,
-        subject=assignment.subject,
-        due_date=assignment.due_date,
-        points=assignment.points,
-        is_published=assignment.is_published,
-        created_at=assignment.created_at,
-        updated_at=assignment.updated_at,
-        tutor_name=tutor_name,
-        student_name=student_name,
-        has_submission=False,
-        submission_status=None,
-        submission_grade=None
-    )
+
+@router.post("/bulk", response_model=List[AssignmentResponse])
+def create_assignments_bulk(
+    assignment_data: AssignmentBulkCreate,
+    current_user: User = Depends(require_role(Role.tutor)),
+    db: Session = Depends(get_db)
+):
+    """Assegna lo stesso compito a tutti gli studenti di una classe"""
+    assignment_service = AssignmentService(db)
+    assignments = assignment_service.create_assignments_bulk(assignment_data, current_user.id)
+
+    if assignment_data.is_published:
+        try:
+            send_assignment_notifications_task.delay([a.id for a in assignments])
+        except Exception as e:
+            # Il compito è già salvato: un broker non raggiungibile non deve far fallire la richiesta
+            print(f"⚠️ Impossibile accodare le notifiche dei compiti: {e}")
+
+    return AssignmentAssembler(db).assignments(assignments, with_submissions=False)
 
 
 @router.post("/generate", response_model=AssignmentDraftResponse)
@@ -65,13 +60,69 @@ def generate_assignment(
     current_user: User = Depends(require_role(Role.tutor))
 ):
     """Genera una bozza di compito con AI dato argomento e difficoltà."""
-    draft = generate_assignment_with_openai(
+    draft = generate_assignment_draft(
         topic=payload.topic,
         difficulty=payload.difficulty,
         subject=payload.subject,
+        tutor_id=current_user.id,
+        regenerate=payload.regenerate,
     )
     return AssignmentDraftResponse(**draft)
 
+
+@router.post("/generate/jobs", response_model=AssignmentGenerateJobResponse, status_code=status.HTTP_202_ACCEPTED)
+def start_generate_assignment_job(
+    payload: AssignmentGenerateRequest,
+    current_user: User = Depends(require_role(Role.tutor))
+):
+    """Avvia la generazione AI in background; il client interroga lo stato del job."""
+    cached = None if payload.regenerate else get_cached_assignment_draft(
+        payload.topic, payload.difficulty, payload.subject
+    )
+    if cached is not None:
+        return AssignmentGenerateJobResponse(status="completed", draft=AssignmentDraftResponse(**cached))
+
+    try:
+        job_id = start_assignment_draft_job(
+            current_user.id, payload.topic, payload.difficulty, payload.subject, payload.regenerate
+        )
+    except Exception as e:
+        print(f"⚠️ Impossibile accodare la generazione AI: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Generazione in background non disponibile, riprova più tardi"
+        )
+    return AssignmentGenerateJobResponse(job_id=job_id, status="pending")
+
+
+@router.get("/generate/jobs/{job_id}", response_model=AssignmentGenerateJobResponse)
+def get_generate_assignment_job(
+    job_id: str,
+    current_user: User = Depends(require_role(Role.tutor))
+):
+    """Stato di un job di generazione AI"""
+    # Job di altri tutor (o sconosciuti) non esistono per chi chiede, in qualunque stato
+    if assignment_job_owner(job_id) != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job non trovato"
+        )
+    job = celery_app.AsyncResult(job_id)
+
+    if job.state in ("PENDING", "RECEIVED", "RETRY"):
+        return AssignmentGenerateJobResponse(job_id=job_id, status="pending")
+    if job.state == "STARTED":
+        return AssignmentGenerateJobResponse(job_id=job_id, status="running")
+    if job.state != "SUCCESS":
+        return AssignmentGenerateJobResponse(job_id=job_id, status="failed", error="Generazione non riuscita")
+
+    result = job.result or {}
+    if result.get("status") != "success":
+        return AssignmentGenerateJobResponse(job_id=job_id, status="failed", error=result.get("error"))
+    return AssignmentGenerateJobResponse(
+        job_id=job_id, status="completed", draft=AssignmentDraftResponse(**result["draft"])
+    )
+
 @router.get("/student", response_model=List[AssignmentResponse])
 def get_student_assignments(
     include_completed: bool = Query(True, description="Includi compiti completati"),
@@ -82,41 +133,7 @@ def get_student_assignments(
     assignment_service = AssignmentService(db)
     assignments = assignment_service.get_assignments_for_student(current_user.id, include_completed)
     
-    result = []
-    for assignment in assignments:
-        submission = assignment_service.get_submission(assignment.id, current_user.id)
-        tutor = db.query(User).filter(User.id == assignment.tutor_id).first()
-        student = db.query(User).filter(User.id == assignment.student_id).first()
-        tutor_name = "Tutor"
-        student_name = "Studente"
-        if tutor and tutor.tutor_profile:
-            tutor_name = f"{tutor.tutor_profile.first_name} {tutor.tutor_profile.last_name}".strip()
-        elif tutor:
-            tutor_name = tutor.email
-        if student and student.student_profile:
-            student_name = f"{student.student_profile.first_name} {student.student_profile.last_name}".strip()
-        elif student:
-            student_name = student.email
-
-        result.append(AssignmentResponse(
-            id=assignment.id,
-            title=assignment.title,
-            description=assignment.description,
-            instructions=assignment.instructions,
-            subject=assignment.subject,
-            due_date=assignment.due_date,
-            points=assignment.points,
-            is_published=assignment.is_published,
-            created_at=assignment.created_at,
-            updated_at=assignment.updated_at,
-            tutor_name=tutor_name,
-            student_name=student_name,
-            has_submission=submission is not None,
-            submission_status=submission.status if submission else None,
-            submission_grade=submission.grade if submission else None
-        ))
-    
-    return result
+    return AssignmentAssembler(db).assignments(assignments)
 
 @router.get("/tutor", response_model=List[AssignmentResponse])
 def get_tutor_assignments(
@@ -145,41 +162,7 @@ def get_tutor_assignments(
     for assignment in assignments:
         print(f"🔍 [DEBUG] Compito {assignment.id}: {assignment.title}")
     
-    result = []
-    for assignment in assignments:
-        submission = assignment_service.get_submission(assignment.id, assignment.student_id)
-        tutor = db.query(User).filter(User.id == assignment.tutor_id).first()
-        student = db.query(User).filter(User.id == assignment.student_id).first()
-        tutor_name = "Tutor"
-        student_name = "Studente"
-        if tutor and tutor.tutor_profile:
-            tutor_name = f"{tutor.tutor_profile.first_name} {tutor.tutor_profile.last_name}".strip()
-        elif tutor:
-            tutor_name = tutor.email
-        if student and student.student_profile:
-            student_name = f"{student.student_profile.first_name} {student.student_profile.last_name}".strip()
-        elif student:
-            student_name = student.email
-
-        result.append(AssignmentResponse(
-            id=assignment.id,
-            title=assignment.title,
-            description=assignment.description,
-            instructions=assignment.instructions,
-            subject=assignment.subject,
-            due_date=assignment.due_date,
-            points=assignment.points,
-            is_published=assignment.is_published,
-            created_at=assignment.created_at,
-            updated_at=assignment.updated_at,
-            tutor_name=tutor_name,
-            student_name=student_name,
-            has_submission=submission is not None,
-            submission_status=submission.status if submission else None,
-            submission_grade=submission.grade if submission else None
-        ))
-    
-    return result
+    return AssignmentAssembler(db).assignments(assignments)
 
 @router.get("/{assignment_id}", response_model=AssignmentResponse)
 def get_assignment(
@@ -197,40 +180,9 @@ def get_assignment(
             detail="Compito non trovato"
         )
     
-    # Verifica se esiste una consegna (se è uno studente)
-    submission = None
-    if current_user.role == Role.student:
-        submission = assignment_service.get_submission(assignment.id, current_user.id)
-    
-    tutor = db.query(User).filter(User.id == assignment.tutor_id).first()
-    student = db.query(User).filter(User.id == assignment.student_id).first()
-    tutor_name = "Tutor"
-    student_name = "Studente"
-    if tutor and tutor.tutor_profile:
-        tutor_name = f"{tutor.tutor_profile.first_name} {tutor.tutor_profile.last_name}".strip()
-    elif tutor:
-        tutor_name = tutor.email
-    if student and student.student_profile:
-        student_name = f"{student.student_profile.first_name} {student.student_profile.last_name}".strip()
-    elif student:
-        student_name = student.email
-
-    return AssignmentResponse(
-        id=assignment.id,
-        title=assignment.title,
-        description=assignment.description,
-        instructions=assignment.instructions,
-        subject=assignment.subject,
-        due_date=assignment.due_date,
-        points=assignment.points,
-        is_published=assignment.is_published,
-        created_at=assignment.created_at,
-        updated_at=assignment.updated_at,
-        tutor_name=tutor_name,
-        student_name=student_name,
-        has_submission=submission is not None,
-        submission_status=submission.status if submission else None,
-        submission_grade=submission.grade if submission else None
+    # Lo stato della consegna è mostrato solo allo studente
+    return AssignmentAssembler(db).assignment(
+        assignment, with_submissions=current_user.role == Role.student
     )
 
 @router.put("/{assignment_id}", response_model=AssignmentResponse)
@@ -244,27 +196,7 @@ def update_assignment(
     assignment_service = AssignmentService(db)
     assignment = assignment_service.update_assignment(assignment_id, assignment_data, current_user.id)
     
-    # Ottieni i nomi per la risposta
-    tutor = db.query(User).filter(User.id == assignment.tutor_id).first()
-    student = db.query(User).filter(User.id == assignment.student_id).first()
-    
-    return AssignmentResponse(
-        id=assignment.id,
-        title=assignment.title,
-        description=assignment.description,
-        instructions=assignment.instructions,
-        subject=assignment.subject,
-        due_date=assignment.due_date,
-        points=assignment.points,
-        is_published=assignment.is_published,
-        created_at=assignment.created_at,
-        updated_at=assignment.updated_at,
-        tutor_name=f"{tutor.first_name} {tutor.last_name}" if tutor else "Tutor",
-        student_name=f"{student.first_name} {student.last_name}" if student else "Studente",
-        has_submission=False,
-        submission_status=None,
-        submission_grade=None
-    )
+    return AssignmentAssembler(db).assignment(assignment, with_submissions=False)
 
 @router.delete("/{assignment_id}")
 def delete_assignment(
@@ -287,22 +219,7 @@ def submit_assignment(
     assignment_service = AssignmentService(db)
     submission = assignment_service.submit_assignment(submission_data, current_user.id)
     
-    # Ottieni i nomi per la risposta
-    assignment = db.query(Assignment).filter(Assignment.id == submission.assignment_id).first()
-    student = db.query(User).filter(User.id == submission.student_id).first()
-    
-    return AssignmentSubmissionResponse(
-        id=submission.id,
-        content=submission.content,
-        status=submission.status,
-        grade=submission.grade,
-        feedback=submission.feedback,
-        submitted_at=submission.submitted_at,
-        graded_at=submission.graded_at,
-        created_at=submission.created_at,
-        assignment_title=assignment.title if assignment else "Compito",
-        student_name=f"{student.first_name} {student.last_name}" if student else "Studente"
-    )
+    return AssignmentAssembler(db).submission(submission)
 
 @router.get("/{assignment_id}/submission", response_model=AssignmentSubmissionResponse)
 def get_submission(
@@ -320,22 +237,7 @@ def get_submission(
             detail="Consegna non trovata"
         )
     
-    # Ottieni i nomi per la risposta
-    assignment = db.query(Assignment).filter(Assignment.id == submission.assignment_id).first()
-    student = db.query(User).filter(User.id == submission.student_id).first()
-    
-    return AssignmentSubmissionResponse(
-        id=submission.id,
-        content=submission.content,
-        status=submission.status,
-        grade=submission.grade,
-        feedback=submission.feedback,
-        submitted_at=submission.submitted_at,
-        graded_at=submission.graded_at,
-        created_at=submission.created_at,
-        assignment_title=assignment.title if assignment else "Compito",
-        student_name=f"{student.first_name} {student.last_name}" if student else "Studente"
-    )
+    return AssignmentAssembler(db).submission(submission)
 
 @router.post("/submissions/{submission_id}/grade", response_model=AssignmentSubmissionResponse)
 def grade_submission(
@@ -348,22 +250,7 @@ def grade_submission(
     assignment_service = AssignmentService(db)
     submission = assignment_service.grade_submission(submission_id, grading_data, current_user.id)
     
-    # Ottieni i nomi per la risposta
-    assignment = db.query(Assignment).filter(Assignment.id == submission.assignment_id).first()
-    student = db.query(User).filter(User.id == submission.student_id).first()
-    
-    return AssignmentSubmissionResponse(
-        id=submission.id,
-        content=submission.content,
-        status=submission.status,
-        grade=submission.grade,
-        feedback=submission.feedback,
-        submitted_at=submission.submitted_at,
-        graded_at=submission.graded_at,
-        created_at=submission.created_at,
-        assignment_title=assignment.title if assignment else "Compito",
-        student_name=f"{student.first_name} {student.last_name}" if student else "Studente"
-    )
+    return AssignmentAssembler(db).submission(submission)
 
 @router.get("/{assignment_id}/submissions", response_model=List[AssignmentSubmissionResponse])
 def get_assignment_submissions(
@@ -375,23 +262,4 @@ def get_assignment_submissions(
     assignment_service = AssignmentService(db)
     submissions = assignment_service.get_submissions_for_assignment(assignment_id, current_user.id)
     
-    result = []
-    for submission in submissions:
-        # Ottieni i nomi per la risposta
-        assignment = db.query(Assignment).filter(Assignment.id == submission.assignment_id).first()
-        student = db.query(User).filter(User.id == submission.student_id).first()
-        
-        result.append(AssignmentSubmissionResponse(
-            id=submission.id,
-            content=submission.content,
-            status=submission.status,
-            grade=submission.grade,
-            feedback=submission.feedback,
-            submitted_at=submission.submitted_at,
-            graded_at=submission.graded_at,
-            created_at=submission.created_at,
-            assignment_title=assignment.title if assignment else "Compito",
-            student_name=f"{student.first_name} {student.last_name}" if student else "Studente"
-        ))
-    
-    return result
\ No newline at end of file
+    return AssignmentAssembler(db).submissions(submissions)
@@ -1,30 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, Request, status, UploadFile, File, Query
 from sqlalchemy.orm import Session
 from typing import Optional
-import io
+from app.core.config import settings
 from app.core.db import get_db
 from app.core.security import get_current_user
 from app.models.user import User
 from app.models.file import File as FileModel
-from app.core.storage import storage
+from app.core.downloads import download_response
+from app.core.storage import ObjectInfo, UploadTooLarge, run_storage, storage, stream_upload
+from app.services.blobs import BlobService
 
 router = APIRouter()
 
 
 @router.post("/upload")
 async def upload_file(
+    request: Request,
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Upload a file"""
-    # Validate file size (max 10MB)
-    if file.size and file.size > 10 * 1024 * 1024:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="File size too large. Maximum 10MB allowed."
-        )
+    """Upload a file (streamed to storage in chunks)"""
+    max_bytes = settings.MAX_UPLOAD_SIZE_BYTES
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File size too large. Maximum {max_bytes // (1024 * 1024)}MB allowed."
+    )
+    # Content-Length dichiarato oltre il limite (più il margine del multipart): rifiuto immediato
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + 64 * 1024:
+        raise too_large
     
     # Validate file type
     allowed_types = [
@@ -46,48 +51,59 @@ async def upload_file(
         )
     
     try:
-        # Read file content
-        file_content = await file.read()
-        file_stream = io.BytesIO(file_content)
-        
-        # Upload to storage
-        stored_path = storage.upload_file(
-            file_data=file_stream,
-            filename=file.filename,
-            content_type=file.content_type
+        # Copia a blocchi verso lo storage: dimensione e checksum calcolati durante la lettura
+        stored = await stream_upload(file, file.filename, file.content_type, max_bytes=max_bytes)
+    except UploadTooLarge:
+        raise too_large
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to upload file: {str(e)}"
         )
-        
-        # Save file record to database
+    
+    try:
+        # Contenuto deduplicato per SHA-256: se esiste già, il nuovo File usa il blob esistente
+        blob = BlobService(db).attach(stored)
         file_record = FileModel(
             owner_user_id=current_user.id,
             original_filename=file.filename,
-            stored_path=stored_path,
+            stored_path=blob.stored_path,
+            blob_id=blob.id,
             content_type=file.content_type,
-            file_size=len(file_content)
+            file_size=stored.size,
+            checksum_sha256=stored.sha256
         )
-        
         db.add(file_record)
         db.commit()
-        db.refresh(file_record)
-        
-        return {
-            "file_id": file_record.id,
-            "filename": file.filename,
-            "size": file_record.file_size,
-            "content_type": file.content_type,
-            "uploaded_at": file_record.created_at
-        }
-        
     except Exception as e:
+        db.rollback()
+        # Nessuna riga punta all'oggetto appena scritto: non lasciarlo orfano nello storage
+        await run_storage(storage.delete_file, stored.path)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to upload file: {str(e)}"
-        )
+            detail=f"Failed to save file: {str(e)}"
+        ) from e
+    db.refresh(file_record)
+
+    if blob.stored_path != stored.path:
+        # L'oggetto appena scritto è una copia di un blob esistente
+        await run_storage(storage.delete_file, stored.path)
+    
+    # La deduplicazione resta invisibile al client: la risposta non dice se il contenuto esisteva già
+    return {
+        "file_id": file_record.id,
+        "filename": file.filename,
+        "size": file_record.file_size,
+        "content_type": file.content_type,
+        "checksum_sha256": file_record.checksum_sha256,
+        "uploaded_at": file_record.created_at
+    }
 
 
 @router.get("/{file_id}")
 async def download_file(
     file_id: int,
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -116,18 +132,22 @@ async def download_file(
             detail="File has expired"
         )
     
+    # Con il checksum dell'upload ETag e dimensione sono già noti: niente HEAD sullo storage
+    info = None
+    if file_record.checksum_sha256:
+        info = ObjectInfo(
+            size=file_record.file_size,
+            etag=f'"{file_record.checksum_sha256}"',
+            last_modified=file_record.created_at
+        )
+    
     try:
-        # Get file from storage
-        file_stream = storage.download_stream(file_record.stored_path)
-        
-        # Return file as streaming response
-        return StreamingResponse(
-            io.BytesIO(file_stream.read()),
+        return await download_response(
+            request,
+            file_record.stored_path,
             media_type=file_record.content_type,
-            headers={
-                "Content-Disposition": f"attachment; filename={file_record.original_filename}",
-                "Content-Length": str(file_record.file_size)
-            }
+            filename=file_record.original_filename,
+            info=info
         )
         
     except Exception as e:
@@ -171,7 +191,7 @@ async def get_file_url(
     
     try:
         # Generate presigned URL
-        url = storage.get_presigned_url(file_record.stored_path, expires_in)
+        url = await run_storage(storage.get_presigned_url, file_record.stored_path, expires_in)
         
         return {
             "url": url,
@@ -212,8 +232,8 @@ async def delete_file(
         )
     
     try:
-        # Delete from storage
-        storage.delete_file(file_record.stored_path)
+        # Il contenuto può essere condiviso con altri file: lo rimuove il garbage collector dei blob
+        BlobService(db).release(file_record)
         
         # Delete from database
         db.delete(file_record)
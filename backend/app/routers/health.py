@@ -40,3 +40,25 @@ async def database_health_check():
             "error": str(e),
             "timestamp": datetime.utcnow().isoformat()
         }
+
+
+@router.get("/health/storage")
+async def storage_health_check():
+    """Storage readiness check (read-only: bucket reachable)"""
+    from app.core.storage import get_storage, run_storage
+
+    target = get_storage()
+    try:
+        await run_storage(target.check_ready)
+        return {
+            "status": "healthy",
+            "storage": type(target).__name__,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+    except Exception as e:
+        return {
+            "status": "unhealthy",
+            "storage": type(target).__name__,
+            "error": str(e),
+            "timestamp": datetime.utcnow().isoformat()
+        }
@@ -8,9 +8,10 @@ from app.models.lesson import Lesson
 from app.models.availability import Availability
 from app.schemas.lesson import (
     LessonCreate, LessonUpdate, LessonComplete, LessonResponse, 
-    LessonListResponse, LessonBookingResponse
+    LessonSummaryResponse, LessonListResponse, LessonBookingResponse
 )
 from app.services.lessons import LessonService
+from app.services.lesson_reminders import LessonReminderService
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -149,7 +150,7 @@ async def get_lessons(
             detail="Access denied"
         )
     
-    lessons_response = [LessonResponse.model_validate(lesson) for lesson in result["lessons"]]
+    lessons_response = [LessonSummaryResponse.model_validate(lesson) for lesson in result["lessons"]]
     
     return LessonListResponse(
         lessons=lessons_response,
@@ -165,9 +166,14 @@ async def get_lesson(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get lesson details"""
+    """Get lesson details (including notes, tutor notes and objectives)"""
     lesson_service = LessonService(db)
-    lesson = lesson_service.get_lesson(lesson_id, current_user.id, current_user.role)
+    lesson = lesson_service.get_lesson(lesson_id, current_user.id)
+    if not lesson:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Lesson not found"
+        )
     return LessonResponse.model_validate(lesson)
 
 
@@ -213,6 +219,7 @@ async def confirm_lesson(
         )
     
     lesson.status = 'confirmed'
+    LessonReminderService(db).schedule(lesson)
     db.commit()
     db.refresh(lesson)
     
@@ -275,7 +282,12 @@ async def update_lesson(
 ):
     """Update lesson details"""
     lesson_service = LessonService(db)
-    lesson = lesson_service.get_lesson(lesson_id, current_user.id, current_user.role)
+    lesson = lesson_service.get_lesson(lesson_id, current_user.id)
+    if not lesson:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Lesson not found"
+        )
     
     # Only allow updates if user is the tutor or admin
     if current_user.role not in [Role.tutor, Role.admin] or lesson.tutor_id != current_user.id:
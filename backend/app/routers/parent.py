@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.core.db import get_db
@@ -8,7 +8,7 @@ from app.models.lesson import Lesson
 from app.models.report import Report
 from app.schemas.parent import (
     ParentStatsResponse, ChildrenResponse, ChildResponse,
-    ChildLessonsResponse, ReportsResponse, ReportResponse
+    ChildLessonsResponse, ReportsResponse, ReportResponse, ChildMonthStatsResponse
 )
 
 router = APIRouter()
@@ -84,6 +84,26 @@ async def get_child_lessons(
         size=size
     )
 
+@router.get("/children/{child_id}/stats", response_model=ChildMonthStatsResponse)
+async def get_child_month_stats(
+    child_id: int,
+    year: int = Query(..., ge=2020),
+    month: int = Query(..., ge=1, le=12),
+    current_user: User = Depends(require_roles([Role.parent])),
+    db: Session = Depends(get_db)
+):
+    """Get child's monthly statistics (lessons, minutes, subjects, ratings, grades)"""
+    from app.services.parent import ParentService
+    
+    parent_service = ParentService(db)
+    stats = parent_service.get_child_month_stats(current_user.id, child_id, year, month)
+    if not stats:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Child not found or access denied"
+        )
+    return ChildMonthStatsResponse.model_validate(stats)
+
 @router.get("/reports", response_model=ReportsResponse)
 async def get_reports(
     page: int = Query(1, ge=1),
@@ -125,14 +145,13 @@ async def get_report(
 @router.get("/reports/{report_id}/download")
 async def download_report(
     report_id: int,
+    request: Request,
     current_user: User = Depends(require_roles([Role.parent])),
     db: Session = Depends(get_db)
 ):
     """Download report PDF"""
-    from fastapi.responses import StreamingResponse
+    from app.core.downloads import download_response
     from app.services.parent import ParentService
-    from app.core.storage import storage
-    import io
     
     parent_service = ParentService(db)
     report = parent_service.get_report(current_user.id, report_id)
@@ -149,15 +168,9 @@ async def download_report(
         )
     
     try:
-        # Get file from storage
-        file_stream = storage.download_stream(report.pdf_path)
-        
-        return StreamingResponse(
-            io.BytesIO(file_stream.read()),
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f"attachment; filename=report_{report.id}.pdf"
-            }
+        # A blocchi dallo storage, con Range per i visualizzatori PDF
+        return await download_response(
+            request, report.pdf_path, media_type="application/pdf", filename=f"report_{report.id}.pdf"
         )
     except Exception as e:
         raise HTTPException(
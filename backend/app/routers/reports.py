@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
@@ -6,7 +6,7 @@ from app.core.db import get_db
 from app.core.security import get_current_user, require_roles
 from app.models.user import User, Role
 from app.models.report import Report
-from app.schemas.report import ReportResponse, ReportListResponse
+from app.schemas.report import ReportResponse, ReportListResponse, MonthlyReportProgress
 from app.services.reports import ReportService
 
 router = APIRouter()
@@ -75,13 +75,12 @@ async def get_report(
 @router.get("/{report_id}/download")
 async def download_report(
     report_id: int,
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Download report PDF"""
-    from fastapi.responses import StreamingResponse
-    from app.core.storage import storage
-    import io
+    from app.core.downloads import download_response
     
     report_service = ReportService(db)
     
@@ -112,15 +111,9 @@ async def download_report(
         )
     
     try:
-        # Get file from storage
-        file_stream = storage.download_stream(report.pdf_path)
-        
-        return StreamingResponse(
-            io.BytesIO(file_stream.read()),
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f"attachment; filename=report_{report.id}.pdf"
-            }
+        # A blocchi dallo storage, con Range per i visualizzatori PDF
+        return await download_response(
+            request, report.pdf_path, media_type="application/pdf", filename=f"report_{report.id}.pdf"
         )
     except Exception as e:
         raise HTTPException(
@@ -146,4 +139,40 @@ async def generate_monthly_report(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error generating report: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+@router.post("/monthly-runs", response_model=MonthlyReportProgress, status_code=status.HTTP_202_ACCEPTED)
+async def start_monthly_reports_run(
+    month: int = Query(..., ge=1, le=12),
+    year: int = Query(..., ge=2020),
+    current_user: User = Depends(require_roles([Role.admin])),
+    db: Session = Depends(get_db)
+):
+    """Accoda i report mensili di tutti gli studenti attivi (riprende saltando quelli già pubblicati)"""
+    report_service = ReportService(db)
+
+    try:
+        report_service.dispatch_monthly_reports(year, month)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Coda report non disponibile: {str(e)}"
+        )
+    return report_service.monthly_progress(year, month)
+
+
+@router.get("/monthly-runs/{year}/{month}", response_model=MonthlyReportProgress)
+async def get_monthly_reports_progress(
+    year: int,
+    month: int,
+    current_user: User = Depends(require_roles([Role.admin])),
+    db: Session = Depends(get_db)
+):
+    """Avanzamento della generazione dei report mensili"""
+    if not 1 <= month <= 12:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Mese non valido"
+        )
+    return ReportService(db).monthly_progress(year, month)
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from app.core.db import get_db
+from app.core.security import get_current_user
+from app.models.user import User
+from app.schemas.search import SearchResponse
+from app.services.search import SearchService
+
+router = APIRouter()
+
+
+@router.get("/", response_model=SearchResponse)
+def search(
+    q: str = Query(..., min_length=2, max_length=200),
+    limit: int = Query(20, ge=1, le=50),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Ricerca full-text negli appunti delle lezioni e nei compiti dell'utente"""
+    hits = SearchService(db).search(current_user, q, limit)
+    return SearchResponse(query=q, total=len(hits), results=hits)
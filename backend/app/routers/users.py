@@ -1,4 +1,13 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.dependencies import get_db
+from app.core.security import get_current_user
+from app.models.notification import NotificationPreference
+from app.models.user import User
+from app.schemas.notification import NotificationPreferenceResponse, NotificationPreferenceUpdate
+from app.services.notification_digest import NotificationDigestService
 
 router = APIRouter()
 
@@ -6,3 +15,40 @@ router = APIRouter()
 # - GET /profile
 # - PUT /profile
 # - GET /tutors (for students to browse)
+
+
+def _preference_response(db: Session, user: User) -> NotificationPreferenceResponse:
+    """Preferenze effettive: quelle salvate o, in mancanza, i default del ruolo"""
+    window = NotificationDigestService(db).digest_windows([user])[user.id]
+    return NotificationPreferenceResponse(
+        digest_enabled=window is not None,
+        digest_window_minutes=window or settings.NOTIFICATION_DIGEST_WINDOW_MINUTES
+    )
+
+
+@router.get("/me/notification-preferences", response_model=NotificationPreferenceResponse)
+async def get_notification_preferences(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Preferenze di notifica dell'utente corrente (digest e finestra)"""
+    return _preference_response(db, current_user)
+
+
+@router.put("/me/notification-preferences", response_model=NotificationPreferenceResponse)
+async def update_notification_preferences(
+    preferences: NotificationPreferenceUpdate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Attiva o disattiva il digest; le notifiche urgenti arrivano comunque subito"""
+    preference = db.query(NotificationPreference).filter(
+        NotificationPreference.user_id == current_user.id
+    ).first()
+    if preference is None:
+        preference = NotificationPreference(user_id=current_user.id)
+        db.add(preference)
+    preference.digest_enabled = preferences.digest_enabled
+    preference.digest_window_minutes = preferences.digest_window_minutes
+    db.commit()
+    return _preference_response(db, current_user)
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from typing import Dict, Any, List, Optional
+from typing import AsyncIterator, Callable, Dict, Any, List, Optional, Union
 from datetime import datetime
 from app.core.db import get_db
 from app.core.security import get_current_user
@@ -9,6 +10,9 @@ from app.models.user import User
 from app.services.agora import AgoraService
 from app.routers.auth import require_roles
 from app.models.user import Role
+from dataclasses import asdict
+from app.services.notes_pipeline import NotesProgress, TranscriptNotesPipeline
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -468,6 +472,7 @@ async def get_notes(
 class GenerateNotesRequest(BaseModel):
     lesson_id: int
     transcript: str
+    regenerate: bool = False  # True: ignora la cache delle risposte AI
 
 class GenerateNotesResponse(BaseModel):
     notes: str
@@ -475,6 +480,45 @@ class GenerateNotesResponse(BaseModel):
 class SaveNotesRequest(BaseModel):
     notes: str
 
+def _fallback_notes(lesson, tutor: User, transcript: str) -> str:
+    """Appunti senza AI: trascrizione formattata"""
+    from app.services.assignments import display_name
+
+    return f"""# Appunti Lezione - {lesson.subject}
+
+📅 Data: {lesson.start_at.strftime('%d/%m/%Y alle %H:%M')}
+👨‍🏫 Tutor: {display_name(tutor, "Tutor")}
+
+## 📝 Trascrizione
+
+{transcript}
+
+---
+_Appunti generati automaticamente dalla trascrizione della lezione_
+"""
+
+
+def _notes_pipeline(tutor_id: int, regenerate: bool) -> TranscriptNotesPipeline:
+    from app.core.llm import llm_client
+
+    def complete(messages):
+        return llm_client.complete(
+            messages, temperature=0.3, max_tokens=3000, tutor_id=tutor_id,
+            cache=not regenerate, feature="video_notes"
+        )
+
+    return TranscriptNotesPipeline(complete)
+
+
+def _get_tutor_lesson(db: Session, lesson_id: int, tutor_id: int):
+    from app.models.lesson import Lesson
+
+    lesson = db.query(Lesson).filter(Lesson.id == lesson_id).first()
+    if not lesson or lesson.tutor_id != tutor_id:
+        raise HTTPException(status_code=403, detail="Solo il tutor della lezione può generare appunti")
+    return lesson
+
+
 @router.post("/generate-notes", response_model=GenerateNotesResponse)
 async def generate_lesson_notes(
     payload: GenerateNotesRequest,
@@ -485,85 +529,24 @@ async def generate_lesson_notes(
     Genera appunti formattati dalla trascrizione usando OpenAI
     """
     try:
-        from app.models.lesson import Lesson
-        from app.core.config import settings
-        from openai import OpenAI
+        from app.core.llm import llm_client
         
         # Verifica che sia il tutor della lezione
-        lesson = db.query(Lesson).filter(Lesson.id == payload.lesson_id).first()
-        if not lesson or lesson.tutor_id != current_user.id:
-            raise HTTPException(status_code=403, detail="Solo il tutor della lezione può generare appunti")
+        lesson = _get_tutor_lesson(db, payload.lesson_id, current_user.id)
         
         # Se OpenAI non configurato, usa trascrizione diretta formattata
-        if not settings.OPENAI_API_KEY:
-            formatted_notes = f"""# Appunti Lezione - {lesson.subject}
-
-📅 Data: {lesson.start_at.strftime('%d/%m/%Y alle %H:%M')}
-👨‍🏫 Tutor: {current_user.first_name} {current_user.last_name}
-
-## 📝 Trascrizione
-
-{payload.transcript}
-
----
-_Appunti generati automaticamente dalla trascrizione della lezione_
-"""
-            return GenerateNotesResponse(notes=formatted_notes)
-        
-        # Genera appunti con OpenAI
-        client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        
-        prompt = f"""Sei un assistente educativo esperto. Trasforma questa trascrizione di una lezione di {lesson.subject} in appunti ben strutturati e facili da studiare.
-
-Trascrizione della lezione:
-{payload.transcript}
-
-Genera appunti che includano:
-1. **Titolo e Introduzione** - Breve sommario degli argomenti trattati
-2. **Concetti Chiave** - Elenco puntato dei concetti principali spiegati
-3. **Esempi e Spiegazioni** - Dettagli importanti, esempi pratici
-4. **Formule o Definizioni** - Se presenti, scrivi formule matematiche usando LaTeX
-5. **Riassunto Finale** - Breve recap di cosa è stato imparato
-
-IMPORTANTE - SINTASSI LATEX (OBBLIGATORIA):
-- Per formule inline usa SEMPRE: \\( formula \\)
-  Esempio CORRETTO: Il discriminante è \\( \\Delta = b^2 - 4ac \\)
-  Esempio SBAGLIATO: Il discriminante è (\\Delta = b^2 - 4ac)
-  
-- Per formule in blocco usa SEMPRE: $$ sulla sua linea, formula, $$
-  Esempio CORRETTO:
-  $$
-  x = \\frac{{-b \\pm \\sqrt{{\\Delta}}}}{{2a}}
-  $$
-  
-  Esempio SBAGLIATO:
-  x = \\frac{{-b \\pm \\sqrt{{\\Delta}}}}{{2a}}
-  
-- OGNI formula matematica DEVE essere racchiusa in \\( \\) o $$ $$
-- Usa sempre doppie backslash: \\frac, \\sqrt, \\Delta, \\pi
-- NON scrivere MAI formule senza delimitatori
-- NON usare parentesi tonde semplici () per formule
-
-REGOLE DI FORMATTAZIONE:
-- Scrivi in italiano chiaro e professionale
-- Usa markdown: # per titoli, ** per grassetto, - per elenchi
-- Mantieni uno stile ordinato e pulito
-- Sii fedele al contenuto della trascrizione, non inventare
-- Assicurati che TUTTE le formule matematiche siano in LaTeX corretto
-"""
-        
-        response = client.chat.completions.create(
-            model=settings.OPENAI_MODEL or "gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "Sei un assistente esperto che crea appunti scolastici ben formattati da trascrizioni di lezioni. È OBBLIGATORIO usare la sintassi LaTeX corretta: \\( \\) per formule inline e $$ $$ per formule in blocco. OGNI formula matematica deve essere racchiusa in questi delimitatori. NON scrivere MAI formule senza delimitatori."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-            max_tokens=3000
+        if not llm_client.is_enabled:
+            return GenerateNotesResponse(notes=_fallback_notes(lesson, current_user, payload.transcript))
+        
+        # Genera appunti con OpenAI (client condiviso, non blocca l'event loop);
+        # le trascrizioni lunghe passano dal map-reduce
+        pipeline = _notes_pipeline(current_user.id, payload.regenerate)
+        generated_notes = await pipeline.generate(
+            lesson.subject,
+            payload.transcript,
+            on_progress=lambda p: logger.info(f"Appunti lezione {payload.lesson_id}: {p.stage} {p.done}/{p.total}")
         )
         
-        generated_notes = (response.choices[0].message.content or "").strip()
-        
         logger.info(f"Appunti generati per lezione {payload.lesson_id} - {len(generated_notes)} caratteri")
         
         return GenerateNotesResponse(notes=generated_notes)
@@ -575,6 +558,97 @@ REGOLE DI FORMATTAZIONE:
         raise HTTPException(status_code=500, detail=f"Errore generazione appunti: {str(e)}")
 
 
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def stream_lesson_notes(
+    lesson_id: int,
+    chunks: AsyncIterator[Union[NotesProgress, str]],
+    session_factory: Callable[[], Session],
+) -> AsyncIterator[str]:
+    """
+    Inoltra i token come eventi SSE e salva il testo completo a fine stream.
+
+    Se il client si disconnette Starlette cancella questo generatore: il
+    ``finally`` chiude lo stream upstream e non viene salvato nulla.
+    """
+    parts: List[str] = []
+    try:
+        async for delta in chunks:
+            if isinstance(delta, NotesProgress):
+                yield _sse("progress", asdict(delta))
+                continue
+            parts.append(delta)
+            yield _sse("token", {"delta": delta})
+    except Exception as e:
+        logger.error(f"Errore streaming appunti lezione {lesson_id}: {e}")
+        yield _sse("error", {"detail": "Errore generazione appunti"})
+        return
+    finally:
+        aclose = getattr(chunks, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+    notes = "".join(parts).strip()
+    from app.models.lesson import Lesson
+
+    db = session_factory()
+    try:
+        lesson = db.query(Lesson).filter(Lesson.id == lesson_id).first()
+        if lesson:
+            lesson.notes_text = notes
+            db.commit()
+    finally:
+        db.close()
+
+    logger.info(f"Appunti in streaming salvati per lezione {lesson_id} - {len(notes)} caratteri")
+    yield _sse("done", {"lesson_id": lesson_id, "notes_length": len(notes)})
+
+
+@router.post("/generate-notes/stream")
+async def stream_generate_lesson_notes(
+    payload: GenerateNotesRequest,
+    current_user: User = Depends(require_roles([Role.tutor])),
+    db: Session = Depends(get_db)
+):
+    """
+    Come /generate-notes ma inoltra i token via Server-Sent Events
+    (event: progress | token | done | error). Il testo finale viene salvato nella lezione.
+    """
+    from app.core.db import SessionLocal
+    from app.core.llm import llm_client
+
+    lesson = _get_tutor_lesson(db, payload.lesson_id, current_user.id)
+
+    if llm_client.is_enabled:
+        pipeline = _notes_pipeline(current_user.id, payload.regenerate)
+        chunks = pipeline.stream(
+            lesson.subject,
+            payload.transcript,
+            lambda messages: llm_client.stream(
+                messages,
+                temperature=0.3,
+                max_tokens=3000,
+                tutor_id=current_user.id,
+                cache=not payload.regenerate,
+                feature="video_notes"
+            )
+        )
+    else:
+        fallback = _fallback_notes(lesson, current_user, payload.transcript)
+
+        async def single_chunk():
+            yield fallback
+        chunks = single_chunk()
+
+    return StreamingResponse(
+        stream_lesson_notes(lesson.id, chunks, SessionLocal),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.post("/save-notes/{lesson_id}")
 async def save_lesson_notes(
     lesson_id: int,
@@ -586,7 +660,8 @@ async def save_lesson_notes(
     Salva gli appunti confermati dal tutor nella lezione
     """
     try:
-        from app.models.lesson import Lesson
+        from app.models.lesson import Lesson, LessonStatus
+        from app.services.student_stats import StudentMonthStatsService
         
         # Verifica che sia il tutor della lezione
         lesson = db.query(Lesson).filter(Lesson.id == lesson_id).first()
@@ -595,6 +670,8 @@ async def save_lesson_notes(
         
         # Salva appunti nella lezione
         lesson.notes_text = payload.notes
+        if lesson.status != LessonStatus.completed:
+            StudentMonthStatsService(db).lesson_completed(lesson)
         lesson.status = "completed"  # Marca lezione come completata
         db.commit()
         
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, date
 
 class AdminStatsResponse(BaseModel):
     total_users: int
@@ -20,7 +20,7 @@ class PaymentRefund(BaseModel):
 
 # Import existing schemas for responses
 from app.schemas.auth import UserResponse
-from app.schemas.lesson import LessonResponse
+from app.schemas.lesson import LessonSummaryResponse
 from app.schemas.payment import PaymentResponse
 
 class UserListResponse(BaseModel):
@@ -30,7 +30,7 @@ class UserListResponse(BaseModel):
     size: int
 
 class LessonListResponse(BaseModel):
-    data: List[LessonResponse]
+    data: List[LessonSummaryResponse]
     total: int
     page: int
     size: int
@@ -40,3 +40,24 @@ class PaymentListResponse(BaseModel):
     total: int
     page: int
     size: int
+
+
+class AIUsageTotals(BaseModel):
+    calls: int
+    cache_hits: int
+    prompt_tokens: int
+    completion_tokens: int
+    avg_latency_ms: int
+    estimated_cost_usd: float
+
+class AIUsageDay(AIUsageTotals):
+    day: date
+
+class AIUsageFeature(AIUsageTotals):
+    feature: str
+
+class AIUsageRollupResponse(BaseModel):
+    since: datetime
+    days: int
+    by_day: List[AIUsageDay]
+    by_feature: List[AIUsageFeature]
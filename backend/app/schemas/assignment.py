@@ -19,6 +19,26 @@ class AssignmentCreate(BaseModel):
             raise ValueError('La data di scadenza deve essere nel futuro')
         return v
 
+class AssignmentBulkCreate(BaseModel):
+    title: str = Field(..., min_length=1, max_length=255, description="Titolo del compito")
+    description: str = Field(..., min_length=1, description="Descrizione del compito")
+    instructions: str = Field(..., min_length=1, description="Istruzioni dettagliate per il compito")
+    subject: str = Field(..., min_length=1, max_length=100, description="Materia del compito")
+    due_date: datetime = Field(..., description="Data e ora di scadenza")
+    points: int = Field(100, ge=1, le=1000, description="Punti massimi del compito")
+    student_ids: List[int] = Field(..., min_length=1, max_length=200, description="ID degli studenti della classe")
+    is_published: bool = Field(False, description="Se il compito è pubblicato")
+
+    @validator('due_date')
+    def validate_due_date(cls, v):
+        if v <= datetime.utcnow():
+            raise ValueError('La data di scadenza deve essere nel futuro')
+        return v
+
+    @validator('student_ids')
+    def dedupe_student_ids(cls, v):
+        return list(dict.fromkeys(v))
+
 class AssignmentUpdate(BaseModel):
     title: Optional[str] = Field(None, min_length=1, max_length=255)
     description: Optional[str] = Field(None, min_length=1)
@@ -87,9 +107,16 @@ class AssignmentGenerateRequest(BaseModel):
     difficulty: str = Field(..., description="Difficoltà (easy|medium|hard)")
     subject: str = Field(..., min_length=2, description="Materia")
     student_id: int = Field(..., description="ID dello studente destinatario")
+    regenerate: bool = Field(False, description="Ignora le bozze in cache e genera di nuovo")
 
 class AssignmentDraftResponse(BaseModel):
     title: str
     description: str
     instructions: str
     solutions: str
+
+class AssignmentGenerateJobResponse(BaseModel):
+    job_id: Optional[str] = None  # assente se la bozza arriva dalla cache
+    status: str  # pending | running | completed | failed
+    draft: Optional[AssignmentDraftResponse] = None
+    error: Optional[str] = None
@@ -39,7 +39,8 @@ class LessonComplete(BaseModel):
     objectives_achieved: Optional[bool] = None
 
 
-class LessonResponse(BaseModel):
+class LessonSummaryResponse(BaseModel):
+    """Lezione senza i testi lunghi (appunti, note, obiettivi): usata nelle liste"""
     id: int
     student_id: int
     tutor_id: int
@@ -48,10 +49,9 @@ class LessonResponse(BaseModel):
     end_at: datetime
     status: LessonStatus
     room_slug: Optional[str] = None
-    notes_text: Optional[str] = None
     notes_pdf_path: Optional[str] = None
-    tutor_notes: Optional[str] = None
-    objectives: Optional[str] = None
+    has_notes: bool = False
+    notes_preview: Optional[str] = None  # Primi caratteri degli appunti (solo se caricati)
     price: Optional[float] = None
     created_at: datetime
     updated_at: datetime
@@ -62,8 +62,15 @@ class LessonResponse(BaseModel):
         from_attributes = True
 
 
+class LessonResponse(LessonSummaryResponse):
+    """Dettaglio lezione completo di appunti, note del tutor e obiettivi"""
+    notes_text: Optional[str] = None
+    tutor_notes: Optional[str] = None
+    objectives: Optional[str] = None
+
+
 class LessonListResponse(BaseModel):
-    lessons: List[LessonResponse]
+    lessons: List[LessonSummaryResponse]
     total: int
     page: int
     size: int
@@ -0,0 +1,13 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+class NotificationPreferenceUpdate(BaseModel):
+    digest_enabled: bool
+    digest_window_minutes: Optional[int] = Field(None, ge=5, le=24 * 60)
+
+class NotificationPreferenceResponse(BaseModel):
+    digest_enabled: bool
+    digest_window_minutes: int
+
+    class Config:
+        from_attributes = True
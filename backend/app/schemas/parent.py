@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 class ParentStatsResponse(BaseModel):
@@ -19,6 +19,19 @@ class ChildResponse(BaseModel):
     is_active: bool
     created_at: datetime
 
+class ChildMonthStatsResponse(BaseModel):
+    year: int
+    month: int
+    lessons_completed: int = 0
+    minutes: int = 0
+    subject_counts: Dict[str, int] = {}
+    average_rating: float = 0.0
+    assignments_graded: int = 0
+    average_grade: float = 0.0
+
+    class Config:
+        from_attributes = True
+
 class ChildrenResponse(BaseModel):
     data: List[ChildResponse]
     total: int
@@ -26,11 +39,11 @@ class ChildrenResponse(BaseModel):
     size: int
 
 # Import existing schemas for responses
-from app.schemas.lesson import LessonResponse
+from app.schemas.lesson import LessonSummaryResponse
 from app.schemas.report import ReportResponse
 
 class ChildLessonsResponse(BaseModel):
-    data: List[LessonResponse]
+    data: List[LessonSummaryResponse]
     total: int
     page: int
     size: int
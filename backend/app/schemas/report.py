@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 from datetime import datetime
 from app.models.report import ReportStatus
 
@@ -34,3 +34,14 @@ class ReportUpdate(BaseModel):
     title: Optional[str] = None
     content: Optional[str] = None
     status: Optional[ReportStatus] = None
+
+
+class MonthlyReportProgress(BaseModel):
+    year: int
+    month: int
+    total_students: int
+    published: int
+    failed: int
+    generating: int
+    pending: int
+    run: Optional[Dict[str, Any]] = None  # stato dell'ultimo run (riepilogo del chord a fine run)
@@ -0,0 +1,22 @@
+from pydantic import BaseModel
+from typing import List, Literal
+from datetime import datetime
+
+
+class SearchHit(BaseModel):
+    kind: Literal["lesson", "assignment"]
+    id: int
+    title: str
+    subject: str
+    date: datetime
+    rank: float
+    snippet: str  # frammento con i termini racchiusi in <mark>...</mark>
+
+    class Config:
+        from_attributes = True
+
+
+class SearchResponse(BaseModel):
+    query: str
+    total: int
+    results: List[SearchHit]
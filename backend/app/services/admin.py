@@ -1,4 +1,4 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, undefer, undefer_group
 from sqlalchemy import func, desc
 from typing import List, Tuple, Optional
 from datetime import datetime, timedelta
@@ -84,7 +84,7 @@ class AdminService:
 
     def get_lessons(self, page: int, size: int, status: Optional[str] = None) -> Tuple[List[Lesson], int]:
         """Get lessons with pagination and optional status filter"""
-        query = self.db.query(Lesson)
+        query = self.db.query(Lesson).options(undefer(Lesson.notes_preview))
         
         if status:
             try:
@@ -94,14 +94,14 @@ class AdminService:
                 # Invalid status, return empty results
                 return [], 0
 
-        total = query.count()
+        total = query.with_entities(func.count(Lesson.id)).scalar()
         lessons = query.order_by(desc(Lesson.created_at)).offset((page - 1) * size).limit(size).all()
         
         return lessons, total
 
     def get_lesson(self, lesson_id: int) -> Optional[Lesson]:
         """Get lesson by ID"""
-        return self.db.query(Lesson).filter(Lesson.id == lesson_id).first()
+        return self.db.query(Lesson).options(undefer_group("notes")).filter(Lesson.id == lesson_id).first()
 
     def get_payments(self, page: int, size: int, status: Optional[str] = None) -> Tuple[List[Payment], int]:
         """Get payments with pagination and optional status filter"""
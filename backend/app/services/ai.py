@@ -1,47 +1,35 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, undefer_group
 from fastapi import HTTPException, status
 from typing import Optional, Dict, Any
-from openai import OpenAI
 from datetime import datetime, timedelta
 import json
-import os
 import io
+import uuid
 from app.core.config import settings
 from app.core.celery_app import celery_app
+from app.core.cache import result_cache, content_key
+from app.core.llm import llm_client
 from app.core.storage import storage
 from app.models.lesson import Lesson
 from app.models.report import Report, ReportStatus
-from jinja2 import Environment, FileSystemLoader
-# from weasyprint import HTML  # Disabled due to system dependencies
+from app.services.pdf import pdf_renderer, lesson_notes_context
 
 
 class AIService:
     """AI service for generating lesson notes and reports"""
     
     def __init__(self):
-        self.is_enabled = False
-        self.client: Optional[OpenAI] = None
-        if settings.OPENAI_API_KEY:
-            try:
-                self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
-                self.is_enabled = True
-            except Exception:
-                self.client = None
-                self.is_enabled = False
-        else:
+        self.is_enabled = llm_client.is_enabled
+        if not self.is_enabled:
             # In development, AI is optional
-            print("⚠️  OpenAI API key not configured - AI features disabled")
-        
-        # Setup Jinja2 for PDF templates
-        template_dir = os.path.join(os.path.dirname(__file__), "..", "templates")
-        self.jinja_env = Environment(loader=FileSystemLoader(template_dir))
+            print(f"⚠️  LLM provider '{llm_client.provider.name}' not configured - AI features disabled")
     
-    def generate_lesson_notes(self, lesson_id: int, db: Session) -> str:
-        """Generate AI notes for a completed lesson"""
+    def generate_lesson_notes(self, lesson_id: int, db: Session, regenerate: bool = False) -> str:
+        """Generate AI notes for a completed lesson (regenerate=True ignora la cache)"""
         if not self.is_enabled:
             return "AI features are disabled. Please configure OpenAI API key."
         
-        lesson = db.query(Lesson).filter(Lesson.id == lesson_id).first()
+        lesson = db.query(Lesson).options(undefer_group("notes")).filter(Lesson.id == lesson_id).first()
         if not lesson:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -64,7 +52,7 @@ class AIService:
         context = self._prepare_lesson_context(lesson)
         
         # Generate notes with OpenAI
-        notes = self._generate_notes_with_openai(context)
+        notes = self._generate_notes_with_openai(context, use_cache=not regenerate)
         
         # Save notes to lesson
         lesson.notes_text = notes
@@ -82,6 +70,7 @@ class AIService:
         """Prepare context for AI note generation"""
         return {
             "subject": lesson.subject,
+            "tutor_id": lesson.tutor_id,
             "tutor_notes": lesson.tutor_notes,
             "objectives": lesson.objectives,
             "duration_minutes": lesson.duration_minutes,
@@ -91,7 +80,7 @@ class AIService:
             "school_level": lesson.student.student_profile.school_level if lesson.student.student_profile else None
         }
     
-    def _generate_notes_with_openai(self, context: Dict[str, Any]) -> str:
+    def _generate_notes_with_openai(self, context: Dict[str, Any], use_cache: bool = True) -> str:
         """Generate lesson notes using OpenAI"""
         prompt = f"""
 Sei un tutor esperto. Genera appunti chiari e ben formattati (in italiano) della lezione appena svolta.
@@ -114,18 +103,17 @@ IMPORTANTE: Non inventare contenuti. Usa solo le informazioni fornite. Se mancan
 """
         
         try:
-            if not self.client:
-                raise RuntimeError("OpenAI client non inizializzato")
-            response = self.client.chat.completions.create(
-                model=settings.OPENAI_MODEL or "gpt-4o-mini",
-                messages=[
+            return llm_client.complete_sync(
+                [
                     {"role": "system", "content": "Sei un tutor esperto che genera appunti chiari e strutturati per studenti."},
                     {"role": "user", "content": prompt}
                 ],
                 max_tokens=1000,
-                temperature=0.7
+                temperature=0.7,
+                tutor_id=context.get("tutor_id"),
+                cache=use_cache,
+                feature="lesson_notes"
             )
-            return (response.choices[0].message.content or "").strip()
             
         except Exception as e:
             raise HTTPException(
@@ -136,21 +124,8 @@ IMPORTANTE: Non inventare contenuti. Usa solo le informazioni fornite. Se mancan
     def _generate_lesson_pdf(self, lesson: Lesson, notes: str) -> Optional[str]:
         """Generate PDF for lesson notes"""
         try:
-            template = self.jinja_env.get_template("lesson_notes.html")
-            
-            context = {
-                "student_name": f"{lesson.student.student_profile.first_name} {lesson.student.student_profile.last_name}" if lesson.student.student_profile else "Studente",
-                "tutor_name": f"{lesson.tutor.tutor_profile.first_name} {lesson.tutor.tutor_profile.last_name}" if lesson.tutor.tutor_profile else "Tutor",
-                "subject": lesson.subject,
-                "date": lesson.start_at.strftime("%d/%m/%Y"),
-                "notes_html": notes.replace("\n", "<br>")
-            }
-            
-            html_content = template.render(**context)
-            
-            # Generate PDF - Temporarily disabled due to weasyprint dependencies
-            # pdf_bytes = HTML(string=html_content).write_pdf()
-            pdf_bytes = html_content.encode('utf-8')  # Return HTML as bytes for now
+            # Rendering nel pool di processi PDF (template e CSS già compilati)
+            pdf_bytes = pdf_renderer.render_lesson_notes(lesson_notes_context(lesson, notes))
             
             # Save to storage
             filename = f"lesson_notes_{lesson.id}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.pdf"
@@ -177,11 +152,18 @@ IMPORTANTE: Non inventare contenuti. Usa solo le informazioni fornite. Se mancan
                 for lesson in context['lessons']
             ])
             
+            subjects_summary = ", ".join(
+                f"{subject} ({count})" for subject, count in context.get('subjects', {}).items()
+            )
+            
             prompt = f"""
             Genera un report mensile per {context['student_name']} per il mese di {context['month']}/{context['year']}.
             
-            Lezioni completate ({context['total_lessons']}):
+            Lezioni completate ({context['total_lessons']}, {context.get('total_minutes', 0)} minuti in totale):
             {lessons_summary}
+
+            Materie: {subjects_summary or 'n/d'}
+            Compiti valutati: {context.get('assignments_graded', 0)} (media voti: {context.get('average_grade') or 'n/d'})
             
             Il report deve includere:
             1. Un riepilogo generale del progresso
@@ -191,33 +173,24 @@ IMPORTANTE: Non inventare contenuti. Usa solo le informazioni fornite. Se mancan
             
             Scrivi in italiano, in modo professionale ma comprensibile per i genitori.
             """
-            if not self.client:
-                raise RuntimeError("OpenAI client non inizializzato")
-            response = self.client.chat.completions.create(
-                model=settings.OPENAI_MODEL or "gpt-4o-mini",
-                messages=[
+            return llm_client.complete_sync(
+                [
                     {"role": "system", "content": "Sei un tutor esperto che scrive report mensili per genitori. Scrivi in modo professionale e costruttivo."},
                     {"role": "user", "content": prompt}
                 ],
                 max_tokens=1000,
-                temperature=0.7
+                temperature=0.7,
+                feature="monthly_report"
             )
-            return (response.choices[0].message.content or "").strip()
             
         except Exception as e:
             print(f"Error generating monthly report: {e}")
             return f"Report mensile per {context['student_name']} - {context['month']}/{context['year']}\n\n{context['total_lessons']} lezioni completate questo mese."
     
-    def render_pdf(self, html_content: str) -> bytes:
-        """Render HTML to PDF - Currently disabled due to system dependencies"""
-        # TODO: Install system dependencies for WeasyPrint or use alternative
-        # return HTML(string=html_content).write_pdf()
-        return html_content.encode('utf-8')  # Return HTML as bytes for now
-
 
 # Celery tasks
 @celery_app.task
-def generate_lesson_notes_task(lesson_id: int):
+def generate_lesson_notes_task(lesson_id: int, regenerate: bool = False):
     """Celery task to generate lesson notes"""
     from app.core.db import SessionLocal
     from app.services.ai import AIService
@@ -225,7 +198,7 @@ def generate_lesson_notes_task(lesson_id: int):
     db = SessionLocal()
     try:
         ai_service = AIService()
-        notes = ai_service.generate_lesson_notes(lesson_id, db)
+        notes = ai_service.generate_lesson_notes(lesson_id, db, regenerate=regenerate)
         return {"status": "success", "lesson_id": lesson_id, "notes_length": len(notes)}
     except Exception as e:
             return {"status": "error", "lesson_id": lesson_id, "error": str(e)}
@@ -237,10 +210,13 @@ def generate_lesson_notes_task(lesson_id: int):
 ai_service = AIService()
 
 # --- Assignment generation ---
-def generate_assignment_with_openai(topic: str, difficulty: str, subject: str) -> Dict[str, str]:
+def generate_assignment_with_openai(
+    topic: str, difficulty: str, subject: str,
+    tutor_id: Optional[int] = None, use_cache: bool = True
+) -> Dict[str, str]:
     """Generate structured assignment using OpenAI."""
     model = settings.OPENAI_MODEL or "gpt-4o-mini"
-    if not settings.OPENAI_API_KEY:
+    if not llm_client.is_enabled:
         # Fallback mock con contenuto più dettagliato
         difficulty_it = {'easy': 'facile', 'medium': 'medio', 'hard': 'difficile'}.get(difficulty, difficulty)
         
@@ -333,17 +309,18 @@ Genera:
 - Alla fine un blocco 'Soluzioni' con risposte corrette
 """
     try:
-        client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        resp = client.chat.completions.create(
-            model=model,
-            messages=[
+        content = llm_client.complete_sync(
+            [
                 {"role": "system", "content": sys},
                 {"role": "user", "content": usr},
             ],
+            model=model,
             temperature=0.7,
-            max_tokens=900
+            max_tokens=900,
+            tutor_id=tutor_id,
+            cache=use_cache,
+            feature="assignment_draft"
         )
-        content = (resp.choices[0].message.content or "").strip()
         # naive split of solutions block
         parts = content.split("Soluzioni")
         title = f"Compito: {topic}"
@@ -359,88 +336,82 @@ Genera:
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"OpenAI error: {e}")
 
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
\ No newline at end of file
+
+ASSIGNMENT_DRAFT_TTL = 60 * 60 * 24 * 7  # 7 giorni
+
+
+def assignment_draft_key(topic: str, difficulty: str, subject: str) -> str:
+    """Chiave per contenuto: stesse (topic, difficulty, subject, model) -> stessa bozza"""
+    def norm(value: str) -> str:
+        return " ".join(value.split()).casefold()
+
+    return content_key(
+        "ai:assignment-draft",
+        topic=norm(topic),
+        difficulty=norm(difficulty),
+        subject=norm(subject),
+        model=settings.OPENAI_MODEL or "gpt-4o-mini",
+    )
+
+
+def generate_assignment_draft(
+    topic: str, difficulty: str, subject: str,
+    tutor_id: Optional[int] = None, regenerate: bool = False
+) -> Dict[str, str]:
+    """Bozza di compito dalla cache se già generata (salvo regenerate), altrimenti da OpenAI"""
+    if not llm_client.is_enabled:
+        # Bozza di esempio: gratuita e da non salvare in cache
+        return generate_assignment_with_openai(topic, difficulty, subject)
+
+    key = assignment_draft_key(topic, difficulty, subject)
+    cached = None if regenerate else result_cache.get_json(key)
+    if cached is not None:
+        return cached
+
+    draft = generate_assignment_with_openai(
+        topic, difficulty, subject, tutor_id=tutor_id, use_cache=not regenerate
+    )
+    result_cache.set_json(key, draft, ASSIGNMENT_DRAFT_TTL)
+    return draft
+
+
+def get_cached_assignment_draft(topic: str, difficulty: str, subject: str) -> Optional[Dict[str, str]]:
+    if not llm_client.is_enabled:
+        return None
+    return result_cache.get_json(assignment_draft_key(topic, difficulty, subject))
+
+
+ASSIGNMENT_JOB_TTL = 60 * 60  # come result_expires di Celery
+
+
+def assignment_job_key(job_id: str) -> str:
+    return f"ai:assignment-job:{job_id}"
+
+
+def start_assignment_draft_job(
+    tutor_id: int, topic: str, difficulty: str, subject: str, regenerate: bool = False
+) -> str:
+    """Accoda la generazione in background; il tutor proprietario è registrato prima dell'invio"""
+    job_id = str(uuid.uuid4())
+    result_cache.set_json(assignment_job_key(job_id), tutor_id, ASSIGNMENT_JOB_TTL)
+    generate_assignment_draft_task.apply_async(
+        args=(tutor_id, topic, difficulty, subject, regenerate), task_id=job_id
+    )
+    return job_id
+
+
+def assignment_job_owner(job_id: str) -> Optional[int]:
+    """Tutor che ha avviato il job; None se sconosciuto o scaduto"""
+    return result_cache.get_json(assignment_job_key(job_id))
+
+
+@celery_app.task(name="app.services.ai.generate_assignment_draft")
+def generate_assignment_draft_task(tutor_id: int, topic: str, difficulty: str, subject: str, regenerate: bool = False):
+    """Genera una bozza di compito in background (ai_queue)"""
+    try:
+        draft = generate_assignment_draft(topic, difficulty, subject, tutor_id=tutor_id, regenerate=regenerate)
+        return {"status": "success", "tutor_id": tutor_id, "draft": draft}
+    except HTTPException as e:
+        return {"status": "error", "tutor_id": tutor_id, "error": e.detail}
+    except Exception as e:
+        return {"status": "error", "tutor_id": tutor_id, "error": str(e)}
@@ -0,0 +1,78 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, case
+from typing import Dict
+from datetime import datetime, timedelta, date
+from app.core.config import settings
+from app.models.ai_usage import AIUsage
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Costo stimato in USD dai prezzi per milione di token in settings"""
+    prices = settings.LLM_PRICES_PER_MILLION.get(model)
+    if not prices:
+        return 0.0
+    return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+
+
+class AIUsageService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def rollup(self, days: int = 30) -> dict:
+        """Totali per giorno e per feature degli ultimi ``days`` giorni"""
+        since = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days - 1)
+        day = func.date(AIUsage.created_at)
+
+        # Una sola query raggruppata per (giorno, feature, modello): il modello serve per il costo
+        rows = self.db.query(
+            day.label("day"),
+            AIUsage.feature,
+            AIUsage.model,
+            func.count(AIUsage.id).label("calls"),
+            func.sum(case((AIUsage.cache_hit.is_(True), 1), else_=0)).label("cache_hits"),
+            func.sum(AIUsage.prompt_tokens).label("prompt_tokens"),
+            func.sum(AIUsage.completion_tokens).label("completion_tokens"),
+            func.sum(AIUsage.latency_ms).label("latency_ms"),
+        ).filter(
+            AIUsage.created_at >= since
+        ).group_by(day, AIUsage.feature, AIUsage.model).all()
+
+        by_day: Dict[date, Dict] = {}
+        by_feature: Dict[str, Dict] = {}
+        for row in rows:
+            row_day = row.day if isinstance(row.day, date) else date.fromisoformat(str(row.day))
+            for bucket, key in ((by_day, row_day), (by_feature, row.feature)):
+                totals = bucket.setdefault(key, {
+                    "calls": 0, "cache_hits": 0, "prompt_tokens": 0,
+                    "completion_tokens": 0, "latency_ms": 0, "estimated_cost_usd": 0.0,
+                })
+                totals["calls"] += row.calls
+                totals["cache_hits"] += row.cache_hits or 0
+                totals["prompt_tokens"] += row.prompt_tokens or 0
+                totals["completion_tokens"] += row.completion_tokens or 0
+                totals["latency_ms"] += row.latency_ms or 0
+                totals["estimated_cost_usd"] += estimate_cost(
+                    row.model, row.prompt_tokens or 0, row.completion_tokens or 0
+                )
+
+        return {
+            "since": since,
+            "days": days,
+            "by_day": [{"day": key, **self._finalize(totals)} for key, totals in sorted(by_day.items())],
+            "by_feature": sorted(
+                ({"feature": key, **self._finalize(totals)} for key, totals in by_feature.items()),
+                key=lambda item: item["estimated_cost_usd"],
+                reverse=True
+            ),
+        }
+
+    @staticmethod
+    def _finalize(totals: Dict) -> Dict:
+        calls = totals.pop("calls")
+        latency_ms = totals.pop("latency_ms")
+        return {
+            "calls": calls,
+            **totals,
+            "avg_latency_ms": round(latency_ms / calls) if calls else 0,
+            "estimated_cost_usd": round(totals["estimated_cost_usd"], 4),
+        }
@@ -1,14 +1,16 @@
 from datetime import datetime
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, desc
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import and_, or_, desc, insert
 from fastapi import HTTPException, status
 
 from app.models.assignment import Assignment, AssignmentSubmission, AssignmentStatus
 from app.models.user import User, TutorProfile, StudentProfile
+from app.services.student_stats import StudentMonthStatsService
 from app.schemas.assignment import (
-    AssignmentCreate, AssignmentUpdate, AssignmentGrading,
-    AssignmentSubmissionCreate, AssignmentSubmissionUpdate
+    AssignmentCreate, AssignmentBulkCreate, AssignmentUpdate, AssignmentGrading,
+    AssignmentSubmissionCreate, AssignmentSubmissionUpdate,
+    AssignmentResponse, AssignmentSubmissionResponse
 )
 
 class AssignmentService:
@@ -52,6 +54,40 @@ class AssignmentService:
         
         return assignment
 
+    def create_assignments_bulk(self, assignment_data: AssignmentBulkCreate, tutor_id: int) -> List[Assignment]:
+        """Crea lo stesso compito per tutti gli studenti di una classe"""
+        tutor = self.db.query(TutorProfile.id).filter(TutorProfile.user_id == tutor_id).first()
+        if not tutor:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Tutor non trovato"
+            )
+
+        # Valida tutti gli studenti con una sola query
+        student_ids = assignment_data.student_ids
+        found = {
+            user_id for (user_id,) in self.db.query(StudentProfile.user_id).filter(
+                StudentProfile.user_id.in_(student_ids)
+            )
+        }
+        missing = [sid for sid in student_ids if sid not in found]
+        if missing:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Studenti non trovati: {missing}"
+            )
+
+        body = assignment_data.model_dump(exclude={"student_ids"})
+        rows = [{**body, "tutor_id": tutor_id, "student_id": sid} for sid in student_ids]
+
+        # Un unico INSERT multi-riga con RETURNING, un solo commit
+        created = self.db.scalars(insert(Assignment).returning(Assignment), rows).all()
+        ids = [assignment.id for assignment in created]
+        self.db.commit()
+
+        # Dopo il commit gli oggetti sono scaduti: ricaricali con una query sola
+        return self.db.query(Assignment).filter(Assignment.id.in_(ids)).order_by(Assignment.id).all()
+
     def get_assignments_for_student(self, student_id: int, include_completed: bool = True) -> List[Assignment]:
         """Ottiene i compiti di uno studente"""
         query = self.db.query(Assignment).filter(Assignment.student_id == student_id)
@@ -224,11 +260,18 @@ class AssignmentService:
             )
         
         # Aggiorna la valutazione
+        # Rivalutazione: il voto precedente viene sostituito negli aggregati mensili
+        previous = (
+            (submission.grade, submission.graded_at)
+            if submission.status == AssignmentStatus.graded and submission.grade is not None
+            else (None, None)
+        )
         submission.grade = grading_data.grade
         submission.feedback = grading_data.feedback
         submission.status = AssignmentStatus.graded
         submission.graded_at = datetime.utcnow()
         submission.updated_at = datetime.utcnow()
+        StudentMonthStatsService(self.db).submission_graded(submission, *previous)
         
         self.db.commit()
         self.db.refresh(submission)
@@ -265,3 +308,110 @@ class AssignmentService:
                 )
             )
         ).order_by(Assignment.due_date).all()
+
+
+def display_name(user: Optional[User], default: str) -> str:
+    """Nome dal profilo studente/tutor, altrimenti l'email"""
+    if not user:
+        return default
+    profile = user.tutor_profile or user.student_profile
+    if profile:
+        return f"{profile.first_name} {profile.last_name}".strip()
+    return user.email
+
+
+class AssignmentAssembler:
+    """
+    Costruisce le risposte dei compiti in blocco.
+
+    Precarica tutor, studenti (con profili) e consegne con query IN, così
+    ogni lista costa un numero costante di query invece di 4-6 per compito.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _load_users(self, user_ids: Iterable[int]) -> Dict[int, User]:
+        ids = set(user_ids)
+        if not ids:
+            return {}
+        users = self.db.query(User).options(
+            joinedload(User.student_profile),
+            joinedload(User.tutor_profile)
+        ).filter(User.id.in_(ids)).all()
+        return {user.id: user for user in users}
+
+    def _latest_submissions(self, assignments: List[Assignment]) -> Dict[int, AssignmentSubmission]:
+        if not assignments:
+            return {}
+        student_by_assignment = {a.id: a.student_id for a in assignments}
+        submissions = self.db.query(AssignmentSubmission).filter(
+            AssignmentSubmission.assignment_id.in_(student_by_assignment.keys())
+        ).order_by(AssignmentSubmission.updated_at, AssignmentSubmission.id).all()
+
+        latest = {}
+        for submission in submissions:
+            if student_by_assignment[submission.assignment_id] == submission.student_id:
+                latest[submission.assignment_id] = submission
+        return latest
+
+    def assignments(
+        self, assignments: List[Assignment], with_submissions: bool = True
+    ) -> List[AssignmentResponse]:
+        users = self._load_users(
+            [a.tutor_id for a in assignments] + [a.student_id for a in assignments]
+        )
+        submissions = self._latest_submissions(assignments) if with_submissions else {}
+
+        result = []
+        for assignment in assignments:
+            submission = submissions.get(assignment.id)
+            result.append(AssignmentResponse(
+                id=assignment.id,
+                title=assignment.title,
+                description=assignment.description,
+                instructions=assignment.instructions,
+                subject=assignment.subject,
+                due_date=assignment.due_date,
+                points=assignment.points,
+                is_published=assignment.is_published,
+                created_at=assignment.created_at,
+                updated_at=assignment.updated_at,
+                tutor_name=display_name(users.get(assignment.tutor_id), "Tutor"),
+                student_name=display_name(users.get(assignment.student_id), "Studente"),
+                has_submission=submission is not None,
+                submission_status=submission.status if submission else None,
+                submission_grade=submission.grade if submission else None
+            ))
+        return result
+
+    def assignment(self, assignment: Assignment, with_submissions: bool = True) -> AssignmentResponse:
+        return self.assignments([assignment], with_submissions)[0]
+
+    def submissions(self, submissions: List[AssignmentSubmission]) -> List[AssignmentSubmissionResponse]:
+        assignment_ids = {s.assignment_id for s in submissions}
+        titles = {}
+        if assignment_ids:
+            titles = dict(self.db.query(Assignment.id, Assignment.title).filter(
+                Assignment.id.in_(assignment_ids)
+            ).all())
+        users = self._load_users(s.student_id for s in submissions)
+
+        return [
+            AssignmentSubmissionResponse(
+                id=submission.id,
+                content=submission.content,
+                status=submission.status,
+                grade=submission.grade,
+                feedback=submission.feedback,
+                submitted_at=submission.submitted_at,
+                graded_at=submission.graded_at,
+                created_at=submission.created_at,
+                assignment_title=titles.get(submission.assignment_id, "Compito"),
+                student_name=display_name(users.get(submission.student_id), "Studente")
+            )
+            for submission in submissions
+        ]
+
+    def submission(self, submission: AssignmentSubmission) -> AssignmentSubmissionResponse:
+        return self.submissions([submission])[0]
@@ -0,0 +1,123 @@
+"""
+Storage deduplicato per contenuto (tabella blobs).
+
+Ogni contenuto caricato è salvato una sola volta: il blob è identificato
+dallo SHA-256 calcolato durante l'upload e i File che lo usano ne
+incrementano ``ref_count``. Il checksum si conosce solo a upload finito,
+quindi il contenuto viene comunque scritto; se il blob esiste già l'oggetto
+appena scritto è un duplicato e il chiamante lo rimuove, e il nuovo File è
+solo una riga di metadati. Eliminare un File decrementa il contatore;
+l'oggetto nello storage viene rimosso dal task periodico solo quando il
+blob è rimasto senza riferimenti per BLOB_GC_GRACE_SECONDS, così un upload
+dello stesso contenuto nel frattempo lo riusa invece di perderlo.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.celery_app import celery_app
+from app.core.config import settings
+from app.core.storage import StorageInterface, StoredUpload, storage
+from app.models.blob import Blob
+from app.models.file import File
+
+
+class BlobService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _by_checksum(self, sha256: str) -> Optional[Blob]:
+        return self.db.query(Blob).filter(Blob.sha256 == sha256).with_for_update().first()
+
+    def attach(self, stored: StoredUpload) -> Blob:
+        """
+        Blob per un upload completato, con un riferimento in più. Se il contenuto
+        era già presente il blob restituito ha un altro ``stored_path``: l'oggetto
+        ``stored.path`` è un duplicato da eliminare dallo storage. Non fa commit.
+        """
+        blob = self._by_checksum(stored.sha256)
+        if blob is None:
+            try:
+                with self.db.begin_nested():
+                    blob = Blob(sha256=stored.sha256, stored_path=stored.path, size=stored.size, ref_count=1)
+                    self.db.add(blob)
+                return blob
+            except IntegrityError:
+                # Stesso contenuto caricato in parallelo da un'altra richiesta
+                blob = self._by_checksum(stored.sha256)
+        blob.ref_count += 1
+        blob.unreferenced_since = None
+        return blob
+
+    def release(self, file_record: File) -> None:
+        """Toglie il riferimento del File al suo blob (da chiamare prima di eliminarlo). Non fa commit."""
+        if file_record.blob_id is None:
+            return
+        blob = self.db.query(Blob).filter(Blob.id == file_record.blob_id).with_for_update().one()
+        blob.ref_count = max(blob.ref_count - 1, 0)
+        if blob.ref_count == 0:
+            blob.unreferenced_since = datetime.utcnow()
+
+    def assign_checksum(self, blob: Blob, sha256: str) -> Blob:
+        """
+        Checksum calcolato per un blob migrato. Se lo stesso contenuto ha già un
+        blob, i File passano a quello e il duplicato resta senza riferimenti
+        (lo rimuove il garbage collector). Restituisce il blob che resta in uso.
+        """
+        existing = self._by_checksum(sha256)
+        if existing is None or existing.id == blob.id:
+            blob.sha256 = sha256
+            self.db.query(File).filter(File.blob_id == blob.id).update(
+                {File.checksum_sha256: sha256}, synchronize_session=False
+            )
+            return blob
+
+        self.db.query(File).filter(File.blob_id == blob.id).update(
+            {File.blob_id: existing.id, File.stored_path: existing.stored_path, File.checksum_sha256: sha256},
+            synchronize_session=False
+        )
+        existing.ref_count += blob.ref_count
+        existing.unreferenced_since = None
+        blob.ref_count = 0
+        blob.unreferenced_since = datetime.utcnow()
+        return existing
+
+    def collect_garbage(self, batch_size: int = 100, target: Optional[StorageInterface] = None) -> Dict[str, int]:
+        """Elimina dallo storage e dal database i blob senza riferimenti da oltre BLOB_GC_GRACE_SECONDS"""
+        target = target or storage
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.BLOB_GC_GRACE_SECONDS)
+        summary = {"removed": 0, "bytes": 0, "failed": 0}
+
+        # SKIP LOCKED: un upload che sta riusando il blob lo tiene bloccato, e lo si salta
+        blobs = self.db.query(Blob).filter(
+            Blob.ref_count == 0,
+            Blob.unreferenced_since <= cutoff,
+            ~Blob.files.any()
+        ).order_by(Blob.unreferenced_since).limit(batch_size).with_for_update(skip_locked=True).all()
+
+        for blob in blobs:
+            if not target.delete_file(blob.stored_path):
+                summary["failed"] += 1  # resta in tabella, si riprova al prossimo giro
+                continue
+            summary["removed"] += 1
+            summary["bytes"] += blob.size
+            self.db.delete(blob)
+        self.db.commit()
+        return summary
+
+
+@celery_app.task(name="app.services.blobs.collect_unreferenced_blobs")
+def collect_unreferenced_blobs_task():
+    """Rimuove i blob rimasti senza file che li usano"""
+    from app.core.db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return {"status": "success", **BlobService(db).collect_garbage()}
+    except Exception as e:
+        db.rollback()
+        return {"status": "error", "error": str(e)}
+    finally:
+        db.close()
@@ -0,0 +1,115 @@
+"""
+Outbox transazionale delle email (tabella email_outbox).
+
+I servizi non inviano più email direttamente: ``enqueue`` aggiunge le righe
+alla sessione del chiamante, che le salva con lo stesso commit della
+modifica che le genera (niente email per operazioni annullate, nessuna
+email persa se SMTP è giù). Il dispatcher su notifications_queue prende le
+righe pronte a blocchi con SELECT ... FOR UPDATE SKIP LOCKED, così più
+worker lavorano in parallelo senza inviare due volte la stessa email, le
+spedisce su una sessione SMTP del pool e riprogramma i fallimenti con
+backoff esponenziale. Se il worker muore a metà, la transazione si annulla
+e le righe tornano disponibili.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List
+
+from sqlalchemy.orm import Session
+
+from app.core.celery_app import celery_app
+from app.core.config import settings
+from app.core.emailer import OutgoingEmail, email_service
+from app.models.email_outbox import EmailOutbox, EmailOutboxStatus
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Attesa prima del tentativo successivo: base * 2^(tentativi-1), con un tetto"""
+    seconds = settings.EMAIL_OUTBOX_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0)
+    return timedelta(seconds=min(seconds, settings.EMAIL_OUTBOX_RETRY_MAX_SECONDS))
+
+
+class EmailOutboxService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def enqueue(self, emails: Iterable[OutgoingEmail]) -> List[EmailOutbox]:
+        """Aggiunge le email alla transazione corrente; il commit spetta al chiamante"""
+        rows = [
+            EmailOutbox(
+                to_address=email.to,
+                subject=email.subject[:255],
+                html_content=email.html_content,
+                text_content=email.text_content,
+                status=EmailOutboxStatus.pending,
+                attempts=0,
+                next_attempt_at=datetime.utcnow(),
+            )
+            for email in emails
+        ]
+        self.db.add_all(rows)
+        return rows
+
+    def dispatch_batch(self, batch_size: int = None) -> Dict[str, int]:
+        """Invia un blocco di email pronte; le righe restano bloccate fino al commit finale"""
+        now = datetime.utcnow()
+        rows = self.db.query(EmailOutbox).filter(
+            EmailOutbox.status == EmailOutboxStatus.pending,
+            EmailOutbox.next_attempt_at <= now
+        ).order_by(
+            EmailOutbox.next_attempt_at, EmailOutbox.id
+        ).limit(
+            batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+        ).with_for_update(skip_locked=True).all()
+
+        summary = {"claimed": len(rows), "sent": 0, "retrying": 0, "failed": 0}
+        if not rows:
+            self.db.commit()
+            return summary
+
+        emails = [OutgoingEmail(row.to_address, row.subject, row.html_content, row.text_content) for row in rows]
+        results = email_service.send_many(emails)
+
+        finished_at = datetime.utcnow()
+        for row, email, sent in zip(rows, emails, results, strict=True):
+            row.attempts += 1
+            if sent:
+                row.status = EmailOutboxStatus.sent
+                row.sent_at = finished_at
+                row.last_error = None
+                summary["sent"] += 1
+                continue
+            row.last_error = email.error
+            if row.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+                row.status = EmailOutboxStatus.failed
+                summary["failed"] += 1
+            else:
+                row.next_attempt_at = finished_at + retry_delay(row.attempts)
+                summary["retrying"] += 1
+        self.db.commit()
+        return summary
+
+    def dispatch_pending(self, max_batches: int = None) -> Dict[str, int]:
+        """Svuota la coda a blocchi (al più ``max_batches`` per esecuzione)"""
+        totals = {"claimed": 0, "sent": 0, "retrying": 0, "failed": 0}
+        for _ in range(max_batches or settings.EMAIL_OUTBOX_MAX_BATCHES_PER_RUN):
+            summary = self.dispatch_batch()
+            for key in totals:
+                totals[key] += summary[key]
+            if summary["claimed"] < settings.EMAIL_OUTBOX_BATCH_SIZE:
+                break
+        return totals
+
+
+@celery_app.task(name="app.services.email_outbox.dispatch_email_outbox")
+def dispatch_email_outbox_task():
+    """Dispatcher periodico dell'outbox (più istanze in parallelo grazie a SKIP LOCKED)"""
+    from app.core.db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return EmailOutboxService(db).dispatch_pending()
+    except Exception as e:
+        db.rollback()
+        return {"status": "error", "error": str(e)}
+    finally:
+        db.close()
@@ -0,0 +1,110 @@
+"""
+Promemoria delle lezioni programmati (tabella lesson_reminders).
+
+Alla conferma di una lezione ``schedule`` crea una riga per ciascun
+anticipo di LESSON_REMINDER_HOURS_BEFORE con la sua scadenza; annullamento
+e completamento la revocano (``revoke``), uno spostamento la riprogramma
+richiamando ``schedule``. Il task periodico legge solo le righe scadute
+(indice su status, due_at), quindi il costo di un giro dipende dai
+promemoria da inviare e non dalle lezioni in arrivo. Le email passano
+dall'outbox nello stesso commit che segna il promemoria come inviato (i
+promemoria sono urgenti e non finiscono mai nel digest).
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session, selectinload
+
+from app.core.config import settings
+from app.models.lesson import Lesson, LessonStatus
+from app.models.lesson_reminder import LessonReminder, LessonReminderStatus
+from app.models.user import User
+from app.services.notifications import NotificationService
+
+
+class LessonReminderService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def schedule(self, lesson: Lesson, hours_before: Optional[List[int]] = None) -> List[LessonReminder]:
+        """
+        Programma (o riprogramma) i promemoria della lezione; il commit spetta
+        al chiamante. Un promemoria già inviato per lo stesso orario non
+        viene riarmato, così una conferma ripetuta non lo invia di nuovo.
+        """
+        now = datetime.utcnow()
+        self.db.flush()
+        existing = {
+            reminder.hours_before: reminder
+            for reminder in self.db.query(LessonReminder).filter(LessonReminder.lesson_id == lesson.id)
+        }
+        scheduled = []
+        for hours in hours_before or settings.LESSON_REMINDER_HOURS_BEFORE:
+            due_at = lesson.start_at - timedelta(hours=hours)
+            reminder = existing.get(hours)
+            if reminder is not None and reminder.status == LessonReminderStatus.sent and reminder.due_at == due_at:
+                continue
+            if due_at <= now:
+                # Scadenza già passata (lezione prenotata all'ultimo): non si recupera
+                if reminder is not None and reminder.status == LessonReminderStatus.scheduled:
+                    reminder.status = LessonReminderStatus.cancelled
+                continue
+            if reminder is None:
+                reminder = LessonReminder(lesson_id=lesson.id, hours_before=hours)
+                self.db.add(reminder)
+            reminder.due_at = due_at
+            reminder.status = LessonReminderStatus.scheduled
+            reminder.sent_at = None
+            scheduled.append(reminder)
+        return scheduled
+
+    def revoke(self, lesson_id: int) -> int:
+        """Annulla i promemoria non ancora inviati (lezione annullata o conclusa)"""
+        result = self.db.execute(
+            update(LessonReminder).where(
+                LessonReminder.lesson_id == lesson_id,
+                LessonReminder.status == LessonReminderStatus.scheduled
+            ).values(status=LessonReminderStatus.cancelled)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
+    def dispatch_due(self, batch_size: Optional[int] = None) -> Dict[str, int]:
+        """Accoda nell'outbox i promemoria scaduti; SKIP LOCKED permette più worker in parallelo"""
+        now = datetime.utcnow()
+        reminders = self.db.query(LessonReminder).filter(
+            LessonReminder.status == LessonReminderStatus.scheduled,
+            LessonReminder.due_at <= now
+        ).order_by(
+            LessonReminder.due_at
+        ).limit(
+            batch_size or settings.LESSON_REMINDER_BATCH_SIZE
+        ).with_for_update(skip_locked=True).options(
+            # Lezioni e profili caricati con poche query, dopo il lock sulle sole righe dei promemoria
+            # (display_name guarda entrambi i profili, quindi si caricano tutti e due)
+            selectinload(LessonReminder.lesson).selectinload(Lesson.student).options(
+                selectinload(User.student_profile), selectinload(User.tutor_profile)
+            ),
+            selectinload(LessonReminder.lesson).selectinload(Lesson.tutor).options(
+                selectinload(User.student_profile), selectinload(User.tutor_profile)
+            ),
+        ).all()
+
+        summary = {"due": len(reminders), "queued": 0, "skipped": 0}
+        notifications = NotificationService(self.db)
+        batch = []
+        for reminder in reminders:
+            lesson = reminder.lesson
+            if lesson.status != LessonStatus.confirmed or lesson.start_at <= now:
+                reminder.status = LessonReminderStatus.cancelled
+                summary["skipped"] += 1
+                continue
+            batch.extend(notifications.lesson_reminder_notifications(lesson, reminder.hours_before))
+            reminder.status = LessonReminderStatus.sent
+            reminder.sent_at = now
+            summary["queued"] += 1
+
+        notifications.notify(batch)
+        self.db.commit()
+        return summary
@@ -1,13 +1,15 @@
 from datetime import datetime, timedelta
 from typing import List, Optional
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session, undefer, undefer_group
+from sqlalchemy import and_, or_, func
 from fastapi import HTTPException, status
 import uuid
 
 from app.models.lesson import Lesson, LessonStatus
 from app.models.user import User, TutorProfile, StudentProfile
 from app.models.availability import Availability
+from app.services.student_stats import StudentMonthStatsService
+from app.services.lesson_reminders import LessonReminderService
 from app.schemas.lesson import LessonCreate, LessonUpdate, LessonResponse
 
 class LessonService:
@@ -72,7 +74,8 @@ class LessonService:
 
     def get_lesson(self, lesson_id: int, user_id: int) -> Optional[Lesson]:
         """Ottiene una lezione per ID (con controllo autorizzazione)"""
-        lesson = self.db.query(Lesson).filter(Lesson.id == lesson_id).first()
+        # Dettaglio: carica anche appunti, note del tutor e obiettivi
+        lesson = self.db.query(Lesson).options(undefer_group("notes")).filter(Lesson.id == lesson_id).first()
         if not lesson:
             return None
         
@@ -91,9 +94,12 @@ class LessonService:
 
     def get_student_lessons(self, student_id: int, page: int = 1, size: int = 20) -> dict:
         """Ottiene tutte le lezioni di uno studente con paginazione"""
-        query = self.db.query(Lesson).filter(Lesson.student_id == student_id).order_by(Lesson.start_at.desc())
+        # Solo colonne leggere + anteprima appunti (il testo completo resta nel dettaglio)
+        query = self.db.query(Lesson).options(undefer(Lesson.notes_preview)).filter(
+            Lesson.student_id == student_id
+        ).order_by(Lesson.start_at.desc())
         
-        total = query.count()
+        total = query.with_entities(func.count(Lesson.id)).order_by(None).scalar()
         lessons = query.offset((page - 1) * size).limit(size).all()
         
         # Aggiungi il nome del tutor a ogni lezione
@@ -117,9 +123,11 @@ class LessonService:
     def get_tutor_lessons(self, tutor_user_id: int, page: int = 1, size: int = 20) -> dict:
         """Ottiene tutte le lezioni di un tutor con paginazione"""
         # Lesson.tutor_id è già user_id, non serve convertire
-        query = self.db.query(Lesson).filter(Lesson.tutor_id == tutor_user_id).order_by(Lesson.start_at.desc())
+        query = self.db.query(Lesson).options(undefer(Lesson.notes_preview)).filter(
+            Lesson.tutor_id == tutor_user_id
+        ).order_by(Lesson.start_at.desc())
         
-        total = query.count()
+        total = query.with_entities(func.count(Lesson.id)).order_by(None).scalar()
         lessons = query.offset((page - 1) * size).limit(size).all()
         
         # Aggiungi il nome dello studente a ogni lezione
@@ -169,9 +177,10 @@ class LessonService:
 
     def complete_lesson(self, lesson_id: int, tutor_id: int, notes_seed: str) -> Lesson:
         """Completa una lezione e genera appunti AI"""
+        # Riga bloccata: due completamenti concorrenti non contano la lezione due volte
         lesson = self.db.query(Lesson).filter(
             and_(Lesson.id == lesson_id, Lesson.tutor_id == tutor_id)
-        ).first()
+        ).with_for_update().first()
         
         if not lesson:
             raise HTTPException(
@@ -188,6 +197,8 @@ class LessonService:
         # Aggiorna lo stato e le note
         lesson.status = LessonStatus.completed
         lesson.notes_seed = notes_seed
+        StudentMonthStatsService(self.db).lesson_completed(lesson)
+        LessonReminderService(self.db).revoke(lesson.id)
         
         self.db.commit()
         self.db.refresh(lesson)
@@ -214,6 +225,7 @@ class LessonService:
             )
         
         lesson.status = LessonStatus.cancelled
+        LessonReminderService(self.db).revoke(lesson.id)
         self.db.commit()
         self.db.refresh(lesson)
         
@@ -0,0 +1,270 @@
+"""
+Pipeline map-reduce per trasformare trascrizioni lunghe in appunti.
+
+Una trascrizione di 90 minuti non sta in un solo prompt: la si divide in
+parti (budget di token con sovrapposizione), ogni parte viene riassunta in
+parallelo con concorrenza limitata e infine un passo di reduce produce gli
+appunti finali con le stesse regole LaTeX del prompt originale.
+Le trascrizioni brevi usano ancora un'unica chiamata.
+"""
+import asyncio
+import contextlib
+import re
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Union
+
+from app.core.config import settings
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken è opzionale: stima ~4 caratteri per token
+    _ENCODING = None
+
+Messages = List[Dict[str, str]]
+CompleteFn = Callable[[Messages], Awaitable[str]]
+StreamFn = Callable[[Messages], AsyncIterator[str]]
+
+NOTES_SYSTEM_PROMPT = "Sei un assistente esperto che crea appunti scolastici ben formattati da trascrizioni di lezioni. È OBBLIGATORIO usare la sintassi LaTeX corretta: \\( \\) per formule inline e $$ $$ per formule in blocco. OGNI formula matematica deve essere racchiusa in questi delimitatori. NON scrivere MAI formule senza delimitatori."
+
+MAP_SYSTEM_PROMPT = "Sei un assistente che riassume fedelmente parti di trascrizioni di lezioni, senza perdere formule, definizioni ed esempi. Scrivi ogni formula in LaTeX con \\( \\) inline o $$ $$ in blocco."
+
+# Massimo numero di livelli di reduce intermedi prima di forzare il passo finale
+MAX_REDUCE_DEPTH = 3
+
+
+def count_tokens(text: str) -> int:
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return len(text) // 4 + 1
+
+
+def split_by_tokens(text: str, max_tokens: int, overlap_tokens: int = 0) -> List[str]:
+    """
+    Divide il testo in parti di al più ``max_tokens`` (stimati), tagliando
+    tra frasi; ogni parte riprende le ultime frasi della precedente fino a
+    ``overlap_tokens`` per non perdere il contesto a cavallo dei tagli.
+    """
+    sentences: List[str] = []
+    for sentence in re.split(r"(?<=[.!?])\s+|\n+", text.strip()):
+        if not sentence.strip():
+            continue
+        if count_tokens(sentence) <= max_tokens:
+            sentences.append(sentence.strip())
+            continue
+        # Frase più lunga del budget: taglio per parole
+        words, current = sentence.split(), []
+        for word in words:
+            if current and count_tokens(" ".join(current + [word])) > max_tokens:
+                sentences.append(" ".join(current))
+                current = []
+            current.append(word)
+        if current:
+            sentences.append(" ".join(current))
+
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for sentence in sentences:
+        tokens = count_tokens(sentence)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(" ".join(current))
+            overlap: List[str] = []
+            overlap_size = 0
+            for previous in reversed(current):
+                size = count_tokens(previous)
+                if overlap_size + size > overlap_tokens or overlap_size + size + tokens > max_tokens:
+                    break
+                overlap.insert(0, previous)
+                overlap_size += size
+            current, current_tokens = overlap, overlap_size
+        current.append(sentence)
+        current_tokens += tokens
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def notes_messages(subject: str, transcript: str, from_summaries: bool = False) -> Messages:
+    """Messaggi per gli appunti finali (da trascrizione o dai riassunti delle parti)"""
+    if from_summaries:
+        intro = f"""Sei un assistente educativo esperto. Questi sono i riassunti, in ordine, delle parti di una lunga lezione di {subject}. Uniscili in appunti unici, ben strutturati e facili da studiare, eliminando le ripetizioni dovute alla sovrapposizione tra le parti.
+
+Riassunti delle parti della lezione:
+{transcript}"""
+    else:
+        intro = f"""Sei un assistente educativo esperto. Trasforma questa trascrizione di una lezione di {subject} in appunti ben strutturati e facili da studiare.
+
+Trascrizione della lezione:
+{transcript}"""
+
+    prompt = intro + """
+
+Genera appunti che includano:
+1. **Titolo e Introduzione** - Breve sommario degli argomenti trattati
+2. **Concetti Chiave** - Elenco puntato dei concetti principali spiegati
+3. **Esempi e Spiegazioni** - Dettagli importanti, esempi pratici
+4. **Formule o Definizioni** - Se presenti, scrivi formule matematiche usando LaTeX
+5. **Riassunto Finale** - Breve recap di cosa è stato imparato
+
+IMPORTANTE - SINTASSI LATEX (OBBLIGATORIA):
+- Per formule inline usa SEMPRE: \\( formula \\)
+  Esempio CORRETTO: Il discriminante è \\( \\Delta = b^2 - 4ac \\)
+  Esempio SBAGLIATO: Il discriminante è (\\Delta = b^2 - 4ac)
+
+- Per formule in blocco usa SEMPRE: $$ sulla sua linea, formula, $$
+  Esempio CORRETTO:
+  $$
+  x = \\frac{-b \\pm \\sqrt{\\Delta}}{2a}
+  $$
+
+  Esempio SBAGLIATO:
+  x = \\frac{-b \\pm \\sqrt{\\Delta}}{2a}
+
+- OGNI formula matematica DEVE essere racchiusa in \\( \\) o $$ $$
+- Usa sempre doppie backslash: \\frac, \\sqrt, \\Delta, \\pi
+- NON scrivere MAI formule senza delimitatori
+- NON usare parentesi tonde semplici () per formule
+
+REGOLE DI FORMATTAZIONE:
+- Scrivi in italiano chiaro e professionale
+- Usa markdown: # per titoli, ** per grassetto, - per elenchi
+- Mantieni uno stile ordinato e pulito
+- Sii fedele al contenuto della trascrizione, non inventare
+- Assicurati che TUTTE le formule matematiche siano in LaTeX corretto
+"""
+    return [
+        {"role": "system", "content": NOTES_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def map_messages(subject: str, chunk: str, index: int, total: int) -> Messages:
+    prompt = f"""Questa è la parte {index + 1} di {total} della trascrizione di una lezione di {subject}.
+Riassumila in modo fedele e dettagliato: concetti spiegati, definizioni, esempi ed esercizi.
+Riporta TUTTE le formule in LaTeX (\\( \\) inline, $$ $$ in blocco). Non inventare nulla.
+
+Trascrizione (parte {index + 1}/{total}):
+{chunk}
+"""
+    return [
+        {"role": "system", "content": MAP_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+
+@dataclass
+class NotesProgress:
+    stage: str  # "map" | "reduce"
+    done: int
+    total: int
+
+
+class TranscriptNotesPipeline:
+    def __init__(
+        self,
+        complete: CompleteFn,
+        chunk_tokens: Optional[int] = None,
+        overlap_tokens: Optional[int] = None,
+        concurrency: Optional[int] = None,
+    ):
+        self.complete = complete
+        self.chunk_tokens = chunk_tokens or settings.NOTES_CHUNK_TOKENS
+        self.overlap_tokens = overlap_tokens if overlap_tokens is not None else settings.NOTES_CHUNK_OVERLAP_TOKENS
+        self.concurrency = concurrency or settings.NOTES_MAP_CONCURRENCY
+
+    async def _summarize_all(
+        self,
+        subject: str,
+        chunks: List[str],
+        on_progress: Optional[Callable[[NotesProgress], None]],
+    ) -> List[str]:
+        """Riassume le parti in parallelo (al più ``concurrency`` alla volta), in ordine"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        summaries: List[Optional[str]] = [None] * len(chunks)
+        done = 0
+
+        async def run(index: int, chunk: str):
+            nonlocal done
+            async with semaphore:
+                summaries[index] = await self.complete(map_messages(subject, chunk, index, len(chunks)))
+            done += 1
+            if on_progress:
+                on_progress(NotesProgress("map", done, len(chunks)))
+
+        tasks = [asyncio.create_task(run(i, chunk)) for i, chunk in enumerate(chunks)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        return [summary or "" for summary in summaries]
+
+    async def reduce_messages(
+        self,
+        subject: str,
+        transcript: str,
+        on_progress: Optional[Callable[[NotesProgress], None]] = None,
+    ) -> Messages:
+        """Messaggi per la chiamata finale; per testi lunghi esegue prima il map"""
+        if count_tokens(transcript) <= self.chunk_tokens:
+            return notes_messages(subject, transcript)
+
+        text, overlap = transcript, self.overlap_tokens
+        for _ in range(MAX_REDUCE_DEPTH):
+            chunks = split_by_tokens(text, self.chunk_tokens, overlap)
+            summaries = await self._summarize_all(subject, chunks, on_progress)
+            text = "\n\n".join(f"### Parte {i + 1}\n{summary}" for i, summary in enumerate(summaries))
+            if count_tokens(text) <= self.chunk_tokens:
+                break
+            # I riassunti sono ancora troppo lunghi: un altro livello (senza overlap)
+            overlap = 0
+
+        if on_progress:
+            on_progress(NotesProgress("reduce", 0, 1))
+        return notes_messages(subject, text, from_summaries=True)
+
+    async def generate(
+        self,
+        subject: str,
+        transcript: str,
+        on_progress: Optional[Callable[[NotesProgress], None]] = None,
+    ) -> str:
+        messages = await self.reduce_messages(subject, transcript, on_progress)
+        notes = await self.complete(messages)
+        if on_progress:
+            on_progress(NotesProgress("reduce", 1, 1))
+        return notes
+
+    async def stream(
+        self,
+        subject: str,
+        transcript: str,
+        stream_fn: StreamFn,
+    ) -> AsyncIterator[Union[NotesProgress, str]]:
+        """Produce eventi di avanzamento durante il map, poi i token del reduce"""
+        queue: "asyncio.Queue[NotesProgress]" = asyncio.Queue()
+        prepare = asyncio.create_task(self.reduce_messages(subject, transcript, queue.put_nowait))
+        getter: Optional[asyncio.Task] = None
+        try:
+            while True:
+                getter = asyncio.create_task(queue.get())
+                done, _ = await asyncio.wait({getter, prepare}, return_when=asyncio.FIRST_COMPLETED)
+                if getter in done:
+                    yield getter.result()
+                    continue
+                getter.cancel()
+                while not queue.empty():
+                    yield queue.get_nowait()
+                break
+            messages = prepare.result()
+        finally:
+            prepare.cancel()
+            if getter is not None:
+                getter.cancel()
+
+        # aclosing: chiudere questo generatore chiude subito lo stream a monte
+        # (e libera i semafori di LLMClient.stream), senza aspettare il GC
+        async with contextlib.aclosing(stream_fn(messages)) as deltas:
+            async for delta in deltas:
+                yield delta
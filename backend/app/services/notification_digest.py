@@ -0,0 +1,161 @@
+"""
+Digest delle notifiche per destinatario (tabelle notification_preferences e
+pending_notifications).
+
+``route`` smista le notifiche: quelle urgenti (NOTIFICATION_IMMEDIATE_KINDS
+o ``immediate=True``) e quelle degli utenti senza digest diventano subito
+email nell'outbox; le altre restano in pending_notifications con il solo
+contesto del template. Il task periodico prende i destinatari con la
+finestra scaduta e accoda per ciascuno un'unica email di riepilogo, quindi
+un rendering e una transazione SMTP al posto di una per notifica.
+"""
+import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session, selectinload
+
+from app.core.celery_app import celery_app
+from app.core.config import settings
+from app.core.emailer import OutgoingEmail, email_service
+from app.models.notification import NotificationPreference, PendingNotification
+from app.models.user import User
+from app.services.assignments import display_name
+from app.services.email_outbox import EmailOutboxService
+
+
+@dataclass
+class Notification:
+    recipient: User
+    kind: str  # chiave di EMAIL_BUILDERS
+    context: Dict[str, Any]  # variabili del template (solo dati serializzabili in JSON)
+    immediate: bool = False
+
+
+# Email singola per tipo di notifica (metodi di EmailService)
+EMAIL_BUILDERS = {
+    "lesson_confirmed": "lesson_confirmation_email",
+    "lesson_reminder": "lesson_reminder_email",
+    "assignment_created": "assignment_notification_email",
+}
+
+
+def build_email(kind: str, to: str, context: Dict[str, Any]) -> OutgoingEmail:
+    return getattr(email_service, EMAIL_BUILDERS[kind])(to=to, **context)
+
+
+class NotificationDigestService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def digest_windows(self, users: Iterable[User]) -> Dict[int, Optional[int]]:
+        """Finestra del digest in minuti per utente; None se riceve le email subito"""
+        users = {user.id: user for user in users}
+        if not users:
+            return {}
+        preferences = {
+            preference.user_id: preference
+            for preference in self.db.query(NotificationPreference).filter(
+                NotificationPreference.user_id.in_(users)
+            )
+        }
+        windows = {}
+        for user_id, user in users.items():
+            preference = preferences.get(user_id)
+            if preference is None:
+                enabled, window = user.role.value in settings.NOTIFICATION_DIGEST_DEFAULT_ROLES, None
+            else:
+                enabled, window = preference.digest_enabled, preference.digest_window_minutes
+            windows[user_id] = (window or settings.NOTIFICATION_DIGEST_WINDOW_MINUTES) if enabled else None
+        return windows
+
+    @staticmethod
+    def _is_immediate(notification: Notification) -> bool:
+        return notification.immediate or notification.kind in settings.NOTIFICATION_IMMEDIATE_KINDS
+
+    def route(self, notifications: List[Notification]) -> Dict[str, int]:
+        """Email immediate nell'outbox, il resto in attesa del digest; il commit spetta al chiamante"""
+        windows = self.digest_windows(
+            notification.recipient for notification in notifications if not self._is_immediate(notification)
+        )
+        now = datetime.utcnow()
+        emails, pending = [], []
+        for notification in notifications:
+            window = None if self._is_immediate(notification) else windows.get(notification.recipient.id)
+            if window is None:
+                emails.append(build_email(notification.kind, notification.recipient.email, notification.context))
+                continue
+            # La finestra parte dalla prima notifica: quando scade, il giro prende tutte quelle del destinatario
+            pending.append(PendingNotification(
+                user_id=notification.recipient.id,
+                kind=notification.kind,
+                payload=json.dumps(notification.context),
+                deliver_after=now + timedelta(minutes=window),
+            ))
+        EmailOutboxService(self.db).enqueue(emails)
+        self.db.add_all(pending)
+        return {"queued": len(emails), "deferred": len(pending)}
+
+    def flush_due(self, batch_size: Optional[int] = None) -> Dict[str, int]:
+        """Accoda un riepilogo per ogni destinatario con la finestra scaduta"""
+        now = datetime.utcnow()
+        user_ids = [
+            user_id for (user_id,) in self.db.query(PendingNotification.user_id).filter(
+                PendingNotification.deliver_after <= now
+            ).distinct().limit(batch_size or settings.NOTIFICATION_DIGEST_BATCH_SIZE)
+        ]
+        summary = {"recipients": 0, "notifications": 0}
+        if not user_ids:
+            return summary
+
+        # SKIP LOCKED: un altro worker che sta riepilogando lo stesso destinatario tiene le sue righe
+        rows = self.db.query(PendingNotification).filter(
+            PendingNotification.user_id.in_(user_ids)
+        ).order_by(
+            PendingNotification.user_id, PendingNotification.created_at, PendingNotification.id
+        ).with_for_update(skip_locked=True).options(
+            selectinload(PendingNotification.user).options(
+                selectinload(User.student_profile), selectinload(User.tutor_profile)
+            )
+        ).all()
+
+        by_user: Dict[int, List[PendingNotification]] = {}
+        for row in rows:
+            by_user.setdefault(row.user_id, []).append(row)
+
+        emails = []
+        for items in by_user.values():
+            user = items[0].user
+            if len(items) == 1:
+                # Una sola notifica nella finestra: l'email normale è più chiara di un riepilogo
+                emails.append(build_email(items[0].kind, user.email, json.loads(items[0].payload)))
+            else:
+                emails.append(email_service.notification_digest_email(
+                    to=user.email,
+                    recipient_name=display_name(user, "Utente"),
+                    items=[{"kind": item.kind, **json.loads(item.payload)} for item in items],
+                ))
+            for item in items:
+                self.db.delete(item)
+            summary["recipients"] += 1
+            summary["notifications"] += len(items)
+
+        EmailOutboxService(self.db).enqueue(emails)
+        self.db.commit()
+        return summary
+
+
+@celery_app.task(name="app.services.notification_digest.send_notification_digests")
+def send_notification_digests_task():
+    """Accoda i riepiloghi dei destinatari con la finestra scaduta"""
+    from app.core.db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return {"status": "success", **NotificationDigestService(db).flush_due()}
+    except Exception as e:
+        db.rollback()
+        return {"status": "error", "error": str(e)}
+    finally:
+        db.close()
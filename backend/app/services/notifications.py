@@ -1,53 +1,37 @@
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import datetime, timedelta
+from sqlalchemy.orm import Session, joinedload
+from typing import Dict, List, Optional
 from app.core.emailer import email_service
 from app.core.celery_app import celery_app
-from app.models.lesson import Lesson, LessonStatus
+from app.models.lesson import Lesson
 from app.models.user import User
+from app.services.assignments import display_name
+from app.services.notification_digest import Notification, NotificationDigestService
 
 class NotificationService:
     def __init__(self, db: Session):
         self.db = db
 
-    def send_lesson_reminder(self, lesson_id: int):
-        """Send lesson reminder to student and tutor"""
-        lesson = self.db.query(Lesson).filter(Lesson.id == lesson_id).first()
-        if not lesson:
-            return {"status": "error", "message": "Lesson not found"}
+    def _lesson_details(self, lesson: Lesson) -> Dict[str, str]:
+        return {
+            "student_name": display_name(lesson.student, "Studente"),
+            "tutor_name": display_name(lesson.tutor, "Tutor"),
+            "lesson_datetime": lesson.start_at.strftime("%d/%m/%Y alle %H:%M"),
+            "room_url": f"https://meet.jit.si/{lesson.room_slug}" if lesson.room_slug else None,
+        }
 
-        # Check if lesson is in the next 24 hours
-        time_until_lesson = lesson.start_at - datetime.utcnow()
-        if time_until_lesson > timedelta(hours=24) or time_until_lesson < timedelta(hours=0):
-            return {"status": "skipped", "message": "Lesson not within reminder window"}
+    def notify(self, notifications: List[Notification]) -> Dict[str, int]:
+        """Email subito nell'outbox o in attesa del digest, secondo le preferenze; il commit spetta al chiamante"""
+        return NotificationDigestService(self.db).route(notifications)
 
-        # Send reminder to student
-        student_email = lesson.student.email
-        student_name = f"{lesson.student.first_name} {lesson.student.last_name}"
-        
-        email_service.send_lesson_reminder(
-            to_email=student_email,
-            student_name=student_name,
-            tutor_name=f"{lesson.tutor.first_name} {lesson.tutor.last_name}",
-            subject=lesson.subject,
-            start_time=lesson.start_at.strftime("%d/%m/%Y alle %H:%M"),
-            room_url=f"https://meet.jit.si/{lesson.room_slug}" if lesson.room_slug else None
-        )
-
-        # Send reminder to tutor
-        tutor_email = lesson.tutor.email
-        tutor_name = f"{lesson.tutor.first_name} {lesson.tutor.last_name}"
-        
-        email_service.send_lesson_reminder(
-            to_email=tutor_email,
-            student_name=student_name,
-            tutor_name=tutor_name,
-            subject=lesson.subject,
-            start_time=lesson.start_at.strftime("%d/%m/%Y alle %H:%M"),
-            room_url=f"https://meet.jit.si/{lesson.room_slug}" if lesson.room_slug else None
-        )
+    def lesson_reminder_notifications(self, lesson: Lesson, hours_before: int) -> List[Notification]:
+        """Promemoria per studente e tutor"""
+        details = {**self._lesson_details(lesson), "hours_before": hours_before}
+        return [Notification(user, "lesson_reminder", details) for user in (lesson.student, lesson.tutor)]
 
-        return {"status": "success", "message": "Reminders sent"}
+    def lesson_confirmation_notifications(self, lesson: Lesson) -> List[Notification]:
+        """Conferme per studente e tutor"""
+        details = self._lesson_details(lesson)
+        return [Notification(user, "lesson_confirmed", details) for user in (lesson.student, lesson.tutor)]
 
     def send_lesson_confirmation(self, lesson_id: int):
         """Send lesson confirmation after payment"""
@@ -55,35 +39,9 @@ class NotificationService:
         if not lesson:
             return {"status": "error", "message": "Lesson not found"}
 
-        # Send confirmation to student
-        student_email = lesson.student.email
-        student_name = f"{lesson.student.first_name} {lesson.student.last_name}"
-        
-        email_service.send_lesson_confirmation(
-            to_email=student_email,
-            student_name=student_name,
-            tutor_name=f"{lesson.tutor.first_name} {lesson.tutor.last_name}",
-            subject=lesson.subject,
-            start_time=lesson.start_at.strftime("%d/%m/%Y alle %H:%M"),
-            room_url=f"https://meet.jit.si/{lesson.room_slug}" if lesson.room_slug else None,
-            price=lesson.price
-        )
-
-        # Send confirmation to tutor
-        tutor_email = lesson.tutor.email
-        tutor_name = f"{lesson.tutor.first_name} {lesson.tutor.last_name}"
-        
-        email_service.send_lesson_confirmation(
-            to_email=tutor_email,
-            student_name=student_name,
-            tutor_name=tutor_name,
-            subject=lesson.subject,
-            start_time=lesson.start_at.strftime("%d/%m/%Y alle %H:%M"),
-            room_url=f"https://meet.jit.si/{lesson.room_slug}" if lesson.room_slug else None,
-            price=lesson.price
-        )
-
-        return {"status": "success", "message": "Confirmations sent"}
+        summary = self.notify(self.lesson_confirmation_notifications(lesson))
+        self.db.commit()
+        return {"status": "success", "message": "Confirmations queued", **summary}
 
     def send_report_notification(self, report_id: int):
         """Send notification when monthly report is ready"""
@@ -112,35 +70,66 @@ class NotificationService:
 
         return {"status": "success", "message": "Report notifications sent"}
 
+    def send_assignment_notifications(self, assignment_ids: List[int]):
+        """Notifica agli studenti i nuovi compiti (tutti in un solo job)"""
+        from app.models.assignment import Assignment
+
+        assignments = self.db.query(Assignment).filter(
+            Assignment.id.in_(assignment_ids),
+            Assignment.is_published == True
+        ).all()
+        if not assignments:
+            return {"status": "skipped", "message": "No published assignments"}
+
+        user_ids = {a.student_id for a in assignments} | {a.tutor_id for a in assignments}
+        users = {
+            user.id: user for user in self.db.query(User).options(
+                joinedload(User.student_profile), joinedload(User.tutor_profile)
+            ).filter(User.id.in_(user_ids))
+        }
+
+        notifications = []
+        for assignment in assignments:
+            student = users.get(assignment.student_id)
+            if not student:
+                continue
+            notifications.append(Notification(student, "assignment_created", {
+                "student_name": display_name(student, "Studente"),
+                "tutor_name": display_name(users.get(assignment.tutor_id), "Tutor"),
+                "assignment_title": assignment.title,
+                "due_date": assignment.due_date.strftime("%d/%m/%Y alle %H:%M"),
+            }))
+        summary = self.notify(notifications)
+        self.db.commit()
+
+        return {"status": "success", **summary, "total": len(assignments)}
+
 # Celery tasks
+@celery_app.task(name="app.services.notifications.send_assignment_notifications")
+def send_assignment_notifications_task(assignment_ids: List[int]):
+    """Accoda nell'outbox, in un unico job, le email per un gruppo di compiti"""
+    from app.core.db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return NotificationService(db).send_assignment_notifications(assignment_ids)
+    except Exception as e:
+        return {"status": "error", "error": str(e)}
+    finally:
+        db.close()
+
+
 @celery_app.task(name="app.services.notifications.send_lesson_reminders")
 def send_lesson_reminders_task():
-    """Send reminders for lessons starting in the next 24 hours"""
+    """Invia i promemoria scaduti (programmati alla conferma della lezione)"""
     from app.core.db import SessionLocal
+    from app.services.lesson_reminders import LessonReminderService
     
     db = SessionLocal()
     try:
-        notification_service = NotificationService(db)
-        
-        # Get lessons starting in the next 24 hours
-        now = datetime.utcnow()
-        tomorrow = now + timedelta(hours=24)
-        
-        lessons = db.query(Lesson).filter(
-            Lesson.status == LessonStatus.confirmed,
-            Lesson.start_at >= now,
-            Lesson.start_at <= tomorrow
-        ).all()
-        
-        sent_count = 0
-        for lesson in lessons:
-            result = notification_service.send_lesson_reminder(lesson.id)
-            if result["status"] == "success":
-                sent_count += 1
-        
-        return {"status": "success", "reminders_sent": sent_count, "total_lessons": len(lessons)}
-        
+        return {"status": "success", **LessonReminderService(db).dispatch_due()}
     except Exception as e:
+        db.rollback()
         return {"status": "error", "error": str(e)}
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -1,11 +1,12 @@
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, joinedload, undefer
 from sqlalchemy import func
 from typing import List, Tuple, Optional
 from datetime import datetime
 from app.models.user import User, Role, StudentProfile
-from app.models.lesson import Lesson, LessonStatus
+from app.models.lesson import Lesson
 from app.models.payment import Payment, PaymentStatus
 from app.models.report import Report
+from app.models.student_month_stats import StudentMonthStats
 
 class ParentService:
     def __init__(self, db: Session):
@@ -30,10 +31,10 @@ class ParentService:
 
         # Lesson statistics
         total_lessons = self.db.query(Lesson).filter(Lesson.student_id.in_(children_ids)).count()
-        completed_lessons = self.db.query(Lesson).filter(
-            Lesson.student_id.in_(children_ids),
-            Lesson.status == LessonStatus.completed
-        ).count()
+        # Lezioni completate dagli aggregati mensili (una riga per figlio e mese)
+        completed_lessons = self.db.query(
+            func.coalesce(func.sum(StudentMonthStats.lessons_completed), 0)
+        ).filter(StudentMonthStats.student_id.in_(children_ids)).scalar()
 
         # Payment statistics
         payments_query = self.db.query(Payment).filter(Payment.student_id.in_(children_ids))
@@ -73,13 +74,28 @@ class ParentService:
         if not child:
             return [], 0
 
-        query = self.db.query(Lesson).filter(Lesson.student_id == child.user_id)
+        query = self.db.query(Lesson).options(undefer(Lesson.notes_preview)).filter(
+            Lesson.student_id == child.user_id
+        )
         
-        total = query.count()
+        total = query.with_entities(func.count(Lesson.id)).scalar()
         lessons = query.order_by(Lesson.start_at.desc()).offset((page - 1) * size).limit(size).all()
         
         return lessons, total
 
+    def get_child_month_stats(self, parent_id: int, child_id: int, year: int, month: int) -> Optional[StudentMonthStats]:
+        """Aggregati del mese per un figlio (None se il figlio non è del genitore)"""
+        child = self.get_child(parent_id, child_id)
+        if not child:
+            return None
+
+        stats = self.db.query(StudentMonthStats).filter(
+            StudentMonthStats.student_id == child.user_id,
+            StudentMonthStats.year == year,
+            StudentMonthStats.month == month
+        ).first()
+        return stats or StudentMonthStats(student_id=child.user_id, year=year, month=month)
+
     def get_reports(self, parent_id: int, page: int, size: int) -> Tuple[List[Report], int]:
         """Get reports for parent's children"""
         # Get children of this parent
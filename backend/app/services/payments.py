@@ -8,6 +8,8 @@ from app.core.config import settings
 from app.models.lesson import Lesson, LessonStatus
 from app.models.payment import Payment, PaymentStatus
 from app.models.user import TutorProfile, StudentProfile
+from app.services.lesson_reminders import LessonReminderService
+from app.services.notifications import NotificationService
 
 # Configura Stripe
 stripe.api_key = settings.STRIPE_SECRET_KEY
@@ -162,12 +164,13 @@ class PaymentService:
         if lesson:
             lesson.status = LessonStatus.confirmed
             lesson.updated_at = datetime.utcnow()
+            # Conferme (outbox o digest) e promemoria programmati, nello stesso commit del pagamento
+            notifications = NotificationService(self.db)
+            notifications.notify(notifications.lesson_confirmation_notifications(lesson))
+            LessonReminderService(self.db).schedule(lesson)
         
         self.db.commit()
         
-        # TODO: Invia email di conferma
-        # send_lesson_confirmation_email.delay(lesson.id)
-        
         return {
             'status': 'success',
             'lesson_id': lesson_id,
@@ -0,0 +1,191 @@
+"""
+Rendering dei PDF (appunti delle lezioni e report mensili) con WeasyPrint.
+
+WeasyPrint è CPU-bound: il rendering gira in un pool di processi dedicato
+(PDF_RENDER_WORKERS), così non blocca l'event loop né il GIL del processo
+chiamante. Ogni processo del pool carica una sola volta la configurazione
+dei font, i fogli di stile dei template (già analizzati) e i template
+compilati (app.core.templates, con cache del bytecode su disco); ogni
+richiesta passa solo il nome del template e un contesto di tipi semplici.
+
+Dentro un processo daemon (worker prefork di Celery) non si possono creare
+processi figli: lì, o con PDF_RENDER_WORKERS=0, si renderizza nel processo
+stesso, che è già uno dei processi paralleli del worker.
+"""
+import atexit
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from markupsafe import escape
+
+from app.core.config import settings
+from app.core.templates import TEMPLATE_DIR, document_env, render_document
+
+# Template PDF -> foglio di stile applicato al rendering
+PDF_STYLESHEETS = {
+    "lesson_notes.html": "lesson_notes.css",
+    "monthly_report.html": "monthly_report.css",
+}
+
+
+class PDFRenderingError(Exception):
+    """WeasyPrint non disponibile (librerie di sistema mancanti) o rendering fallito"""
+
+
+@dataclass
+class RenderedPDF:
+    content: bytes
+    pages: int
+
+
+# --- Stato del singolo processo (pool o chiamante) ---
+
+_weasyprint: Optional[Dict[str, Any]] = None
+_weasyprint_error: Optional[str] = None
+
+
+def _load_weasyprint() -> Dict[str, Any]:
+    from weasyprint import CSS, HTML
+    from weasyprint.text.fonts import FontConfiguration
+
+    font_config = FontConfiguration()
+    stylesheets = {
+        template: [CSS(filename=os.path.join(TEMPLATE_DIR, css), font_config=font_config)]
+        for template, css in PDF_STYLESHEETS.items()
+    }
+    return {"HTML": HTML, "font_config": font_config, "stylesheets": stylesheets}
+
+
+def _init_worker() -> None:
+    """Inizializzazione del processo: font, CSS e template pronti prima della prima richiesta"""
+    global _weasyprint, _weasyprint_error
+    if _weasyprint is not None or _weasyprint_error is not None:
+        return
+    for template in PDF_STYLESHEETS:
+        document_env().get_template(template)
+    try:
+        _weasyprint = _load_weasyprint()
+    except Exception as e:
+        # L'errore viene riportato a ogni richiesta invece di rompere il pool
+        _weasyprint_error = f"WeasyPrint non disponibile: {e}"
+
+
+def _render(template_name: str, context: Dict[str, Any]) -> RenderedPDF:
+    _init_worker()
+    if _weasyprint is None:
+        raise PDFRenderingError(_weasyprint_error)
+
+    html = render_document(template_name, context)
+    document = _weasyprint["HTML"](string=html, base_url=TEMPLATE_DIR).render(
+        stylesheets=_weasyprint["stylesheets"].get(template_name, []),
+        font_config=_weasyprint["font_config"],
+    )
+    return RenderedPDF(content=document.write_pdf(), pages=len(document.pages))
+
+
+class PDFRenderer:
+    def __init__(self, workers: Optional[int] = None, timeout: Optional[float] = None):
+        self.workers = settings.PDF_RENDER_WORKERS if workers is None else workers
+        self.timeout = timeout or settings.PDF_RENDER_TIMEOUT_SECONDS
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def uses_pool(self) -> bool:
+        return self.workers > 0 and not multiprocessing.current_process().daemon
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    # spawn: i processi non ereditano connessioni DB, thread e stato di Celery
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+            return self._pool
+
+    def render(self, template_name: str, context: Dict[str, Any]) -> RenderedPDF:
+        if not self.uses_pool:
+            return _render(template_name, context)
+        return self._executor().submit(_render, template_name, context).result(timeout=self.timeout)
+
+    def render_lesson_notes(self, context: Dict[str, Any]) -> bytes:
+        return self.render("lesson_notes.html", context).content
+
+    def render_monthly_report(self, context: Dict[str, Any]) -> bytes:
+        return self.render("monthly_report.html", context).content
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+pdf_renderer = PDFRenderer()
+atexit.register(pdf_renderer.shutdown)
+
+
+# --- Contesti dei template (solo tipi semplici: attraversano il confine tra processi) ---
+
+def _text_html(text: Optional[str]) -> str:
+    """Testo semplice -> paragrafi HTML con il contenuto escapato"""
+    paragraphs = [p.strip() for p in (text or "").split("\n\n") if p.strip()]
+    return "".join("<p>" + str(escape(p)).replace("\n", "<br>") + "</p>" for p in paragraphs)
+
+
+def _list_html(raw: Optional[str], empty: str) -> str:
+    """Lista JSON salvata sul report -> <ul>; testo libero -> paragrafi"""
+    if not raw:
+        return f"<p>{escape(empty)}</p>"
+    try:
+        items = json.loads(raw)
+    except ValueError:
+        return _text_html(raw)
+    if not isinstance(items, list) or not items:
+        return f"<p>{escape(empty)}</p>"
+    return "<ul>" + "".join(f"<li>{escape(str(item))}</li>" for item in items) + "</ul>"
+
+
+def lesson_notes_context(lesson, notes: str) -> Dict[str, Any]:
+    student = lesson.student.student_profile
+    tutor = lesson.tutor.tutor_profile
+    return {
+        "student_name": f"{student.first_name} {student.last_name}" if student else "Studente",
+        "tutor_name": f"{tutor.first_name} {tutor.last_name}" if tutor else "Tutor",
+        "subject": lesson.subject,
+        "date": lesson.start_at.strftime("%d/%m/%Y"),
+        "notes_html": str(escape(notes)).replace("\n", "<br>"),
+    }
+
+
+def monthly_report_context(report, lessons: List, student_name: str) -> Dict[str, Any]:
+    lessons_summary = ""
+    if lessons:
+        lessons_summary = "<ul>" + "".join(
+            f"<li><strong>{lesson.start_at.strftime('%d/%m/%Y')}</strong> - {escape(lesson.subject)}"
+            + (f": {escape(lesson.tutor_notes)}" if lesson.tutor_notes else "")
+            + "</li>"
+            for lesson in lessons
+        ) + "</ul>"
+
+    return {
+        "student_name": student_name,
+        "month": f"{report.period_start.month:02d}",
+        "year": str(report.period_start.year),
+        "total_lessons": report.lessons_count or 0,
+        "subjects_count": len({lesson.subject for lesson in lessons}),
+        "overview": _text_html(report.text),
+        "strengths": _list_html(report.key_achievements, "Vedi la panoramica generale."),
+        "improvements": _list_html(report.areas_for_improvement, "Vedi la panoramica generale."),
+        "recommendations": _list_html(report.recommendations, "Vedi la panoramica generale."),
+        "lessons_summary": lessons_summary,
+        "current_date": datetime.utcnow().strftime("%d/%m/%Y"),
+    }
@@ -1,53 +1,64 @@
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import datetime, timedelta
+from sqlalchemy.orm import Session, undefer
+from sqlalchemy import and_, func, or_, select, update
+from typing import Dict, List, Optional, Tuple
+from datetime import date, datetime, time, timedelta
 from app.models.user import User, StudentProfile
 from app.models.lesson import Lesson, LessonStatus
-from app.models.report import Report, ReportStatus
+from app.models.report import MonthlyReportRun, Report, ReportStatus
 from app.services.ai import ai_service
+from app.services.pdf import pdf_renderer, monthly_report_context
+from app.services.student_stats import StudentMonthStatsService
+from app.core.config import settings
 from app.core.storage import storage
-from jinja2 import Environment, FileSystemLoader
-import os
+import calendar
+import io
+import json
+from celery import chord
 from app.core.celery_app import celery_app
 
+def _period(year: int, month: int) -> Tuple[date, date]:
+    """Estremi del periodo di un report mensile (primo e ultimo giorno del mese, inclusi)"""
+    last_day = calendar.monthrange(year, month)[1]
+    return date(year, month, 1), date(year, month, last_day)
+
+
+def _previous_month(today: date) -> Tuple[int, int]:
+    """Anno e mese appena concluso (a gennaio è dicembre dell'anno prima)"""
+    if today.month == 1:
+        return today.year - 1, 12
+    return today.year, today.month - 1
+
+
 class ReportService:
     def __init__(self, db: Session):
         self.db = db
 
     def generate_monthly_report(self, student_id: int, month: int, year: int) -> Report:
         """Generate monthly report for a student"""
-        # Check if report already exists
-        existing_report = self.db.query(Report).filter(
-            Report.student_id == student_id,
-            Report.period_start == f"{year}-{month:02d}-01",
-            Report.period_end == f"{year}-{month:02d}-31"
-        ).first()
+        period_start, period_end = _period(year, month)
 
-        if existing_report:
-            return existing_report
+        report, claimed = self._claim_report(student_id, year, month)
+        if not claimed:
+            # Già pubblicato o in generazione su un altro worker: nessuna seconda chiamata AI
+            return report
 
-        # Create new report
-        report = Report(
-            student_id=student_id,
-            period_start=f"{year}-{month:02d}-01",
-            period_end=f"{year}-{month:02d}-31",
-            title=f"Report Mensile - {month:02d}/{year}",
-            status=ReportStatus.generating
-        )
-        self.db.add(report)
+        # Contatori del mese da student_month_stats: una riga invece di riaggregare lo storico
+        stats = StudentMonthStatsService(self.db).get(student_id, year, month)
+        report.lessons_count = stats.lessons_completed if stats else 0
+        report.average_rating = stats.average_rating if stats else 0.0
         self.db.commit()
-        self.db.refresh(report)
-
-        # Get lessons for the period
-        lessons = self.db.query(Lesson).filter(
-            Lesson.student_id == student_id,
-            Lesson.status == LessonStatus.completed,
-            Lesson.start_at >= f"{year}-{month:02d}-01",
-            Lesson.start_at <= f"{year}-{month:02d}-31"
-        ).all()
 
-        report.lessons_count = len(lessons)
-        self.db.commit()
+        lessons = []
+        if report.lessons_count:
+            # Il testo AI cita note e obiettivi delle singole lezioni: caricati solo se ce ne sono
+            lessons = self.db.query(Lesson).options(
+                undefer(Lesson.tutor_notes), undefer(Lesson.objectives)
+            ).filter(
+                Lesson.student_id == student_id,
+                Lesson.status == LessonStatus.completed,
+                Lesson.start_at >= datetime.combine(period_start, time.min),
+                Lesson.start_at < datetime.combine(period_end + timedelta(days=1), time.min)
+            ).all()
 
         if lessons:
             # Generate AI summary
@@ -61,24 +72,31 @@ class ReportService:
                 })
 
             # Use AI to generate report text
+            student_name = self._student_name(student_id)
             context = {
-                "student_name": f"{lessons[0].student.first_name} {lessons[0].student.last_name}",
+                "student_name": student_name,
                 "month": month,
                 "year": year,
                 "lessons": lessons_summary,
-                "total_lessons": len(lessons)
+                "total_lessons": stats.lessons_completed,
+                "total_minutes": stats.minutes,
+                "subjects": stats.subject_counts,
+                "assignments_graded": stats.assignments_graded,
+                "average_grade": stats.average_grade
             }
 
             report_text = ai_service.generate_monthly_report(context)
             report.text = report_text
 
             # Generate PDF
-            pdf_content = self._generate_report_pdf(report, lessons)
+            pdf_content = self._generate_report_pdf(report, lessons, student_name)
             if pdf_content:
                 # Upload PDF to storage
-                pdf_filename = f"reports/monthly_report_{student_id}_{year}_{month:02d}.pdf"
-                storage.upload_file(pdf_filename, pdf_content, "application/pdf")
-                report.pdf_path = pdf_filename
+                report.pdf_path = storage.upload_file(
+                    file_data=io.BytesIO(pdf_content),
+                    filename=f"reports/monthly_report_{student_id}_{year}_{month:02d}.pdf",
+                    content_type="application/pdf"
+                )
 
             report.status = ReportStatus.published
         else:
@@ -88,30 +106,83 @@ class ReportService:
         self.db.commit()
         return report
 
-    def _generate_report_pdf(self, report: Report, lessons: List[Lesson]) -> Optional[bytes]:
-        """Generate PDF for monthly report"""
-        try:
-            # Load template
-            env = Environment(loader=FileSystemLoader('templates'))
-            template = env.get_template('monthly_report.html')
-
-            # Prepare data for template
-            student = lessons[0].student if lessons else None
-            template_data = {
-                "report": report,
-                "student_name": f"{student.first_name} {student.last_name}" if student else "Studente",
-                "lessons": lessons,
-                "month": report.period_start.split('-')[1],
-                "year": report.period_start.split('-')[0]
-            }
+    def _claim_report(self, student_id: int, year: int, month: int) -> Tuple[Report, bool]:
+        """
+        Prende in carico il report del mese in modo atomico: (report, True) se
+        tocca a questo worker generarlo. La riga nuova nasce con
+        INSERT ... ON CONFLICT DO NOTHING RETURNING sul vincolo
+        (student_id, period_start); una riga esistente si riprende con un
+        UPDATE condizionale solo se fallita, in bozza o abbandonata da un
+        worker morto da più di REPORTS_CLAIM_TIMEOUT_SECONDS.
+        """
+        period_start, period_end = _period(year, month)
+        now = datetime.utcnow()
+        values = {
+            "student_id": student_id,
+            "period_start": period_start,
+            "period_end": period_end,
+            "title": f"Report Mensile - {month:02d}/{year}",
+            "status": ReportStatus.generating,
+            "created_at": now,
+            "updated_at": now,
+        }
 
-            # Render HTML
-            html_content = template.render(**template_data)
+        dialect = self.db.get_bind().dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            if dialect == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            claimed_id = self.db.execute(
+                insert(Report).values(**values).on_conflict_do_nothing(
+                    index_elements=["student_id", "period_start"]
+                ).returning(Report.id)
+            ).scalar()
+        else:
+            claimed_id = None
+            if self._find_report(student_id, period_start) is None:
+                report = Report(**values)
+                self.db.add(report)
+                self.db.flush()
+                claimed_id = report.id
 
-            # Generate PDF
-            pdf_content = ai_service.render_pdf(html_content)
-            return pdf_content
+        if claimed_id is None:
+            stale = now - timedelta(seconds=settings.REPORTS_CLAIM_TIMEOUT_SECONDS)
+            claimed_id = self.db.execute(
+                update(Report).where(
+                    Report.student_id == student_id,
+                    Report.period_start == period_start,
+                    or_(
+                        Report.status.in_([ReportStatus.failed, ReportStatus.draft]),
+                        and_(Report.status == ReportStatus.generating, Report.updated_at < stale)
+                    )
+                ).values(status=ReportStatus.generating, updated_at=now)
+                .returning(Report.id)
+                .execution_options(synchronize_session=False)
+            ).scalar()
+        self.db.commit()
 
+        report = self.db.query(Report).filter(
+            Report.student_id == student_id,
+            Report.period_start == period_start
+        ).populate_existing().one()
+        return report, claimed_id is not None
+
+    def _find_report(self, student_id: int, period_start: date) -> Optional[Report]:
+        return self.db.query(Report).filter(
+            Report.student_id == student_id,
+            Report.period_start == period_start
+        ).first()
+
+    def _student_name(self, student_id: int) -> str:
+        profile = self.db.query(StudentProfile).filter(StudentProfile.user_id == student_id).first()
+        return f"{profile.first_name} {profile.last_name}" if profile else "Studente"
+
+    def _generate_report_pdf(self, report: Report, lessons: List[Lesson], student_name: str) -> Optional[bytes]:
+        """Generate PDF for monthly report"""
+        try:
+            # Rendering nel pool di processi PDF (template e CSS già compilati)
+            return pdf_renderer.render_monthly_report(monthly_report_context(report, lessons, student_name))
         except Exception as e:
             print(f"Error generating report PDF: {e}")
             return None
@@ -138,43 +209,176 @@ class ReportService:
             self.db.commit()
 
     def generate_all_monthly_reports(self, year: int, month: int):
-        """Generate monthly reports for all active students"""
-        # Get all active students
-        students = self.db.query(StudentProfile).join(User).filter(
-            User.is_active == True
-        ).all()
+        """Generate monthly reports for all active students (in sequenza, senza Celery)"""
+        return self.generate_reports_for(self.pending_student_ids(year, month), year, month)
+
+    # --- Generazione massiva: fan-out su reports_queue ---
+
+    def pending_student_ids(self, year: int, month: int) -> List[int]:
+        """Studenti attivi senza report pubblicato per il mese: rilanciare un run salta quelli già fatti"""
+        period_start, _ = _period(year, month)
+        published = select(Report.student_id).where(
+            Report.period_start == period_start,
+            Report.status == ReportStatus.published
+        )
+        rows = self.db.query(StudentProfile.user_id).join(User).filter(
+            User.is_active == True,
+            StudentProfile.user_id.notin_(published)
+        ).order_by(StudentProfile.user_id).all()
+        return [row.user_id for row in rows]
 
-        for student in students:
+    def generate_reports_for(self, student_ids: List[int], year: int, month: int) -> Dict:
+        """Genera i report di un gruppo di studenti; un errore non ferma gli altri"""
+        published, failed = 0, []
+        for student_id in student_ids:
             try:
-                self.generate_monthly_report(student.user_id, month, year)
+                report = self.generate_monthly_report(student_id, month, year)
+                if report.status == ReportStatus.published:
+                    published += 1  # non conta i report presi in carico da un altro worker
             except Exception as e:
-                print(f"Error generating report for student {student.user_id}: {e}")
-                continue
+                self.db.rollback()
+                print(f"Error generating report for student {student_id}: {e}")
+                self._mark_student_report_failed(student_id, year, month, str(e))
+                failed.append(student_id)
+        return {"published": published, "failed": failed}
+
+    def _mark_student_report_failed(self, student_id: int, year: int, month: int, error_message: str):
+        report = self._find_report(student_id, _period(year, month)[0])
+        if report:
+            self.mark_report_failed(report.id, error_message)
+
+    def dispatch_monthly_reports(self, year: int, month: int) -> Dict:
+        """
+        Divide gli studenti ancora da fare in gruppi da REPORTS_CHUNK_SIZE e li
+        accoda su reports_queue come chord: il riepilogo parte quando tutti i
+        gruppi sono finiti. La concorrenza è quella dei worker di reports_queue.
+        """
+        student_ids = self.pending_student_ids(year, month)
+        size = settings.REPORTS_CHUNK_SIZE
+        chunks = [student_ids[i:i + size] for i in range(0, len(student_ids), size)]
+
+        # Stato del run nel database: worker e API sono processi diversi
+        period_start = _period(year, month)[0]
+        run = self.db.query(MonthlyReportRun).filter(
+            MonthlyReportRun.period_start == period_start
+        ).first() or MonthlyReportRun(period_start=period_start)
+        run.status = "running" if chunks else "completed"
+        run.students = len(student_ids)
+        run.chunks = len(chunks)
+        run.started_at = datetime.utcnow()
+        run.finished_at = None
+        run.summary = None
+        self.db.add(run)
+        self.db.commit()
+
+        if chunks:
+            chord(
+                generate_monthly_report_chunk_task.s(chunk, year, month) for chunk in chunks
+            )(summarize_monthly_reports_task.s(year, month))
+        return run.as_dict()
+
+    def _monthly_run(self, year: int, month: int) -> Optional[MonthlyReportRun]:
+        return self.db.query(MonthlyReportRun).filter(
+            MonthlyReportRun.period_start == _period(year, month)[0]
+        ).first()
+
+    def complete_monthly_run(self, year: int, month: int, results: List[Dict]) -> Dict:
+        """Riepilogo del run quando tutti i gruppi sono finiti"""
+        progress = self.monthly_progress(year, month)
+        run = self._monthly_run(year, month)
+        if run is None:
+            run = MonthlyReportRun(period_start=_period(year, month)[0], started_at=datetime.utcnow(), chunks=len(results))
+            self.db.add(run)
+
+        failed_ids = [student_id for result in results for student_id in result["failed"]]
+        run.status = "completed"
+        run.finished_at = datetime.utcnow()
+        run.summary = json.dumps({
+            "published": sum(result["published"] for result in results),
+            "failed": len(failed_ids),
+            "failed_student_ids": failed_ids[:100],
+            "total_published": progress["published"],
+            "total_students": progress["total_students"],
+        })
+        self.db.commit()
+        return run.as_dict()
+
+    def monthly_progress(self, year: int, month: int) -> Dict:
+        """Avanzamento del mese calcolato dai report salvati, più lo stato dell'ultimo run"""
+        period_start, _ = _period(year, month)
+        counts = dict(self.db.query(Report.status, func.count(Report.id)).filter(
+            Report.period_start == period_start
+        ).group_by(Report.status).all())
+        total = self.db.query(func.count(StudentProfile.id)).join(User).filter(
+            User.is_active == True
+        ).scalar() or 0
+
+        run = self._monthly_run(year, month)
+
+        published = counts.get(ReportStatus.published, 0)
+        failed = counts.get(ReportStatus.failed, 0)
+        generating = counts.get(ReportStatus.generating, 0)
+        return {
+            "year": year,
+            "month": month,
+            "total_students": total,
+            "published": published,
+            "failed": failed,
+            "generating": generating,
+            "pending": max(total - published - failed - generating, 0),
+            "run": run.as_dict() if run else None,
+        }
 
 # Celery task for generating monthly reports
 @celery_app.task(name="app.services.reports.generate_monthly_reports")
 def generate_monthly_reports_task():
     """Celery task to generate monthly reports for all students"""
     from app.core.db import SessionLocal
-    from datetime import datetime
     
     db = SessionLocal()
     try:
         report_service = ReportService(db)
         
-        # Get current month and year
-        now = datetime.now()
-        month = now.month
-        year = now.year
+        # Il 1° del mese si generano i report del mese appena concluso
+        today = date.today()
+        year, month = _previous_month(today)
         
         # Only run on the 1st of the month
-        if now.day == 1:
-            report_service.generate_all_monthly_reports(year, month)
-            return {"status": "success", "month": month, "year": year}
+        if today.day == 1:
+            run = report_service.dispatch_monthly_reports(year, month)
+            return {"status": "dispatched", "month": month, "year": year,
+                    "students": run["students"], "chunks": run["chunks"]}
         else:
             return {"status": "skipped", "reason": "Not first day of month"}
             
     except Exception as e:
         return {"status": "error", "error": str(e)}
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+@celery_app.task(name="app.services.reports.generate_monthly_report_chunk", acks_late=True)
+def generate_monthly_report_chunk_task(student_ids: List[int], year: int, month: int):
+    """Un gruppo di report; acks_late: se il worker muore il gruppo viene riconsegnato"""
+    from app.core.db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return ReportService(db).generate_reports_for(student_ids, year, month)
+    finally:
+        db.close()
+
+
+@celery_app.task(name="app.services.reports.summarize_monthly_reports")
+def summarize_monthly_reports_task(results: List[Dict], year: int, month: int):
+    """Corpo del chord: riepilogo del run quando tutti i gruppi sono finiti"""
+    from app.core.db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        run = ReportService(db).complete_monthly_run(year, month, results)
+    finally:
+        db.close()
+
+    print(f"📊 Report mensili {month:02d}/{year}: {run['published']} generati, {run['failed']} falliti")
+    return run
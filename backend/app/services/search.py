@@ -0,0 +1,274 @@
+"""
+Ricerca full-text su appunti delle lezioni e compiti.
+
+Su Postgres usa le colonne ``search_vector`` (tsvector, configurazione
+``italian``) create dalla migrazione 7a1d2f9c4e01 e indicizzate con GIN.
+Su altri database (SQLite nei test) costruisce un piccolo indice invertito
+in memoria sui soli documenti che l'utente può vedere.
+
+Gli snippet sono frammenti HTML: il testo viene sempre escapato e gli unici
+tag presenti sono i ``<mark>`` dell'evidenziazione.
+"""
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from markupsafe import escape
+from sqlalchemy import and_, func, literal_column, select
+from sqlalchemy.orm import Session, undefer
+
+from app.models.assignment import Assignment
+from app.models.lesson import Lesson
+from app.models.user import User, Role
+
+TS_CONFIG = "italian"
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_STOP = "</mark>"
+# ts_headline restituisce il testo grezzo: delimitatori sentinella (uso privato Unicode)
+# sostituiti con <mark> solo dopo l'escape (snippet_html)
+SENTINEL_START = "\ue000"
+SENTINEL_STOP = "\ue001"
+HEADLINE_OPTIONS = (
+    f"StartSel={SENTINEL_START}, StopSel={SENTINEL_STOP}, "
+    "MaxWords=35, MinWords=15, MaxFragments=2, FragmentDelimiter= … "
+)
+
+# Pesi dei campi allineati a ts_rank (A=1.0, B=0.4, C=0.2)
+FIELD_WEIGHTS = {"A": 1.0, "B": 0.4, "C": 0.2}
+
+ITALIAN_STOPWORDS = {
+    "a", "ad", "al", "alla", "alle", "allo", "agli", "ai", "che", "chi", "con",
+    "da", "dal", "dalla", "dei", "del", "della", "delle", "dello", "di", "e",
+    "ed", "gli", "i", "il", "in", "la", "le", "lo", "ma", "nei", "nel", "nella",
+    "non", "o", "per", "piu", "se", "si", "su", "sul", "sulla", "tra", "fra",
+    "un", "una", "uno", "come", "anche", "sono", "questo", "questa",
+}
+
+
+@dataclass
+class SearchHit:
+    kind: str  # "lesson" | "assignment"
+    id: int
+    title: str
+    subject: str
+    date: datetime
+    rank: float
+    snippet: str
+
+
+class SearchService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def search(self, user: User, query: str, limit: int = 20) -> List[SearchHit]:
+        """Cerca negli appunti e nei compiti visibili all'utente"""
+        if user.role not in (Role.student, Role.tutor, Role.admin):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Ricerca disponibile solo per studenti e tutor"
+            )
+
+        if not tokenize(query):
+            return []
+
+        if self.db.get_bind().dialect.name == "postgresql":
+            hits = self._search_postgres(user, query, limit)
+        else:
+            hits = self._search_fallback(user, query, limit)
+
+        hits.sort(key=lambda hit: hit.rank, reverse=True)
+        return hits[:limit]
+
+    # --- Autorizzazione ---
+
+    def _lesson_filter(self, user: User):
+        if user.role == Role.student:
+            return Lesson.student_id == user.id
+        if user.role == Role.tutor:
+            return Lesson.tutor_id == user.id
+        return Lesson.id.isnot(None)
+
+    def _assignment_filter(self, user: User):
+        if user.role == Role.student:
+            return Assignment.student_id == user.id
+        if user.role == Role.tutor:
+            return Assignment.tutor_id == user.id
+        return Assignment.id.isnot(None)
+
+    # --- Postgres: tsvector + GIN ---
+
+    def _search_postgres(self, user: User, query: str, limit: int) -> List[SearchHit]:
+        ts_query = func.websearch_to_tsquery(TS_CONFIG, query)
+
+        # Classifica e limita prima, poi calcola ts_headline solo sulle righe restituite
+        lesson_vector = literal_column("lessons.search_vector")
+        lesson_rank = func.ts_rank_cd(lesson_vector, ts_query).label("rank")
+        lesson_top = (
+            select(Lesson.id, lesson_rank)
+            .where(and_(lesson_vector.op("@@")(ts_query), self._lesson_filter(user)))
+            .order_by(lesson_rank.desc())
+            .limit(limit)
+            .subquery()
+        )
+        lesson_rows = self.db.execute(
+            select(
+                Lesson.id, Lesson.subject, Lesson.start_at, lesson_top.c.rank,
+                func.ts_headline(
+                    TS_CONFIG, func.coalesce(Lesson.notes_text, ""), ts_query, HEADLINE_OPTIONS
+                ).label("snippet"),
+            ).join(lesson_top, lesson_top.c.id == Lesson.id)
+        ).all()
+
+        assignment_vector = literal_column("assignments.search_vector")
+        assignment_rank = func.ts_rank_cd(assignment_vector, ts_query).label("rank")
+        assignment_top = (
+            select(Assignment.id, assignment_rank)
+            .where(and_(assignment_vector.op("@@")(ts_query), self._assignment_filter(user)))
+            .order_by(assignment_rank.desc())
+            .limit(limit)
+            .subquery()
+        )
+        assignment_rows = self.db.execute(
+            select(
+                Assignment.id, Assignment.title, Assignment.subject, Assignment.due_date,
+                assignment_top.c.rank,
+                func.ts_headline(
+                    TS_CONFIG, Assignment.description + " " + Assignment.instructions,
+                    ts_query, HEADLINE_OPTIONS
+                ).label("snippet"),
+            ).join(assignment_top, assignment_top.c.id == Assignment.id)
+        ).all()
+
+        hits = [
+            SearchHit("lesson", row.id, f"Appunti - {row.subject}", row.subject,
+                      row.start_at, float(row.rank), snippet_html(row.snippet))
+            for row in lesson_rows
+        ]
+        hits.extend(
+            SearchHit("assignment", row.id, row.title, row.subject,
+                      row.due_date, float(row.rank), snippet_html(row.snippet))
+            for row in assignment_rows
+        )
+        return hits
+
+    # --- Fallback: indice invertito in memoria ---
+
+    def _search_fallback(self, user: User, query: str, limit: int) -> List[SearchHit]:
+        index = InvertedIndex()
+        documents: Dict[Tuple[str, int], SearchHit] = {}
+        bodies: Dict[Tuple[str, int], str] = {}
+
+        lessons = self.db.query(Lesson).options(undefer(Lesson.notes_text)).filter(
+            self._lesson_filter(user), Lesson.notes_text.isnot(None)
+        ).all()
+        for lesson in lessons:
+            key = ("lesson", lesson.id)
+            index.add(key, {"A": lesson.subject, "B": lesson.notes_text})
+            bodies[key] = lesson.notes_text
+            documents[key] = SearchHit("lesson", lesson.id, f"Appunti - {lesson.subject}",
+                                       lesson.subject, lesson.start_at, 0.0, "")
+
+        assignments = self.db.query(Assignment).filter(self._assignment_filter(user)).all()
+        for assignment in assignments:
+            key = ("assignment", assignment.id)
+            index.add(key, {"A": assignment.title, "B": assignment.description,
+                            "C": assignment.instructions})
+            bodies[key] = f"{assignment.description} {assignment.instructions}"
+            documents[key] = SearchHit("assignment", assignment.id, assignment.title,
+                                       assignment.subject, assignment.due_date, 0.0, "")
+
+        hits = []
+        terms = set(tokenize(query))
+        for key, score in index.search(query, limit):
+            hit = documents[key]
+            hit.rank = score
+            hit.snippet = highlight(bodies[key], terms)
+            hits.append(hit)
+        return hits
+
+
+def _normalize(word: str) -> str:
+    word = unicodedata.normalize("NFKD", word.lower())
+    word = "".join(ch for ch in word if not unicodedata.combining(ch))
+    # Stemming minimo: "equazione"/"equazioni" -> "equazion"
+    if len(word) > 4 and word[-1] in "aeio":
+        word = word[:-1]
+    return word
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Parole normalizzate (minuscole, senza accenti né stopword)"""
+    if not text:
+        return []
+    terms = []
+    for word in re.findall(r"\w+", text):
+        if word.lower() in ITALIAN_STOPWORDS:
+            continue
+        terms.append(_normalize(word))
+    return terms
+
+
+class InvertedIndex:
+    """Indice invertito con punteggio BM25 pesato per campo"""
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[Tuple[str, int], float]] = defaultdict(dict)
+        self.lengths: Dict[Tuple[str, int], int] = {}
+
+    def add(self, doc_id: Tuple[str, int], fields: Dict[str, Optional[str]]) -> None:
+        weighted: Counter = Counter()
+        length = 0
+        for weight, text in fields.items():
+            terms = tokenize(text)
+            length += len(terms)
+            for term in terms:
+                weighted[term] += FIELD_WEIGHTS[weight]
+        self.lengths[doc_id] = length
+        for term, tf in weighted.items():
+            self.postings[term][doc_id] = tf
+
+    def search(self, query: str, limit: int) -> List[Tuple[Tuple[str, int], float]]:
+        if not self.lengths:
+            return []
+        n_docs = len(self.lengths)
+        avg_length = sum(self.lengths.values()) / n_docs or 1.0
+        scores: Dict[Tuple[str, int], float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                norm = 1 - self.B + self.B * self.lengths[doc_id] / avg_length
+                scores[doc_id] += idf * tf * (self.K1 + 1) / (tf + self.K1 * norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:limit]
+
+
+def snippet_html(headline: str) -> str:
+    """Risultato di ts_headline come HTML: testo escapato, sentinelle sostituite con <mark>"""
+    return str(escape(headline)).replace(SENTINEL_START, HIGHLIGHT_START).replace(SENTINEL_STOP, HIGHLIGHT_STOP)
+
+
+def highlight(text: str, terms: set, window: int = 30) -> str:
+    """Frammento HTML attorno alla prima occorrenza, con il testo escapato e i termini evidenziati"""
+    words = text.split()
+    matches = [i for i, word in enumerate(words) if _normalize(re.sub(r"\W", "", word)) in terms]
+    if not matches:
+        return " ".join(str(escape(word)) for word in words[:window])
+    start = max(0, matches[0] - window // 3)
+    fragment = words[start:start + window]
+    marked = [
+        f"{HIGHLIGHT_START}{escape(word)}{HIGHLIGHT_STOP}"
+        if _normalize(re.sub(r"\W", "", word)) in terms else str(escape(word))
+        for word in fragment
+    ]
+    return " ".join(marked)
@@ -0,0 +1,147 @@
+"""
+Aggregati mensili per studente (tabella student_month_stats).
+
+I metodi ``lesson_completed`` e ``submission_graded`` aggiornano la riga
+del mese nella sessione del chiamante, senza commit: il contatore viene
+salvato nella stessa transazione del cambiamento che lo ha prodotto. La
+riga viene creata con INSERT ... ON CONFLICT DO NOTHING e poi bloccata
+(SELECT ... FOR UPDATE) così due richieste concorrenti non perdono
+incrementi. ``rebuild`` ricalcola un mese dallo storico, compresi i
+voti dei feedback (non esiste ancora un endpoint che li crei).
+"""
+import json
+from collections import Counter
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.assignment import AssignmentSubmission, AssignmentStatus
+from app.models.feedback import Feedback
+from app.models.lesson import Lesson, LessonStatus
+from app.models.student_month_stats import StudentMonthStats
+
+
+def _month_bounds(year: int, month: int) -> Tuple[datetime, datetime]:
+    """[primo giorno del mese, primo giorno del mese successivo)"""
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return start, end
+
+
+class StudentMonthStatsService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get(self, student_id: int, year: int, month: int) -> Optional[StudentMonthStats]:
+        return self.db.query(StudentMonthStats).filter(
+            StudentMonthStats.student_id == student_id,
+            StudentMonthStats.year == year,
+            StudentMonthStats.month == month
+        ).first()
+
+    # --- Aggiornamenti incrementali ---
+
+    def lesson_completed(self, lesson: Lesson) -> StudentMonthStats:
+        stats = self._locked_row(lesson.student_id, lesson.start_at)
+        subjects = stats.subject_counts
+        subjects[lesson.subject] = subjects.get(lesson.subject, 0) + 1
+        stats.lessons_completed += 1
+        stats.minutes += lesson.duration_minutes
+        stats.subjects = json.dumps(subjects, ensure_ascii=False, sort_keys=True)
+        return stats
+
+    def submission_graded(
+        self,
+        submission: AssignmentSubmission,
+        previous_grade: Optional[int] = None,
+        previous_graded_at: Optional[datetime] = None,
+    ) -> StudentMonthStats:
+        """Nuovo voto; per una rivalutazione sostituisce il voto precedente nel suo mese"""
+        if previous_grade is not None and previous_graded_at is not None:
+            stats = self._locked_row(submission.student_id, previous_graded_at)
+            stats.grade_sum += submission.grade - previous_grade
+            return stats
+
+        stats = self._locked_row(submission.student_id, submission.graded_at)
+        stats.assignments_graded += 1
+        stats.grade_sum += submission.grade
+        return stats
+
+    # --- Ricostruzione dallo storico ---
+
+    def rebuild(self, student_id: int, year: int, month: int) -> StudentMonthStats:
+        """Ricalcola il mese dai dati grezzi (backfill o correzione di una deriva)"""
+        start, end = _month_bounds(year, month)
+        stats = self._locked_row(student_id, start)
+
+        lessons = self.db.query(Lesson).filter(
+            Lesson.student_id == student_id,
+            Lesson.status == LessonStatus.completed,
+            Lesson.start_at >= start,
+            Lesson.start_at < end
+        ).all()
+        rating_sum, rating_count = self.db.query(
+            func.coalesce(func.sum(Feedback.rating), 0), func.count(Feedback.id)
+        ).join(Lesson, Lesson.id == Feedback.lesson_id).filter(
+            Lesson.student_id == student_id,
+            Lesson.start_at >= start,
+            Lesson.start_at < end
+        ).one()
+        graded, grade_sum = self.db.query(
+            func.count(AssignmentSubmission.id), func.coalesce(func.sum(AssignmentSubmission.grade), 0)
+        ).filter(
+            AssignmentSubmission.student_id == student_id,
+            AssignmentSubmission.status == AssignmentStatus.graded,
+            AssignmentSubmission.grade.isnot(None),
+            AssignmentSubmission.graded_at >= start,
+            AssignmentSubmission.graded_at < end
+        ).one()
+
+        stats.lessons_completed = len(lessons)
+        stats.minutes = sum(lesson.duration_minutes for lesson in lessons)
+        stats.subjects = json.dumps(Counter(lesson.subject for lesson in lessons), ensure_ascii=False, sort_keys=True)
+        stats.rating_sum, stats.rating_count = int(rating_sum), rating_count
+        stats.assignments_graded, stats.grade_sum = graded, int(grade_sum)
+        return stats
+
+    def rebuild_all(self) -> int:
+        """Ricostruisce tutti i mesi con lezioni completate o compiti valutati"""
+        periods = set()
+        for student_id, when in self.db.query(Lesson.student_id, Lesson.start_at).filter(
+            Lesson.status == LessonStatus.completed
+        ):
+            periods.add((student_id, when.year, when.month))
+        for student_id, when in self.db.query(AssignmentSubmission.student_id, AssignmentSubmission.graded_at).filter(
+            AssignmentSubmission.graded_at.isnot(None)
+        ):
+            periods.add((student_id, when.year, when.month))
+
+        for student_id, year, month in sorted(periods):
+            self.rebuild(student_id, year, month)
+            self.db.commit()
+        return len(periods)
+
+    # --- Riga del mese ---
+
+    def _locked_row(self, student_id: int, when: datetime) -> StudentMonthStats:
+        # Modifiche pendenti prima della rilettura (populate_existing le sovrascriverebbe)
+        self.db.flush()
+        values = {"student_id": student_id, "year": when.year, "month": when.month}
+        dialect = self.db.get_bind().dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            if dialect == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            self.db.execute(
+                insert(StudentMonthStats).values(**values).on_conflict_do_nothing(
+                    index_elements=["student_id", "year", "month"]
+                )
+            )
+        elif self.get(**values) is None:
+            self.db.add(StudentMonthStats(**values))
+            self.db.flush()
+
+        return self.db.query(StudentMonthStats).filter_by(**values).with_for_update().populate_existing().one()
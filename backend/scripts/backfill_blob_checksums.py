@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Script per calcolare lo SHA-256 dei blob creati dalla migrazione c4e8a2f6d1b7
+Usa il checksum già salvato sui file quando c'è, altrimenti legge l'oggetto dallo storage
+I contenuti duplicati vengono uniti: le copie restano senza riferimenti e le rimuove il garbage collector
+Uso: python scripts/backfill_blob_checksums.py [--batch 100]
+"""
+import argparse
+import hashlib
+
+from app.core.config import settings
+from app.core.db import SessionLocal
+from app.core.storage import storage
+from app.models.blob import Blob
+from app.models.file import File
+from app.services.blobs import BlobService
+
+
+def _checksum(db, blob: Blob) -> str:
+    known = {
+        checksum for (checksum,) in db.query(File.checksum_sha256).filter(File.blob_id == blob.id)
+    }
+    if len(known) == 1 and None not in known:
+        return known.pop()
+
+    digest = hashlib.sha256()
+    stream = storage.download_stream(blob.stored_path)
+    try:
+        for chunk in iter(lambda: stream.read(settings.DOWNLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    finally:
+        stream.close()
+    return digest.hexdigest()
+
+
+def backfill(batch_size: int):
+    db = SessionLocal()
+    processed, merged, failed, last_id = 0, 0, 0, 0
+    try:
+        print('\n🔄 Calcolo checksum dei blob migrati...')
+        while True:
+            blobs = db.query(Blob).filter(Blob.sha256.is_(None), Blob.id > last_id).order_by(Blob.id).limit(batch_size).all()
+            if not blobs:
+                break
+            for blob in blobs:
+                last_id = blob.id
+                try:
+                    kept = BlobService(db).assign_checksum(blob, _checksum(db, blob))
+                    db.commit()
+                except Exception as e:
+                    db.rollback()
+                    failed += 1
+                    print(f'   ⚠️  {blob.stored_path}: {e}')
+                    continue
+                processed += 1
+                merged += kept.id != blob.id
+            print(f'   {processed} blob elaborati...')
+        print(f'✅ {processed} blob con checksum, {merged} duplicati uniti, {failed} errori\n')
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch", type=int, default=100)
+    backfill(parser.parse_args().batch)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Benchmark offline delle pipeline AI con il provider LLM finto (nessuna rete, nessun costo)
+Uso: python scripts/benchmark_llm.py [--requests 50] [--latency 0.5] [--tokens 300] [--transcript-words 12000]
+"""
+import argparse
+import asyncio
+import time
+
+from app.core.cache import ResultCache
+from app.core.config import settings
+from app.core.llm import LLMClient
+from app.core.llm_providers import FakeProvider
+from app.services.notes_pipeline import TranscriptNotesPipeline
+
+
+def _transcript(words: int, seed: int) -> str:
+    sentence = "Oggi abbiamo visto la derivata della funzione x elevato alla {n} e un esempio svolto."
+    return " ".join(sentence.format(n=seed * 1000 + i) for i in range(words // 15 + 1))
+
+
+async def run(args) -> None:
+    settings.LLM_USAGE_ENABLED = False  # le chiamate finte non vanno in ai_usage
+    client = LLMClient(
+        provider=FakeProvider(latency=args.latency, completion_tokens=args.tokens),
+        cache=ResultCache(redis_url=None),
+    )
+
+    async def notes(i: int) -> str:
+        # Un tutor diverso per richiesta: si misura il limite globale, non quello per tutor
+        pipeline = TranscriptNotesPipeline(
+            lambda messages: client.complete(messages, temperature=0.3, max_tokens=3000, tutor_id=i)
+        )
+        return await pipeline.generate("Matematica", _transcript(args.transcript_words, i))
+
+    started = time.perf_counter()
+    await asyncio.gather(*[notes(i) for i in range(args.requests)])
+    elapsed = time.perf_counter() - started
+
+    print('\n' + '='*60)
+    print('⏱️  BENCHMARK PIPELINE APPUNTI (provider finto)')
+    print('='*60)
+    print(f'  Richieste:          {args.requests}')
+    print(f'  Latenza simulata:   {args.latency:.2f}s per chiamata')
+    print(f'  Tempo totale:       {elapsed:.2f}s')
+    print(f'  Throughput:         {args.requests / elapsed:.2f} appunti/s')
+    print(f'  Cache:              {client.cache_stats()}')
+    print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--tokens", type=int, default=300)
+    parser.add_argument("--transcript-words", type=int, default=12000)
+    asyncio.run(run(parser.parse_args()))
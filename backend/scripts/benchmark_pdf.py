@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark del rendering PDF dei report mensili nel pool di processi (pagine/s per core)
+Uso: python scripts/benchmark_pdf.py [--reports 40] [--workers 1,2,4] [--lessons 12]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import wait
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+from app.services.pdf import PDFRenderer, PDFRenderingError, _render, monthly_report_context
+
+
+def _context(lessons_count: int) -> dict:
+    report = SimpleNamespace(
+        period_start=date(2026, 3, 1),
+        lessons_count=lessons_count,
+        text="\n\n".join(
+            f"Nel mese lo studente ha lavorato sul capitolo {i} con costanza e buoni risultati."
+            for i in range(8)
+        ),
+        key_achievements='["Equazioni di secondo grado", "Metodo di studio"]',
+        areas_for_improvement='["Geometria analitica"]',
+        recommendations='["Esercizi settimanali sulle parabole"]',
+    )
+    start = datetime(2026, 3, 2, 15)
+    lessons = [
+        SimpleNamespace(
+            start_at=start + timedelta(days=2 * i),
+            subject=("Matematica", "Fisica")[i % 2],
+            tutor_notes="Ripasso della teoria ed esercizi guidati, buona partecipazione.",
+        )
+        for i in range(lessons_count)
+    ]
+    return monthly_report_context(report, lessons, "Mario Rossi")
+
+
+def run(args) -> None:
+    context = _context(args.lessons)
+    try:
+        pages_per_report = _render("monthly_report.html", context).pages
+    except PDFRenderingError as e:
+        print(f"❌ {e}")
+        return
+
+    print('\n' + '='*60)
+    print('📄 BENCHMARK RENDERING PDF (report mensile)')
+    print('='*60)
+    print(f'  Report per prova:   {args.reports} ({pages_per_report} pagine ciascuno)')
+    print(f'  Core disponibili:   {os.cpu_count()}')
+    print()
+
+    for workers in args.workers:
+        renderer = PDFRenderer(workers=workers)
+        try:
+            # Riscaldamento: avvio dei processi, font, CSS e template fuori dalla misura
+            wait([renderer._executor().submit(_render, "monthly_report.html", context) for _ in range(workers)])
+
+            started = time.perf_counter()
+            futures = [
+                renderer._executor().submit(_render, "monthly_report.html", context)
+                for _ in range(args.reports)
+            ]
+            pages = sum(future.result().pages for future in futures)
+            elapsed = time.perf_counter() - started
+        finally:
+            renderer.shutdown()
+
+        print(f'  {workers} processi: {pages / elapsed:7.2f} pagine/s   '
+              f'{pages / elapsed / workers:6.2f} pagine/s per core   ({elapsed:.2f}s)')
+    print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reports", type=int, default=40)
+    parser.add_argument("--workers", type=lambda value: [int(v) for v in value.split(",")], default=[1, 2, 4])
+    parser.add_argument("--lessons", type=int, default=12)
+    run(parser.parse_args())
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark dell'invio email: una connessione SMTP per messaggio contro il pool con send_many
+Usa un server SMTP locale minimale che scarta i messaggi (nessuna dipendenza esterna)
+Uso: python scripts/benchmark_smtp.py [--emails 200] [--handshake-ms 60]
+"""
+import argparse
+import smtplib
+import socketserver
+import threading
+import time
+
+from app.core.config import settings
+from app.core.emailer import EmailService, OutgoingEmail, SMTPConnectionPool
+
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+    """Server SMTP minimale: accetta tutto e scarta i messaggi"""
+
+    handshake_seconds = 0.0
+
+    def _reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self) -> None:
+        # Il ritardo iniziale simula il costo di STARTTLS + LOGIN di un server reale
+        time.sleep(self.handshake_seconds)
+        self._reply("220 sink ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip().upper()
+            if command.startswith("EHLO"):
+                self._reply("250-sink")
+                self._reply("250 8BITMIME")
+            elif command == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                self._reply("250 OK")
+            elif command == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:  # HELO, MAIL, RCPT, RSET, NOOP
+                self._reply("250 OK")
+
+
+def _start_sink(handshake_seconds: float) -> socketserver.ThreadingTCPServer:
+    _SinkHandler.handshake_seconds = handshake_seconds
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _SinkHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(args) -> None:
+    sink = _start_sink(args.handshake_ms / 1000)
+    settings.SMTP_HOST, settings.SMTP_PORT = sink.server_address
+    settings.SMTP_USE_TLS, settings.SMTP_USER = False, ""
+
+    emails = [
+        OutgoingEmail(f"studente{i}@example.com", f"Promemoria lezione {i}", f"<p>Lezione {i}</p>")
+        for i in range(args.emails)
+    ]
+    service = EmailService(pool=SMTPConnectionPool(size=1))
+
+    started = time.perf_counter()
+    for email in emails:
+        with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT) as server:
+            server.send_message(service._build_message(email))
+    per_message = time.perf_counter() - started
+
+    started = time.perf_counter()
+    sent = service.send_many(emails)
+    pooled = time.perf_counter() - started
+    sink.shutdown()
+
+    print('\n' + '='*60)
+    print('📧 BENCHMARK INVIO EMAIL (server SMTP locale)')
+    print('='*60)
+    print(f'  Email:                     {args.emails}')
+    print(f'  Handshake simulato:        {args.handshake_ms} ms')
+    print(f'  Una connessione per email: {per_message:.2f}s ({args.emails / per_message:.1f} email/s)')
+    print(f'  Pool + send_many:          {pooled:.2f}s ({args.emails / pooled:.1f} email/s), '
+          f'{sum(sent)} inviate, {service.pool.connections_opened} connessioni')
+    print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--emails", type=int, default=200)
+    parser.add_argument("--handshake-ms", type=int, default=60)
+    run(parser.parse_args())
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark delle chiamate allo storage da codice async: chiamate dirette (bloccano l'event loop)
+contro run_storage (thread limitati a STORAGE_MAX_CONNECTIONS)
+Usa InMemoryStorage con una latenza simulata per chiamata, o lo storage configurato con --configured
+Uso: python scripts/benchmark_storage.py [--requests 200] [--latency 0.02] [--size 262144] [--configured]
+"""
+import argparse
+import asyncio
+import io
+import os
+import time
+
+from app.core.config import settings
+from app.core.storage import InMemoryStorage, get_storage, run_storage
+
+
+async def _loop_lag(stop: asyncio.Event, samples: list) -> None:
+    """Ritardo dell'event loop: quanto tarda un risveglio programmato ogni 10 ms"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        samples.append(time.perf_counter() - started - 0.01)
+
+
+async def _download(target, path: str, offload: bool) -> int:
+    if offload:
+        stream = await run_storage(target.download_stream, path)
+        return len(await run_storage(stream.read))
+    return len(target.download_stream(path).read())
+
+
+async def _scenario(target, path: str, requests: int, offload: bool):
+    stop, samples = asyncio.Event(), []
+    monitor = asyncio.create_task(_loop_lag(stop, samples))
+    started = time.perf_counter()
+    sizes = await asyncio.gather(*(_download(target, path, offload) for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await monitor
+    return elapsed, sum(sizes), max(samples, default=0.0)
+
+
+def run(args) -> None:
+    target = get_storage() if args.configured else InMemoryStorage(latency=args.latency)
+    path = target.upload_file(io.BytesIO(os.urandom(args.size)), "benchmark.bin", "application/octet-stream")
+    try:
+        print('\n' + '='*72)
+        print(f'🗄️  BENCHMARK STORAGE ({type(target).__name__}, {args.requests} download da {args.size // 1024} KB)')
+        print('='*72)
+        print(f'  {"Modalità":<24}{"tempo (s)":>12}{"MB/s":>10}{"ritardo loop max (ms)":>24}')
+        for label, offload in (("chiamate dirette", False), (f"run_storage ({settings.STORAGE_MAX_CONNECTIONS})", True)):
+            elapsed, total, lag = asyncio.run(_scenario(target, path, args.requests, offload))
+            print(f'  {label:<24}{elapsed:>12.2f}{total / elapsed / 1e6:>10.1f}{lag * 1000:>24.1f}')
+        print()
+    finally:
+        target.delete_file(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--size", type=int, default=256 * 1024)
+    parser.add_argument("--configured", action="store_true", help="usa lo storage configurato invece di quello in memoria")
+    run(parser.parse_args())
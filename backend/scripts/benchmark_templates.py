@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark del rendering dei template: avvio a freddo, a freddo con cache del bytecode e a caldo
+Ogni prova a freddo usa un ambiente Jinja nuovo, come un processo appena avviato
+Uso: python scripts/benchmark_templates.py [--renders 200]
+"""
+import argparse
+import tempfile
+import time
+
+from jinja2 import FileSystemLoader
+
+from app.core.templates import TEMPLATE_DIR, InlinedEmailLoader, bytecode_cache, create_env
+
+# Contesto unico con tutte le variabili usate dai template (quelle mancanti restano vuote)
+SAMPLE_CONTEXT = {
+    "user_name": "Mario Rossi",
+    "role": "student",
+    "student_name": "Mario Rossi",
+    "tutor_name": "Anna Bianchi",
+    "parent_name": "Lucia Rossi",
+    "recipient_name": "Anna Bianchi",
+    "lesson_datetime": "02/03/2026 alle 15:00",
+    "room_url": "https://meet.jit.si/lesson-abc",
+    "hours_before": 24,
+    "amount": 35.0,
+    "currency": "EUR",
+    "report_url": "https://tutoring-platform.com/parent/reports/1",
+    "period": "Marzo 2026",
+    "items": [{"kind": "assignment_created", "assignment_title": f"Compito {i}", "due_date": "05/03/2026"} for i in range(5)],
+    "sections": {
+        "assignment_created": [{"assignment_title": f"Compito {i}", "tutor_name": "Anna", "due_date": "05/03/2026"} for i in range(5)],
+    },
+    "platform_url": "https://tutoring-platform.com",
+    "subject": "Matematica",
+    "notes_html": "<p>Parabole ed equazioni di secondo grado.</p>" * 20,
+    "overview": "<p>Buon mese.</p>",
+    "month": "03",
+    "year": "2026",
+}
+
+
+def _environments(cache_dir=None):
+    cache = bytecode_cache(cache_dir) if cache_dir else None
+    return {
+        "email": create_env(InlinedEmailLoader(), cache),
+        "document": create_env(FileSystemLoader(TEMPLATE_DIR), cache),
+    }
+
+
+def _templates():
+    envs = _environments()
+    names = [("email", name) for name in envs["email"].list_templates(extensions=["html"]) if name != "base.html"]
+    names += [
+        ("document", name) for name in envs["document"].list_templates(extensions=["html"])
+        if not name.startswith("email/")
+    ]
+    return names
+
+
+def _first_render(envs, kind: str, name: str) -> float:
+    started = time.perf_counter()
+    envs[kind].get_template(name).render(**SAMPLE_CONTEXT)
+    return time.perf_counter() - started
+
+
+def run(args) -> None:
+    templates = _templates()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # Popola la cache del bytecode come farebbe il primo processo avviato
+        populate = _environments(cache_dir)
+        for kind, name in templates:
+            populate[kind].get_template(name).render(**SAMPLE_CONTEXT)
+
+        print('\n' + '='*72)
+        print('🧩 BENCHMARK RENDERING TEMPLATE (ms per rendering)')
+        print('='*72)
+        print(f'  {"Template":<34}{"freddo":>10}{"bytecode":>12}{"caldo":>10}')
+
+        totals = [0.0, 0.0, 0.0]
+        for kind, name in templates:
+            cold = _first_render(_environments(), kind, name)
+            cached = _first_render(_environments(cache_dir), kind, name)
+
+            template = populate[kind].get_template(name)
+            started = time.perf_counter()
+            for _ in range(args.renders):
+                template.render(**SAMPLE_CONTEXT)
+            warm = (time.perf_counter() - started) / args.renders
+
+            for i, value in enumerate((cold, cached, warm)):
+                totals[i] += value
+            print(f'  {kind + "/" + name:<34}{cold * 1000:>10.2f}{cached * 1000:>12.2f}{warm * 1000:>10.3f}')
+
+        print(f'  {"Totale":<34}{totals[0] * 1000:>10.2f}{totals[1] * 1000:>12.2f}{totals[2] * 1000:>10.3f}')
+        print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--renders", type=int, default=200)
+    run(parser.parse_args())
@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""
+Script per ricostruire student_month_stats dallo storico (lezioni, feedback, voti)
+La migrazione c91f4e2b7a35 popola già la tabella: lo script serve a correggere una deriva
+Uso: python scripts/rebuild_student_month_stats.py
+"""
+from app.core.db import SessionLocal
+from app.services.student_stats import StudentMonthStatsService
+
+
+def rebuild():
+    db = SessionLocal()
+    try:
+        print('\n🔄 Ricostruzione aggregati mensili degli studenti...')
+        periods = StudentMonthStatsService(db).rebuild_all()
+        print(f'✅ {periods} mesi ricostruiti\n')
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    rebuild()
@@ -0,0 +1,112 @@
+import pytest
+from types import SimpleNamespace
+from fastapi import HTTPException
+from app.core.cache import ResultCache, LRUCache
+from app.routers import assignments as assignments_router
+from app.services import ai
+
+
+@pytest.fixture
+def draft_calls(monkeypatch):
+    calls = []
+
+    def fake_generate(topic, difficulty, subject, tutor_id=None, use_cache=True):
+        calls.append((topic, difficulty, subject))
+        return {"title": topic, "description": "d", "instructions": "i", "solutions": "s"}
+
+    monkeypatch.setattr(ai.settings, "OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(ai, "result_cache", ResultCache(redis_url=None))
+    monkeypatch.setattr(ai, "generate_assignment_with_openai", fake_generate)
+    return calls
+
+
+class TestAssignmentDraftCache:
+    def test_identical_requests_hit_cache(self, draft_calls):
+        """Test that identical drafts are generated once"""
+        first = ai.generate_assignment_draft("Equazioni", "medium", "Matematica")
+        second = ai.generate_assignment_draft("  equazioni ", "medium", "matematica")
+
+        assert first == second
+        assert len(draft_calls) == 1
+        assert ai.get_cached_assignment_draft("Equazioni", "medium", "Matematica") == first
+
+    def test_different_difficulty_is_a_new_draft(self, draft_calls):
+        """Test that the cache key covers every prompt input"""
+        ai.generate_assignment_draft("Equazioni", "easy", "Matematica")
+        ai.generate_assignment_draft("Equazioni", "hard", "Matematica")
+
+        assert len(draft_calls) == 2
+
+    def test_regenerate_bypasses_cache(self, draft_calls):
+        """Test that regenerate skips the cached draft"""
+        ai.generate_assignment_draft("Equazioni", "easy", "Matematica")
+        ai.generate_assignment_draft("Equazioni", "easy", "Matematica", regenerate=True)
+
+        assert len(draft_calls) == 2
+
+    def test_task_returns_draft_with_owner(self, draft_calls):
+        """Test the Celery task result shape used by the polling endpoint"""
+        result = ai.generate_assignment_draft_task(42, "Frazioni", "easy", "Matematica")
+
+        assert result["status"] == "success"
+        assert result["tutor_id"] == 42
+        assert result["draft"]["title"] == "Frazioni"
+
+    def test_job_status_is_private_to_its_tutor(self, draft_calls, monkeypatch):
+        """Test that polling another tutor's job is a 404 even while it is still pending"""
+        monkeypatch.setattr(ai.generate_assignment_draft_task, "apply_async", lambda *args, **kwargs: None)
+        monkeypatch.setattr(
+            assignments_router.celery_app, "AsyncResult", lambda job_id: SimpleNamespace(state="PENDING")
+        )
+        job_id = ai.start_assignment_draft_job(42, "Frazioni", "easy", "Matematica")
+
+        own = assignments_router.get_generate_assignment_job(job_id, current_user=SimpleNamespace(id=42))
+        assert own.status == "pending"
+        for user_id, polled in ((7, job_id), (42, "job-inesistente")):
+            with pytest.raises(HTTPException) as exc:
+                assignments_router.get_generate_assignment_job(polled, current_user=SimpleNamespace(id=user_id))
+            assert exc.value.status_code == 404
+
+
+def test_lru_cache_is_bounded():
+    """Test that the in-process fallback evicts the least recently used key"""
+    cache = LRUCache(max_items=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+
+
+def test_lru_cache_entries_expire():
+    """Test that the in-process fallback honours the TTL passed to set_json"""
+    cache = ResultCache(redis_url=None)
+    cache.set_json("scade", {"v": 1}, ttl_seconds=0)
+    cache.set_json("resta", {"v": 2}, ttl_seconds=60)
+
+    assert cache.get_json("scade") is None
+    assert cache.get_json("resta") == {"v": 2}
+
+
+def test_redis_connection_is_retried_after_backoff(monkeypatch):
+    """Test that an unreachable Redis at first use is retried later instead of disabling it for good"""
+    redis = pytest.importorskip("redis")
+    attempts = []
+
+    def fake_ping(self):
+        attempts.append(True)
+        if len(attempts) == 1:
+            raise redis.ConnectionError("Redis non ancora avviato")
+        return True
+
+    monkeypatch.setattr(redis.Redis, "ping", fake_ping)
+    cache = ResultCache(redis_url="redis://localhost:6379/0")
+
+    assert cache._get_redis() is None
+    assert cache._get_redis() is None and len(attempts) == 1  # entro il backoff non riprova
+
+    cache._redis_retry_at = 0.0  # backoff trascorso
+    assert cache._get_redis() is not None and len(attempts) == 2
@@ -0,0 +1,123 @@
+import asyncio
+from datetime import datetime, timedelta
+from celery.signals import task_postrun
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+import app.core.celery_app  # noqa: F401  (registra i segnali del worker)
+from app.core import usage
+from app.core.cache import ResultCache
+from app.core.llm import LLMClient
+from app.core.llm_providers import FakeProvider
+from app.core.usage import UsageRecorder
+from app.models.ai_usage import AIUsage
+from app.services.ai_usage import AIUsageService
+
+
+def _recorder(db_session, batch_size=100):
+    return UsageRecorder(
+        session_factory=lambda: Session(bind=db_session.connection()),
+        batch_size=batch_size,
+        flush_seconds=10 ** 6,
+    )
+
+
+def _row(**overrides):
+    row = dict(feature="lesson_notes", model="gpt-4o-mini", tutor_id=1, prompt_tokens=1000,
+               completion_tokens=500, latency_ms=800, cache_hit=False)
+    row.update(overrides)
+    return row
+
+
+class TestUsageRecorder:
+    def test_rows_are_written_in_batches(self, db_session):
+        """Test that rows are buffered and written with one INSERT per batch"""
+        recorder = _recorder(db_session, batch_size=3)
+        statements = []
+
+        def count_inserts(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith("INSERT INTO ai_usage"):
+                statements.append(statement)
+
+        engine = db_session.get_bind().engine
+        event.listen(engine, "before_cursor_execute", count_inserts)
+        try:
+            recorder.record(**_row())
+            recorder.record(**_row(feature="video_notes"))
+            assert recorder.pending == 2
+            assert db_session.query(AIUsage).count() == 0
+
+            recorder.record(**_row(cache_hit=True))
+        finally:
+            event.remove(engine, "before_cursor_execute", count_inserts)
+
+        assert recorder.pending == 0
+        assert db_session.query(AIUsage).count() == 3
+        assert len(statements) == 1
+
+    def test_celery_task_end_flushes_buffer(self, db_session, monkeypatch):
+        """Test that rows recorded inside a Celery task are written when the task finishes"""
+        recorder = _recorder(db_session)
+        monkeypatch.setattr(usage, "usage_recorder", recorder)
+        before = db_session.query(AIUsage).count()
+        recorder.record(**_row(feature="monthly_report"))
+
+        task_postrun.send(sender=None)
+
+        assert recorder.pending == 0
+        assert db_session.query(AIUsage).count() == before + 1
+
+
+class TestLLMClientInstrumentation:
+    def test_calls_and_cache_hits_are_recorded(self, db_session):
+        """Test that every completion records tokens, feature, tutor and cache hits"""
+        recorder = _recorder(db_session)
+        client = LLMClient(
+            provider=FakeProvider(latency=0, completion_tokens=10),
+            cache=ResultCache(redis_url=None),
+            recorder=recorder,
+        )
+        messages = [{"role": "user", "content": "lezione di matematica"}]
+
+        async def run():
+            await client.complete(messages, tutor_id=5, feature="lesson_notes")
+            await client.complete(messages, tutor_id=5, feature="lesson_notes")
+            async for _ in client.stream([{"role": "user", "content": "altra"}], feature="video_notes"):
+                pass
+
+        asyncio.run(run())
+        recorder.flush()
+
+        rows = db_session.query(AIUsage).order_by(AIUsage.id).all()
+        assert [(r.feature, r.cache_hit) for r in rows] == [
+            ("lesson_notes", False), ("lesson_notes", True), ("video_notes", False)
+        ]
+        assert rows[0].tutor_id == 5
+        assert rows[0].completion_tokens == 10
+        assert rows[0].prompt_tokens > 0
+        assert rows[1].completion_tokens == 0
+        assert rows[2].completion_tokens == 10
+
+
+class TestAIUsageRollup:
+    def test_rollup_by_day_and_feature(self, db_session):
+        """Test daily and per-feature totals with estimated cost"""
+        today = datetime.utcnow()
+        db_session.add_all([
+            AIUsage(created_at=today, **_row(prompt_tokens=1_000_000, completion_tokens=0)),
+            AIUsage(created_at=today, **_row(cache_hit=True, prompt_tokens=0, completion_tokens=0, latency_ms=0)),
+            AIUsage(created_at=today - timedelta(days=1), **_row(feature="video_notes", model="gpt-4o",
+                                                              prompt_tokens=0, completion_tokens=1_000_000)),
+            AIUsage(created_at=today - timedelta(days=40), **_row()),  # fuori finestra
+        ])
+        db_session.flush()
+
+        rollup = AIUsageService(db_session).rollup(days=7)
+
+        assert [item["feature"] for item in rollup["by_feature"]] == ["video_notes", "lesson_notes"]
+        video, notes = rollup["by_feature"]
+        assert video["estimated_cost_usd"] == 10.0
+        assert notes["calls"] == 2
+        assert notes["cache_hits"] == 1
+        assert notes["estimated_cost_usd"] == 0.15
+        assert notes["avg_latency_ms"] == 400
+        assert [item["calls"] for item in rollup["by_day"]] == [1, 2]
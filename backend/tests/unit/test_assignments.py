@@ -0,0 +1,174 @@
+import pytest
+import uuid
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from sqlalchemy import event
+from app.models.assignment import Assignment, AssignmentSubmission, AssignmentStatus
+from app.models.user import User, Role, StudentProfile, TutorProfile
+from app.schemas.assignment import AssignmentBulkCreate
+from app.services.assignments import AssignmentService
+from app.routers.assignments import (
+    get_student_assignments, get_tutor_assignments, get_assignment_submissions
+)
+
+
+def _make_user(db_session, role):
+    user = User(
+        email=f"{role.value}-{uuid.uuid4().hex[:8]}@test.com",
+        hashed_password="hashed_password",
+        role=role,
+        is_active=True
+    )
+    db_session.add(user)
+    db_session.flush()
+    profile_cls = TutorProfile if role == Role.tutor else StudentProfile
+    db_session.add(profile_cls(user_id=user.id, first_name="Nome", last_name=role.value))
+    db_session.flush()
+    return user
+
+
+def _make_assignments(db_session, tutor, students):
+    assignments = []
+    for student in students:
+        assignment = Assignment(
+            title="Esercizi",
+            description="Descrizione",
+            instructions="Istruzioni",
+            subject="Matematica",
+            due_date=datetime.utcnow() + timedelta(days=7),
+            is_published=True,
+            tutor_id=tutor.id,
+            student_id=student.id
+        )
+        db_session.add(assignment)
+        db_session.flush()
+        db_session.add(AssignmentSubmission(
+            assignment_id=assignment.id,
+            student_id=student.id,
+            content="Svolgimento",
+            status=AssignmentStatus.submitted,
+            submitted_at=datetime.utcnow()
+        ))
+        assignments.append(assignment)
+    db_session.flush()
+    db_session.expunge_all()
+    return assignments
+
+
+def _count_queries(db_session, fn):
+    statements = []
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db_session.get_bind().engine
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        result = fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    return result, len(statements)
+
+
+class TestAssignmentQueryCount:
+    @pytest.mark.parametrize("n_students", [1, 6])
+    def test_tutor_list_uses_constant_queries(self, db_session, n_students):
+        """Test that the tutor list does not issue queries per assignment"""
+        tutor = _make_user(db_session, Role.tutor)
+        students = [_make_user(db_session, Role.student) for _ in range(n_students)]
+        _make_assignments(db_session, tutor, students)
+        tutor = db_session.get(User, tutor.id)
+
+        result, queries = _count_queries(
+            db_session, lambda: get_tutor_assignments(current_user=tutor, db=db_session)
+        )
+
+        assert len(result) == n_students
+        assert all(r.has_submission and r.submission_status == AssignmentStatus.submitted for r in result)
+        assert {r.student_name for r in result} == {"Nome student"}
+        assert result[0].tutor_name == "Nome tutor"
+        # compiti + utenti/profili + consegne (+ lookup profilo del debug)
+        assert queries <= 4
+
+    def test_student_list_uses_constant_queries(self, db_session):
+        """Test that the student list cost does not grow with the assignments"""
+        student = _make_user(db_session, Role.student)
+        tutors = [_make_user(db_session, Role.tutor) for _ in range(5)]
+        for tutor in tutors:
+            _make_assignments(db_session, tutor, [db_session.get(User, student.id)])
+        student = db_session.get(User, student.id)
+
+        result, queries = _count_queries(
+            db_session,
+            lambda: get_student_assignments(include_completed=True, current_user=student, db=db_session)
+        )
+
+        assert len(result) == 5
+        assert all(r.has_submission for r in result)
+        assert queries <= 3
+
+    def test_submission_list_uses_constant_queries(self, db_session):
+        """Test that submissions are assembled with batched lookups"""
+        tutor = _make_user(db_session, Role.tutor)
+        student = _make_user(db_session, Role.student)
+        assignment = _make_assignments(db_session, tutor, [student])[0]
+        tutor = db_session.get(User, tutor.id)
+
+        result, queries = _count_queries(
+            db_session,
+            lambda: get_assignment_submissions(assignment.id, current_user=tutor, db=db_session)
+        )
+
+        assert len(result) == 1
+        assert result[0].assignment_title == "Esercizi"
+        assert result[0].student_name == "Nome student"
+        assert queries <= 4
+
+
+class TestBulkAssignmentCreation:
+    def _payload(self, student_ids):
+        return AssignmentBulkCreate(
+            title="Compito di classe",
+            description="Descrizione",
+            instructions="Istruzioni",
+            subject="Matematica",
+            due_date=datetime.utcnow() + timedelta(days=7),
+            student_ids=student_ids
+        )
+
+    def test_bulk_create_uses_single_insert(self, db_session):
+        """Test that a class-wide assignment is inserted in one statement"""
+        tutor = _make_user(db_session, Role.tutor)
+        students = [_make_user(db_session, Role.student) for _ in range(8)]
+        ids = [s.id for s in students]
+
+        result, statements = [], []
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        engine = db_session.get_bind().engine
+        event.listen(engine, "before_cursor_execute", capture)
+        try:
+            result = AssignmentService(db_session).create_assignments_bulk(
+                self._payload(ids + ids[:2]), tutor.id
+            )
+        finally:
+            event.remove(engine, "before_cursor_execute", capture)
+
+        assert sorted(a.student_id for a in result) == sorted(ids)
+        assert all(a.tutor_id == tutor.id and a.title == "Compito di classe" for a in result)
+        assert len([s for s in statements if s.startswith("INSERT")]) == 1
+        assert len(statements) <= 4
+
+    def test_bulk_create_rejects_unknown_students(self, db_session):
+        """Test that nothing is created when a student does not exist"""
+        tutor = _make_user(db_session, Role.tutor)
+        student = _make_user(db_session, Role.student)
+
+        with pytest.raises(HTTPException) as exc:
+            AssignmentService(db_session).create_assignments_bulk(
+                self._payload([student.id, 999999]), tutor.id
+            )
+
+        assert exc.value.status_code == 404
+        assert "999999" in exc.value.detail
+        assert db_session.query(Assignment).filter(Assignment.tutor_id == tutor.id).count() == 0
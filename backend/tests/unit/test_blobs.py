@@ -0,0 +1,168 @@
+import asyncio
+import hashlib
+import io
+import os
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from fastapi import HTTPException, UploadFile
+from starlette.datastructures import Headers
+from starlette.requests import Request
+from app.core import storage as storage_module
+from app.core.config import settings
+from app.core.storage import FileSystemStorage, InMemoryStorage, stream_upload
+from app.models.blob import Blob
+from app.models.file import File
+from app.models.user import User, Role
+from app.routers.files import upload_file
+from app.services.blobs import BlobService
+
+
+class _Source:
+    def __init__(self, content: bytes):
+        self._stream = io.BytesIO(content)
+
+    async def read(self, size: int = -1) -> bytes:
+        return self._stream.read(size)
+
+
+def _owner(db_session):
+    user = User(email=f"tutor-{uuid.uuid4().hex[:8]}@test.com", hashed_password="x", role=Role.tutor, is_active=True)
+    db_session.add(user)
+    db_session.flush()
+    return user
+
+
+def _upload(db_session, target, owner, content):
+    """Come la route di upload: streaming, blob, File; il duplicato viene eliminato"""
+    stored = asyncio.run(stream_upload(_Source(content), "scheda.pdf", "application/pdf", target=target))
+    blob = BlobService(db_session).attach(stored)
+    file_record = File(
+        owner_user_id=owner.id, original_filename="scheda.pdf", stored_path=blob.stored_path, blob_id=blob.id,
+        content_type="application/pdf", file_size=stored.size, checksum_sha256=stored.sha256
+    )
+    db_session.add(file_record)
+    db_session.flush()
+    if blob.stored_path != stored.path:
+        target.delete_file(stored.path)
+    return file_record
+
+
+def _upload_request(db_session, owner, content):
+    """Chiama la route di upload direttamente, senza autenticazione HTTP"""
+    request = Request({"type": "http", "method": "POST", "headers": []})
+    upload = UploadFile(io.BytesIO(content), filename="scheda.pdf", headers=Headers({"content-type": "application/pdf"}))
+    return asyncio.run(upload_file(request, upload, current_user=owner, db=db_session))
+
+
+class TestBlobDeduplication:
+    def test_same_content_is_stored_once(self, db_session, tmp_path):
+        """Test that uploading identical content twice keeps one object and one blob with two references"""
+        target = FileSystemStorage(base_path=str(tmp_path))
+        owner, content = _owner(db_session), os.urandom(4096)
+
+        first = _upload(db_session, target, owner, content)
+        second = _upload(db_session, target, owner, content)
+
+        assert first.blob_id == second.blob_id and first.stored_path == second.stored_path
+        assert db_session.get(Blob, first.blob_id).ref_count == 2
+        assert len(os.listdir(tmp_path)) == 1
+
+    def test_released_blob_is_collected_after_grace(self, db_session, tmp_path, monkeypatch):
+        """Test that the sweep removes a blob only once its last file is gone and the grace period has passed"""
+        monkeypatch.setattr(settings, "BLOB_GC_GRACE_SECONDS", 0)
+        target = FileSystemStorage(base_path=str(tmp_path))
+        owner, content = _owner(db_session), os.urandom(2048)
+        first = _upload(db_session, target, owner, content)
+        second = _upload(db_session, target, owner, content)
+        blob_id = first.blob_id
+
+        for file_record in (first, second):
+            BlobService(db_session).release(file_record)
+            db_session.delete(file_record)
+            db_session.flush()
+            if file_record is first:
+                BlobService(db_session).collect_garbage(target=target)
+                assert db_session.get(Blob, blob_id) is not None  # ancora usato da second
+
+        blob = db_session.get(Blob, blob_id)
+        assert blob.ref_count == 0 and blob.unreferenced_since is not None
+        blob.unreferenced_since = datetime.utcnow() - timedelta(seconds=1)
+
+        summary = BlobService(db_session).collect_garbage(target=target)
+
+        assert summary["removed"] >= 1
+        assert db_session.get(Blob, blob_id) is None
+        assert os.listdir(tmp_path) == []
+
+    def test_reupload_revives_unreferenced_blob(self, db_session, tmp_path):
+        """Test that uploading content awaiting collection reuses the blob instead of losing it"""
+        target = FileSystemStorage(base_path=str(tmp_path))
+        owner, content = _owner(db_session), os.urandom(1024)
+        first = _upload(db_session, target, owner, content)
+        BlobService(db_session).release(first)
+        db_session.delete(first)
+        db_session.flush()
+
+        again = _upload(db_session, target, owner, content)
+
+        blob = db_session.get(Blob, again.blob_id)
+        assert blob.ref_count == 1 and blob.unreferenced_since is None
+        BlobService(db_session).collect_garbage(target=target)
+        assert db_session.get(Blob, blob.id) is not None
+        assert len(os.listdir(tmp_path)) == 1
+
+    def test_migrated_duplicates_are_merged(self, db_session):
+        """Test that backfilling a checksum moves the files of a migrated copy onto the existing blob"""
+        owner, sha256 = _owner(db_session), hashlib.sha256(uuid.uuid4().bytes).hexdigest()
+        canonical = Blob(sha256=sha256, stored_path=f"uploads/{uuid.uuid4()}.pdf", size=10, ref_count=1)
+        legacy = Blob(sha256=None, stored_path=f"uploads/{uuid.uuid4()}.pdf", size=10, ref_count=2)
+        db_session.add_all([canonical, legacy])
+        db_session.flush()
+        files = [
+            File(owner_user_id=owner.id, original_filename="a.pdf", stored_path=legacy.stored_path,
+                 blob_id=legacy.id, content_type="application/pdf", file_size=10)
+            for _ in range(2)
+        ]
+        db_session.add_all(files)
+        db_session.flush()
+
+        kept = BlobService(db_session).assign_checksum(legacy, sha256)
+        db_session.flush()
+
+        assert kept is canonical and canonical.ref_count == 3
+        assert legacy.ref_count == 0 and legacy.unreferenced_since is not None
+        for file_record in files:
+            db_session.refresh(file_record)
+            assert file_record.blob_id == canonical.id and file_record.stored_path == canonical.stored_path
+            assert file_record.checksum_sha256 == sha256
+
+    def test_upload_response_does_not_reveal_deduplication(self, db_session, monkeypatch):
+        """Test that a repeated upload looks exactly like a new one to the client"""
+        target = InMemoryStorage()
+        monkeypatch.setattr(storage_module, "_storage", target)
+        content = os.urandom(512)
+
+        first = _upload_request(db_session, _owner(db_session), content)
+        second = _upload_request(db_session, _owner(db_session), content)
+
+        assert set(first) == set(second) and "deduplicated" not in second
+        assert len(target._objects) == 1
+
+    def test_failed_save_removes_streamed_object(self, db_session, monkeypatch):
+        """Test that the uploaded object is deleted when the File row cannot be committed"""
+        target = InMemoryStorage()
+        monkeypatch.setattr(storage_module, "_storage", target)
+
+        def failing_commit():
+            raise RuntimeError("database non disponibile")
+
+        rollbacks = []
+        owner = _owner(db_session)
+        monkeypatch.setattr(db_session, "commit", failing_commit)
+        monkeypatch.setattr(db_session, "rollback", lambda: rollbacks.append(True))  # la transazione è della fixture
+        with pytest.raises(HTTPException) as exc:
+            _upload_request(db_session, owner, os.urandom(512))
+
+        assert exc.value.status_code == 500 and rollbacks
+        assert target._objects == {}
@@ -0,0 +1,169 @@
+import io
+import time
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.core.downloads import (
+    PresignedURLCache, RangeNotSatisfiable, _read_chunks, download_response, parse_range, storage_response
+)
+from app.core.storage import FileSystemStorage
+
+CONTENT = bytes(range(256)) * 40  # 10240 byte
+
+
+class _RemoteLike(FileSystemStorage):
+    """Filesystem senza percorso locale: passa dal ramo in streaming come S3/MinIO"""
+
+    def local_path(self, file_path):
+        return None
+
+
+class _Presigning(FileSystemStorage):
+    """Filesystem che finge di prefirmare come S3/MinIO"""
+
+    supports_presigned_urls = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.signed = []
+
+    def get_presigned_url(self, file_path, expires_in=3600, filename=None, content_type=None):
+        self.signed.append((file_path, expires_in, filename, content_type))
+        return f"https://storage.example/{file_path}?sig={len(self.signed)}"
+
+
+@pytest.fixture(params=[FileSystemStorage, _RemoteLike], ids=["local", "streamed"])
+def download_client(request, tmp_path):
+    target = request.param(base_path=str(tmp_path))
+    path = target.upload_file(io.BytesIO(CONTENT), "report.pdf", "application/pdf")
+    app = FastAPI()
+
+    @app.get("/download")
+    async def download(http_request: Request):
+        return await storage_response(http_request, path, "application/pdf", "report.pdf", target=target)
+
+    return TestClient(app)
+
+
+class TestParseRange:
+    @pytest.mark.parametrize("header,expected", [
+        ("bytes=0-99", (0, 99)),
+        ("bytes=100-", (100, 999)),
+        ("bytes=-200", (800, 999)),
+        ("bytes=900-5000", (900, 999)),
+        ("bytes=0-1,5-9", None),  # più intervalli: file intero
+        ("items=0-1", None),
+        ("bytes=9-3", None),
+    ])
+    def test_single_ranges(self, header, expected):
+        """Test that single byte ranges are clamped and anything else is ignored"""
+        assert parse_range(header, 1000) == expected
+
+    def test_range_past_the_end_is_not_satisfiable(self):
+        """Test that a range starting at the file size cannot be served"""
+        with pytest.raises(RangeNotSatisfiable):
+            parse_range("bytes=1000-", 1000)
+
+
+class TestStorageResponse:
+    def test_full_download(self, download_client):
+        """Test that a plain GET returns the whole file and advertises range support"""
+        response = download_client.get("/download")
+
+        assert response.status_code == 200
+        assert response.content == CONTENT
+        assert response.headers["accept-ranges"] == "bytes"
+        assert response.headers["content-length"] == str(len(CONTENT))
+
+    def test_partial_download(self, download_client):
+        """Test that a Range request gets a 206 with only the requested bytes"""
+        response = download_client.get("/download", headers={"Range": "bytes=1000-1999"})
+
+        assert response.status_code == 206
+        assert response.content == CONTENT[1000:2000]
+        assert response.headers["content-range"] == f"bytes 1000-1999/{len(CONTENT)}"
+
+    def test_if_range_mismatch_returns_full_file(self, download_client):
+        """Test that a stale If-Range validator gets the whole current file"""
+        etag = download_client.get("/download").headers["etag"]
+
+        fresh = download_client.get("/download", headers={"Range": "bytes=0-9", "If-Range": etag})
+        stale = download_client.get("/download", headers={"Range": "bytes=0-9", "If-Range": '"altro"'})
+
+        assert fresh.status_code == 206 and fresh.content == CONTENT[:10]
+        assert stale.status_code == 200 and stale.content == CONTENT
+
+    def test_unsatisfiable_range(self, download_client):
+        """Test that a range starting past the end gets a 416 with the real size"""
+        response = download_client.get("/download", headers={"Range": "bytes=20000-"})
+
+        assert response.status_code == 416
+        assert response.headers["content-range"] == f"bytes */{len(CONTENT)}"
+
+    def test_body_is_read_in_chunks(self, monkeypatch):
+        """Test that the storage body is read in DOWNLOAD_CHUNK_SIZE pieces and closed"""
+        monkeypatch.setattr(settings, "DOWNLOAD_CHUNK_SIZE", 1024)
+        stream = io.BytesIO(CONTENT)
+
+        chunks = list(_read_chunks(stream, 4000))
+
+        assert [len(chunk) for chunk in chunks] == [1024, 1024, 1024, 928]
+        assert b"".join(chunks) == CONTENT[:4000]
+        assert stream.closed
+
+
+class TestPresignedRedirect:
+    @pytest.fixture
+    def redirect_setup(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "STORAGE_DOWNLOAD_MODE", "redirect")
+        monkeypatch.setattr("app.core.downloads.presigned_urls", PresignedURLCache())
+        target = _Presigning(base_path=str(tmp_path))
+        path = target.upload_file(io.BytesIO(CONTENT), "report.pdf", "application/pdf")
+        app = FastAPI()
+
+        @app.get("/download")
+        async def download(http_request: Request):
+            return await download_response(http_request, path, "application/pdf", "report.pdf", target=target)
+
+        return TestClient(app, follow_redirects=False), target, path
+
+    def test_redirect_reuses_presigned_url(self, redirect_setup):
+        """Test that redirect mode answers 302 and signs each object only once while the URL is fresh"""
+        client, target, path = redirect_setup
+
+        first = client.get("/download")
+        second = client.get("/download")
+
+        assert first.status_code == 302
+        assert first.headers["location"] == second.headers["location"] == f"https://storage.example/{path}?sig=1"
+        assert first.headers["cache-control"] == "private, no-store"
+        assert target.signed == [(path, settings.PRESIGNED_URL_EXPIRES_SECONDS, "report.pdf", "application/pdf")]
+
+    def test_url_is_renewed_before_expiry(self, redirect_setup, monkeypatch):
+        """Test that a cached URL inside the refresh margin is replaced by a new one"""
+        client, target, path = redirect_setup
+        client.get("/download")
+        later = settings.PRESIGNED_URL_EXPIRES_SECONDS - settings.PRESIGNED_URL_REFRESH_MARGIN_SECONDS + 1
+        now = time.time()
+        monkeypatch.setattr("app.core.downloads.time.time", lambda: now + later)
+
+        response = client.get("/download")
+
+        assert response.headers["location"].endswith("?sig=2")
+        assert len(target.signed) == 2
+
+    def test_storage_without_presigning_is_proxied(self, tmp_path, monkeypatch):
+        """Test that redirect mode falls back to streaming when the storage cannot presign"""
+        monkeypatch.setattr(settings, "STORAGE_DOWNLOAD_MODE", "redirect")
+        target = FileSystemStorage(base_path=str(tmp_path))
+        path = target.upload_file(io.BytesIO(CONTENT), "report.pdf", "application/pdf")
+        app = FastAPI()
+
+        @app.get("/download")
+        async def download(http_request: Request):
+            return await download_response(http_request, path, "application/pdf", "report.pdf", target=target)
+
+        response = TestClient(app, follow_redirects=False).get("/download")
+
+        assert response.status_code == 200 and response.content == CONTENT
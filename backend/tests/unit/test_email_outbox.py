@@ -0,0 +1,89 @@
+import smtplib
+from datetime import datetime, timedelta
+import pytest
+from app.core.emailer import EmailService, OutgoingEmail, SMTPConnectionPool
+from app.models.email_outbox import EmailOutbox, EmailOutboxStatus
+from app.services import email_outbox
+from app.services.email_outbox import EmailOutboxService, retry_delay
+
+
+class FakeSMTP:
+    def __init__(self, delivered):
+        self.delivered = delivered
+
+    def send_message(self, msg):
+        if msg["To"].startswith("rifiutato"):
+            raise smtplib.SMTPRecipientsRefused({msg["To"]: (550, b"No such user")})
+        self.delivered.append(msg["To"])
+
+    def noop(self):
+        return (250, b"OK")
+
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def delivered(monkeypatch):
+    """Email service del dispatcher collegato a un server SMTP finto"""
+    delivered = []
+    service = EmailService(pool=SMTPConnectionPool(size=1, factory=lambda: FakeSMTP(delivered)))
+    monkeypatch.setattr(email_outbox, "email_service", service)
+    return delivered
+
+
+def _email(to):
+    return OutgoingEmail(to, "Lezione confermata", "<p>Ciao</p>")
+
+
+class TestEmailOutbox:
+    def test_enqueue_belongs_to_caller_transaction(self, db_session):
+        """Test that queued emails disappear when the business change is rolled back"""
+        savepoint = db_session.begin_nested()
+        rows = EmailOutboxService(db_session).enqueue([_email("annullata@test.com")])
+        db_session.flush()
+        row_id = rows[0].id
+        savepoint.rollback()
+
+        assert db_session.get(EmailOutbox, row_id) is None
+
+    def test_dispatch_sends_due_emails(self, db_session, delivered):
+        """Test that due emails are sent and marked, while future ones wait"""
+        service = EmailOutboxService(db_session)
+        due = service.enqueue([_email("studente@test.com"), _email("tutor@test.com")])
+        later = service.enqueue([_email("domani@test.com")])[0]
+        later.next_attempt_at = datetime.utcnow() + timedelta(hours=1)
+        db_session.commit()
+
+        service.dispatch_pending()
+
+        assert {"studente@test.com", "tutor@test.com"} <= set(delivered)
+        assert "domani@test.com" not in delivered
+        assert all(row.status == EmailOutboxStatus.sent and row.attempts == 1 for row in due)
+        assert later.status == EmailOutboxStatus.pending
+
+    def test_failed_send_is_retried_with_backoff(self, db_session, delivered, monkeypatch):
+        """Test that failures are rescheduled and eventually given up"""
+        monkeypatch.setattr(email_outbox.settings, "EMAIL_OUTBOX_MAX_ATTEMPTS", 2)
+        service = EmailOutboxService(db_session)
+        row = service.enqueue([_email("rifiutato@test.com")])[0]
+        db_session.commit()
+
+        service.dispatch_pending()
+        assert row.status == EmailOutboxStatus.pending
+        assert row.attempts == 1
+        assert row.next_attempt_at > datetime.utcnow() + retry_delay(1) - timedelta(seconds=5)
+        assert "No such user" in row.last_error
+
+        row.next_attempt_at = datetime.utcnow()
+        db_session.commit()
+        service.dispatch_pending()
+        assert row.status == EmailOutboxStatus.failed
+        assert row.attempts == 2
+
+    def test_retry_delay_grows_and_is_capped(self, monkeypatch):
+        """Test the exponential backoff schedule"""
+        monkeypatch.setattr(email_outbox.settings, "EMAIL_OUTBOX_RETRY_BASE_SECONDS", 60)
+        monkeypatch.setattr(email_outbox.settings, "EMAIL_OUTBOX_RETRY_MAX_SECONDS", 600)
+
+        assert [retry_delay(n).total_seconds() for n in range(1, 6)] == [60, 120, 240, 480, 600]
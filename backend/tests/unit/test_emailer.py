@@ -0,0 +1,94 @@
+import smtplib
+from app.core.emailer import EmailService, OutgoingEmail, SMTPConnectionPool
+
+
+class FakeSMTP:
+    def __init__(self, log, fail_after=None, alive=True):
+        self.log = log
+        self.fail_after = fail_after
+        self.alive = alive
+        self.sent = []
+        self.closed = False
+
+    def send_message(self, msg):
+        if self.fail_after is not None and len(self.sent) >= self.fail_after:
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        if msg["To"] == "rifiutato@test.com":
+            raise smtplib.SMTPRecipientsRefused({msg["To"]: (550, b"No such user")})
+        self.sent.append(msg["To"])
+        self.log.append(msg["To"])
+
+    def noop(self):
+        if not self.alive:
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        return (250, b"OK")
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+def _emails(count):
+    return [OutgoingEmail(f"utente{i}@test.com", f"Oggetto {i}", "<p>Ciao</p>") for i in range(count)]
+
+
+class TestSMTPPool:
+    def test_send_many_uses_one_session(self):
+        """Test that a batch is sent over a single authenticated session"""
+        log, opened = [], []
+        pool = SMTPConnectionPool(size=2, factory=lambda: opened.append(FakeSMTP(log)) or opened[-1])
+        service = EmailService(pool=pool)
+
+        assert service.send_many(_emails(10)) == [True] * 10
+        assert service.send_many(_emails(5)) == [True] * 5
+        assert len(opened) == 1
+        assert len(log) == 15
+
+    def test_disconnect_mid_batch_reconnects(self):
+        """Test that a session dropped by the server is replaced and the message retried"""
+        log, opened = [], []
+
+        def factory():
+            opened.append(FakeSMTP(log, fail_after=3 if not opened else None))
+            return opened[-1]
+
+        service = EmailService(pool=SMTPConnectionPool(size=1, factory=factory))
+
+        assert service.send_many(_emails(6)) == [True] * 6
+        assert len(opened) == 2
+        assert opened[0].closed
+        assert log == [f"utente{i}@test.com" for i in range(6)]
+
+    def test_refused_recipient_does_not_stop_batch(self):
+        """Test that a refused recipient only fails its own message"""
+        log = []
+        service = EmailService(pool=SMTPConnectionPool(size=1, factory=lambda: FakeSMTP(log)))
+        emails = _emails(2) + [OutgoingEmail("rifiutato@test.com", "Oggetto", "<p>Ciao</p>")] + _emails(1)
+
+        assert service.send_many(emails) == [True, True, False, True]
+
+    def test_idle_dead_session_is_replaced(self, monkeypatch):
+        """Test that an idle session failing the NOOP health check is discarded"""
+        log, opened = [], []
+        pool = SMTPConnectionPool(size=1, factory=lambda: opened.append(FakeSMTP(log)) or opened[-1])
+        service = EmailService(pool=pool)
+        service.send_many(_emails(1))
+
+        opened[0].alive = False
+        clock = pool._idle[0][1]
+        monkeypatch.setattr("app.core.emailer.time.monotonic", lambda: clock + 30)
+
+        assert service.send_many(_emails(1)) == [True]
+        assert len(opened) == 2
+        assert opened[0].closed
+
+    def test_unreachable_server_reports_failure(self):
+        """Test that connection errors are reported as unsent messages"""
+        def factory():
+            raise ConnectionRefusedError("Connection refused")
+
+        service = EmailService(pool=SMTPConnectionPool(size=1, factory=factory))
+
+        assert service.send_many(_emails(2)) == [False, False]
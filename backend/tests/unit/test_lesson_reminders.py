@@ -0,0 +1,134 @@
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app.models.email_outbox import EmailOutbox
+from app.models.lesson import Lesson, LessonStatus
+from app.models.lesson_reminder import LessonReminder, LessonReminderStatus
+from app.models.user import User, Role
+from app.services.lesson_reminders import LessonReminderService
+from app.services.lessons import LessonService
+
+
+def _make_user(db_session, role):
+    user = User(
+        email=f"{role.value}-{uuid.uuid4().hex[:8]}@test.com",
+        hashed_password="hashed_password",
+        role=role,
+        is_active=True
+    )
+    db_session.add(user)
+    db_session.flush()
+    return user
+
+
+def _make_lesson(db_session, starts_in):
+    student, tutor = _make_user(db_session, Role.student), _make_user(db_session, Role.tutor)
+    start = datetime.utcnow() + starts_in
+    lesson = Lesson(
+        student_id=student.id, tutor_id=tutor.id, subject="Matematica",
+        start_at=start, end_at=start + timedelta(hours=1),
+        status=LessonStatus.confirmed, room_slug=f"lesson-{uuid.uuid4().hex[:12]}"
+    )
+    db_session.add(lesson)
+    db_session.flush()
+    return lesson
+
+
+def _reminders(db_session, lesson):
+    return {
+        reminder.hours_before: reminder
+        for reminder in db_session.query(LessonReminder).filter(LessonReminder.lesson_id == lesson.id)
+    }
+
+
+def _outbox_for(db_session, lesson):
+    return db_session.query(EmailOutbox).filter(
+        EmailOutbox.to_address.in_([lesson.student.email, lesson.tutor.email])
+    ).count()
+
+
+class TestLessonReminders:
+    def test_schedule_skips_offsets_already_past(self, db_session):
+        """Test that a last-minute booking only gets the reminders still ahead"""
+        soon, later = _make_lesson(db_session, timedelta(hours=3)), _make_lesson(db_session, timedelta(days=3))
+        service = LessonReminderService(db_session)
+
+        service.schedule(soon, [24, 1])
+        service.schedule(later, [24, 1])
+        db_session.flush()
+
+        assert set(_reminders(db_session, soon)) == {1}
+        assert set(_reminders(db_session, later)) == {24, 1}
+        assert _reminders(db_session, later)[24].due_at == later.start_at - timedelta(hours=24)
+
+    def test_due_reminder_is_sent_once(self, db_session):
+        """Test that the ledger prevents a second send of the same reminder"""
+        lesson = _make_lesson(db_session, timedelta(days=2))
+        service = LessonReminderService(db_session)
+        service.schedule(lesson, [24])
+        db_session.flush()
+        reminder = _reminders(db_session, lesson)[24]
+        # La lezione si avvicina: il promemoria a 24 ore è scaduto da un minuto
+        lesson.start_at = datetime.utcnow() + timedelta(hours=23, minutes=59)
+        reminder.due_at = lesson.start_at - timedelta(hours=24)
+        db_session.commit()
+
+        service.dispatch_due()
+        service.dispatch_due()
+        service.schedule(lesson, [24])  # conferma ripetuta (es. webhook ricevuto due volte)
+        db_session.commit()
+        service.dispatch_due()
+
+        assert reminder.status == LessonReminderStatus.sent
+        assert _outbox_for(db_session, lesson) == 2  # studente e tutor, una volta sola
+
+    def test_reschedule_rearms_sent_reminder(self, db_session):
+        """Test that moving a lesson schedules its reminders again"""
+        lesson = _make_lesson(db_session, timedelta(days=2))
+        service = LessonReminderService(db_session)
+        reminder = service.schedule(lesson, [24])[0]
+        reminder.status = LessonReminderStatus.sent
+        db_session.flush()
+
+        lesson.start_at += timedelta(days=3)
+        service.schedule(lesson, [24])
+
+        assert reminder.status == LessonReminderStatus.scheduled
+        assert reminder.due_at == lesson.start_at - timedelta(hours=24)
+
+    def test_cancellation_revokes_reminders(self, db_session):
+        """Test that cancelling a lesson revokes its pending reminders"""
+        lesson = _make_lesson(db_session, timedelta(days=2))
+        LessonReminderService(db_session).schedule(lesson, [24, 1])
+        db_session.commit()
+
+        LessonService(db_session).cancel_lesson(lesson.id, lesson.student_id)
+
+        statuses = {reminder.status for reminder in _reminders(db_session, lesson).values()}
+        assert statuses == {LessonReminderStatus.cancelled}
+
+    def test_run_cost_does_not_depend_on_upcoming_lessons(self, db_session):
+        """Test that a run only reads due reminders, with a fixed number of queries"""
+        service = LessonReminderService(db_session)
+        for _ in range(5):
+            service.schedule(_make_lesson(db_session, timedelta(days=5)), [24])
+        due = [_make_lesson(db_session, timedelta(days=2)) for _ in range(3)]
+        for lesson in due:
+            service.schedule(lesson, [24])[0].due_at = datetime.utcnow() - timedelta(minutes=1)
+        db_session.commit()
+        statements = []
+
+        def track(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT"):
+                statements.append(statement)
+
+        engine = db_session.get_bind().engine
+        event.listen(engine, "before_cursor_execute", track)
+        try:
+            summary = service.dispatch_due()
+        finally:
+            event.remove(engine, "before_cursor_execute", track)
+
+        assert summary["queued"] >= 3
+        assert all(_reminders(db_session, lesson)[24].status == LessonReminderStatus.sent for lesson in due)
+        assert len(statements) <= 8  # promemoria, lezioni, utenti e profili: uno per relazione
@@ -0,0 +1,128 @@
+import asyncio
+import pytest
+import uuid
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from sqlalchemy import event, inspect
+from app.models.lesson import Lesson, LessonStatus
+from app.models.user import User, Role
+from app.routers.lessons import update_lesson
+from app.schemas.lesson import LessonUpdate
+from app.services.lessons import LessonService
+
+
+def _make_user(db_session, role):
+    user = User(
+        email=f"{role.value}-{uuid.uuid4().hex[:8]}@test.com",
+        hashed_password="hashed_password",
+        role=role,
+        is_active=True
+    )
+    db_session.add(user)
+    db_session.flush()
+    return user
+
+
+class TestLessonNotesDeferred:
+    def test_student_lessons_do_not_load_note_bodies(self, db_session):
+        """Test that lesson lists select only a preview of the notes"""
+        student = _make_user(db_session, Role.student)
+        tutor = _make_user(db_session, Role.tutor)
+        lesson = Lesson(
+            student_id=student.id,
+            tutor_id=tutor.id,
+            subject="Matematica",
+            start_at=datetime.utcnow() - timedelta(days=1),
+            end_at=datetime.utcnow() - timedelta(days=1) + timedelta(hours=1),
+            status=LessonStatus.completed,
+            notes_text="# Appunti\n" + "x" * 5000,
+            tutor_notes="Note private del tutor",
+            objectives="Ripasso algebra"
+        )
+        db_session.add(lesson)
+        db_session.flush()
+        db_session.expunge_all()
+
+        statements = []
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        engine = db_session.get_bind().engine
+        event.listen(engine, "before_cursor_execute", capture)
+        try:
+            result = LessonService(db_session).get_student_lessons(student.id)
+        finally:
+            event.remove(engine, "before_cursor_execute", capture)
+
+        assert result["total"] == 1
+        loaded = result["lessons"][0]
+        assert loaded.has_notes is True
+        assert loaded.notes_preview.startswith("# Appunti")
+        assert len(loaded.notes_preview) == 200
+
+        unloaded = inspect(loaded).unloaded
+        assert {"notes_text", "tutor_notes", "objectives"} <= unloaded
+
+        lesson_selects = [s for s in statements if "FROM lessons" in s]
+        assert lesson_selects
+        for statement in lesson_selects:
+            assert "AS lessons_notes_text" not in statement
+            assert "AS lessons_tutor_notes" not in statement
+            assert "AS lessons_objectives" not in statement
+
+    def test_lesson_detail_loads_note_bodies(self, db_session):
+        """Test that the detail query undefers the notes group"""
+        student = _make_user(db_session, Role.student)
+        tutor = _make_user(db_session, Role.tutor)
+        lesson = Lesson(
+            student_id=student.id,
+            tutor_id=tutor.id,
+            subject="Fisica",
+            start_at=datetime.utcnow() + timedelta(days=1),
+            end_at=datetime.utcnow() + timedelta(days=1, hours=1),
+            status=LessonStatus.confirmed,
+            notes_text="Appunti completi",
+            objectives="Cinematica"
+        )
+        db_session.add(lesson)
+        db_session.flush()
+        db_session.expunge_all()
+
+        loaded = LessonService(db_session).get_lesson(lesson.id, student.id)
+
+        unloaded = inspect(loaded).unloaded
+        assert "notes_text" not in unloaded
+        assert "objectives" not in unloaded
+        assert loaded.notes_text == "Appunti completi"
+
+
+class TestUpdateLesson:
+    def test_tutor_updates_lesson_details(self, db_session):
+        """Test that the tutor can update a lesson through the route"""
+        student = _make_user(db_session, Role.student)
+        tutor = _make_user(db_session, Role.tutor)
+        lesson = Lesson(
+            student_id=student.id,
+            tutor_id=tutor.id,
+            subject="Chimica",
+            start_at=datetime.utcnow() + timedelta(days=1),
+            end_at=datetime.utcnow() + timedelta(days=1, hours=1),
+            status=LessonStatus.confirmed
+        )
+        db_session.add(lesson)
+        db_session.flush()
+
+        updated = asyncio.run(update_lesson(
+            lesson.id, LessonUpdate(objectives="Legami covalenti"), current_user=tutor, db=db_session
+        ))
+
+        assert updated.objectives == "Legami covalenti"
+
+    def test_missing_lesson_returns_404(self, db_session):
+        """Test that updating an unknown or foreign lesson returns 404"""
+        tutor = _make_user(db_session, Role.tutor)
+
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(update_lesson(999999, LessonUpdate(subject="Storia"), current_user=tutor, db=db_session))
+
+        assert exc.value.status_code == 404
@@ -0,0 +1,258 @@
+import asyncio
+import gc
+import json
+import httpx
+import openai
+import pytest
+from app.core import llm
+from app.core.cache import ResultCache
+from app.core.llm import LLMClient
+from app.core.llm_providers import FakeProvider, build_provider
+from app.core.usage import UsageRecorder
+
+
+def _completion(text):
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4o-mini",
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": text},
+            "finish_reason": "stop"
+        }],
+        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+    }
+
+
+def _recorder():
+    # Buffer locale mai scritto su DB
+    return UsageRecorder(batch_size=10 ** 6, flush_seconds=10 ** 6)
+
+
+def _client(transport):
+    return LLMClient(transport=transport, cache=ResultCache(redis_url=None), recorder=_recorder())
+
+
+@pytest.fixture(autouse=True)
+def llm_settings(monkeypatch):
+    monkeypatch.setattr(llm.settings, "OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(llm.settings, "LLM_MAX_RETRIES", 2)
+    monkeypatch.setattr(llm.settings, "LLM_MAX_CONCURRENCY_PER_TUTOR", 2)
+    monkeypatch.setattr(llm, "backoff_delay", lambda attempt: 0)
+
+
+class TestLLMClient:
+    def test_retries_transient_errors(self):
+        """Test that 5xx responses are retried before succeeding"""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) < 3:
+                return httpx.Response(503, json={"error": {"message": "overloaded"}})
+            return httpx.Response(200, json=_completion("  appunti  "))
+
+        client = _client(httpx.MockTransport(handler))
+        text = asyncio.run(client.complete([{"role": "user", "content": "ciao"}]))
+
+        assert text == "appunti"
+        assert len(calls) == 3
+
+    def test_gives_up_after_max_retries(self):
+        """Test that persistent failures are raised to the caller"""
+        client = _client(httpx.MockTransport(
+            lambda request: httpx.Response(500, json={"error": {"message": "boom"}})
+        ))
+
+        with pytest.raises(openai.InternalServerError):
+            asyncio.run(client.complete([{"role": "user", "content": "ciao"}]))
+
+    def test_per_tutor_concurrency_limit(self):
+        """Test that one tutor cannot exceed its share of concurrent calls"""
+        in_flight, peak = 0, 0
+
+        async def handler(request):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return httpx.Response(200, json=_completion("ok"))
+
+        client = _client(httpx.MockTransport(handler))
+
+        async def run():
+            await asyncio.gather(*[
+                client.complete([{"role": "user", "content": str(i)}], tutor_id=7)
+                for i in range(6)
+            ])
+
+        asyncio.run(run())
+        assert peak == 2
+
+    def test_idle_tutor_semaphores_are_released(self):
+        """Test that per-tutor semaphores do not accumulate once their calls are done"""
+        client = LLMClient(provider=FakeProvider(latency=0), cache=ResultCache(redis_url=None), recorder=_recorder())
+
+        async def run():
+            await asyncio.gather(*[
+                client.complete([{"role": "user", "content": str(i)}], tutor_id=i, cache=False)
+                for i in range(50)
+            ])
+            gc.collect()
+            return len(client._state().tutor_limits)
+
+        assert asyncio.run(run()) == 0
+
+    def test_sync_bridge_reuses_background_loop(self):
+        """Test that sync callers share one loop and client"""
+        client = _client(httpx.MockTransport(
+            lambda request: httpx.Response(200, json=_completion("ok"))
+        ))
+
+        assert client.complete_sync([{"role": "user", "content": "a"}]) == "ok"
+        assert client.complete_sync([{"role": "user", "content": "b"}]) == "ok"
+        assert len(client._states) == 1
+
+    def test_stream_yields_deltas(self):
+        """Test that streamed chunks are relayed as text deltas"""
+        def chunk(text):
+            payload = {
+                "id": "chatcmpl-test", "object": "chat.completion.chunk", "created": 0,
+                "model": "gpt-4o-mini",
+                "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}]
+            }
+            return f"data: {json.dumps(payload)}\n\n"
+
+        body = chunk("Ciao") + chunk(" mondo") + "data: [DONE]\n\n"
+        client = _client(httpx.MockTransport(
+            lambda request: httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+        ))
+
+        async def collect():
+            return [d async for d in client.stream([{"role": "user", "content": "ciao"}], tutor_id=1)]
+
+        assert asyncio.run(collect()) == ["Ciao", " mondo"]
+
+
+class TestLLMCache:
+    def test_identical_prompts_are_served_from_cache(self):
+        """Test that a repeated prompt does not reach the API"""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(200, json=_completion("appunti"))
+
+        client = _client(httpx.MockTransport(handler))
+        messages = [{"role": "system", "content": "tutor"}, {"role": "user", "content": "lezione"}]
+
+        assert client.complete_sync(messages, temperature=0.3) == "appunti"
+        assert client.complete_sync(messages, temperature=0.3) == "appunti"
+        assert len(calls) == 1
+
+        # temperatura diversa -> chiave diversa
+        client.complete_sync(messages, temperature=0.7)
+        assert len(calls) == 2
+
+        stats = client.cache_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 2
+        assert stats["hit_ratio"] == round(1 / 3, 4)
+
+    def test_bypass_refreshes_entry(self):
+        """Test that cache=False calls the API and updates the entry"""
+        answers = iter(["prima", "seconda"])
+        client = _client(httpx.MockTransport(
+            lambda request: httpx.Response(200, json=_completion(next(answers)))
+        ))
+        messages = [{"role": "user", "content": "rigenera"}]
+
+        assert client.complete_sync(messages) == "prima"
+        assert client.complete_sync(messages, cache=False) == "seconda"
+        assert client.complete_sync(messages) == "seconda"
+        assert client.cache_stats()["bypassed"] == 1
+
+    def test_stream_result_is_cached(self):
+        """Test that a completed stream populates the cache"""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            payload = {
+                "id": "chatcmpl-test", "object": "chat.completion.chunk", "created": 0,
+                "model": "gpt-4o-mini",
+                "choices": [{"index": 0, "delta": {"content": "tutto"}, "finish_reason": None}]
+            }
+            body = f"data: {json.dumps(payload)}\n\ndata: [DONE]\n\n"
+            return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+        client = _client(httpx.MockTransport(handler))
+        messages = [{"role": "user", "content": "stream"}]
+
+        async def collect():
+            return [d async for d in client.stream(messages)]
+
+        assert asyncio.run(collect()) == ["tutto"]
+        assert asyncio.run(collect()) == ["tutto"]
+        assert len(calls) == 1
+
+
+class TestFakeProvider:
+    def _fake_client(self, **kwargs):
+        return LLMClient(provider=FakeProvider(**kwargs), cache=ResultCache(redis_url=None), recorder=_recorder())
+
+    def test_deterministic_text_and_token_count(self):
+        """Test that the fake returns the same text for the same prompt"""
+        client = self._fake_client(latency=0, completion_tokens=20)
+        messages = [{"role": "user", "content": "lezione"}]
+
+        first = client.complete_sync(messages, cache=False)
+        second = client.complete_sync(messages, cache=False)
+        other = client.complete_sync([{"role": "user", "content": "altra"}], cache=False)
+
+        assert first == second
+        assert first != other
+        assert len(first.split()) == 20
+        # max_tokens limita la lunghezza
+        assert len(client.complete_sync(messages, max_tokens=5, cache=False).split()) == 5
+
+    def test_latency_is_simulated_concurrently(self):
+        """Test that fake calls wait the configured latency without blocking each other"""
+        client = self._fake_client(latency=0.05, completion_tokens=5)
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            await asyncio.gather(*[
+                client.complete([{"role": "user", "content": str(i)}]) for i in range(8)
+            ])
+            return loop.time() - started
+
+        elapsed = asyncio.run(run())
+        assert 0.05 <= elapsed < 0.4
+
+    def test_stream_matches_complete(self):
+        """Test that streamed tokens join into the non-streamed text"""
+        client = self._fake_client(latency=0, completion_tokens=12)
+        messages = [{"role": "user", "content": "stream"}]
+
+        async def collect():
+            return [d async for d in client.stream(messages, cache=False)]
+
+        deltas = asyncio.run(collect())
+        assert len(deltas) == 12
+        assert "".join(deltas) == client.complete_sync(messages, cache=False)
+
+    def test_provider_selected_from_settings(self, monkeypatch):
+        """Test that LLM_PROVIDER picks the implementation"""
+        monkeypatch.setattr(llm.settings, "LLM_PROVIDER", "fake")
+        assert LLMClient(cache=ResultCache(redis_url=None), recorder=_recorder()).provider.name == "fake"
+
+        monkeypatch.setattr(llm.settings, "OPENAI_API_KEY", None)
+        assert build_provider("fake").is_enabled
+        assert not build_provider("openai").is_enabled
+        with pytest.raises(ValueError):
+            build_provider("nessuno")
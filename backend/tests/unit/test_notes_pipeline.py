@@ -0,0 +1,127 @@
+import asyncio
+import re
+from app.services.notes_pipeline import (
+    NotesProgress, TranscriptNotesPipeline, count_tokens, split_by_tokens
+)
+
+
+class FakeModel:
+    """Modello deterministico: riassume ogni parte con le sue prime parole"""
+
+    def __init__(self, latency=0.001):
+        self.latency = latency
+        self.calls = []
+        self.in_flight = 0
+        self.peak = 0
+
+    async def complete(self, messages):
+        self.calls.append(messages)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(self.latency)
+        self.in_flight -= 1
+
+        prompt = messages[-1]["content"]
+        part = re.search(r"parte (\d+)/(\d+)\):\n(.*)", prompt, re.S)
+        if part:
+            return f"riassunto {part.group(1)}: " + " ".join(part.group(3).split()[:3])
+        return "APPUNTI FINALI"
+
+
+def _transcript(sentences):
+    return " ".join(f"Frase numero {i} sulla derivata di x^{i}." for i in range(sentences))
+
+
+class TestSplitByTokens:
+    def test_chunks_respect_budget_and_overlap(self):
+        """Test that chunks fit the token budget and overlap at the boundaries"""
+        text = _transcript(200)
+        chunks = split_by_tokens(text, max_tokens=120, overlap_tokens=20)
+
+        assert len(chunks) > 1
+        assert all(count_tokens(chunk) <= 120 for chunk in chunks)
+        for previous, current in zip(chunks, chunks[1:]):
+            # la prima frase di ogni parte ripete la coda della precedente
+            first_sentence = current.split(". ")[0]
+            assert first_sentence in previous
+            assert previous.split(". ")[-1] in current
+
+    def test_short_text_is_one_chunk(self):
+        assert split_by_tokens("Una frase. Due frasi.", max_tokens=100) == ["Una frase. Due frasi."]
+
+
+class TestTranscriptNotesPipeline:
+    def test_short_transcript_uses_single_call(self):
+        """Test that short transcripts keep the one-shot prompt"""
+        model = FakeModel()
+        pipeline = TranscriptNotesPipeline(model.complete, chunk_tokens=1000, overlap_tokens=50, concurrency=2)
+
+        notes = asyncio.run(pipeline.generate("Matematica", _transcript(5)))
+
+        assert notes == "APPUNTI FINALI"
+        assert len(model.calls) == 1
+        assert "Trascrizione della lezione:" in model.calls[0][-1]["content"]
+
+    def test_long_transcript_is_mapped_then_reduced(self):
+        """Test map-reduce ordering, bounded parallelism and progress"""
+        model = FakeModel()
+        pipeline = TranscriptNotesPipeline(model.complete, chunk_tokens=150, overlap_tokens=20, concurrency=3)
+        progress = []
+
+        notes = asyncio.run(pipeline.generate("Matematica", _transcript(120), on_progress=progress.append))
+
+        map_calls = model.calls[:-1]
+        reduce_prompt = model.calls[-1][-1]["content"]
+        assert notes == "APPUNTI FINALI"
+        assert len(map_calls) > 3
+        assert model.peak <= 3
+        # i riassunti arrivano al reduce nell'ordine delle parti
+        positions = [reduce_prompt.index(f"### Parte {i + 1}\nriassunto {i + 1}:") for i in range(len(map_calls))]
+        assert positions == sorted(positions)
+        # il reduce mantiene le regole LaTeX
+        assert "SINTASSI LATEX (OBBLIGATORIA)" in reduce_prompt
+        assert progress[-1] == NotesProgress("reduce", 1, 1)
+        assert [p.done for p in progress if p.stage == "map"] == list(range(1, len(map_calls) + 1))
+
+    def test_stream_emits_progress_then_tokens(self):
+        """Test that the streaming variant interleaves progress and tokens"""
+        model = FakeModel()
+        pipeline = TranscriptNotesPipeline(model.complete, chunk_tokens=150, overlap_tokens=20, concurrency=2)
+
+        async def fake_stream(messages):
+            for token in ["APPUNTI", " ", "FINALI"]:
+                yield token
+
+        async def collect():
+            return [item async for item in pipeline.stream("Fisica", _transcript(80), fake_stream)]
+
+        items = asyncio.run(collect())
+        progress = [item for item in items if isinstance(item, NotesProgress)]
+        tokens = [item for item in items if isinstance(item, str)]
+
+        assert progress and progress[-1].stage == "reduce"
+        assert tokens == ["APPUNTI", " ", "FINALI"]
+        assert items.index(tokens[0]) > items.index(progress[-1])
+
+    def test_closing_stream_closes_upstream(self):
+        """Test that closing the pipeline stream after the first token closes the reduce stream at once"""
+        pipeline = TranscriptNotesPipeline(FakeModel().complete, chunk_tokens=1000, overlap_tokens=50, concurrency=2)
+        closed = []
+
+        async def fake_stream(messages):
+            try:
+                for token in ["APPUNTI", " ", "FINALI"]:
+                    yield token
+            finally:
+                closed.append(True)
+
+        async def first_token_then_close():
+            chunks = pipeline.stream("Fisica", _transcript(5), fake_stream)
+            first = await chunks.__anext__()
+            await chunks.aclose()
+            return first, list(closed)  # stato subito dopo aclose, prima della chiusura del loop
+
+        first, closed_after_aclose = asyncio.run(first_token_then_close())
+
+        assert first == "APPUNTI"
+        assert closed_after_aclose == [True]
@@ -0,0 +1,107 @@
+import uuid
+from datetime import datetime, timedelta
+from app.models.email_outbox import EmailOutbox
+from app.models.notification import NotificationPreference, PendingNotification
+from app.models.user import User, Role
+from app.services.notification_digest import Notification, NotificationDigestService
+
+
+def _make_user(db_session, role):
+    user = User(
+        email=f"{role.value}-{uuid.uuid4().hex[:8]}@test.com",
+        hashed_password="hashed_password",
+        role=role,
+        is_active=True
+    )
+    db_session.add(user)
+    db_session.flush()
+    return user
+
+
+def _assignment(user, title="Equazioni"):
+    return Notification(user, "assignment_created", {
+        "student_name": "Mario", "tutor_name": "Anna", "assignment_title": title, "due_date": "01/03/2026 alle 18:00",
+    })
+
+
+def _reminder(user):
+    return Notification(user, "lesson_reminder", {
+        "student_name": "Mario", "tutor_name": "Anna", "lesson_datetime": "02/03/2026 alle 15:00",
+        "room_url": None, "hours_before": 1,
+    })
+
+
+def _outbox(db_session, user):
+    return db_session.query(EmailOutbox).filter(EmailOutbox.to_address == user.email).all()
+
+
+def _pending(db_session, user):
+    return db_session.query(PendingNotification).filter(PendingNotification.user_id == user.id).all()
+
+
+class TestNotificationDigest:
+    def test_route_defers_by_role_and_keeps_urgent_kinds_immediate(self, db_session):
+        """Test that tutors are digested by default while reminders always go out immediately"""
+        tutor, student = _make_user(db_session, Role.tutor), _make_user(db_session, Role.student)
+
+        summary = NotificationDigestService(db_session).route(
+            [_assignment(tutor), _reminder(tutor), _assignment(student)]
+        )
+        db_session.flush()
+
+        assert summary == {"queued": 2, "deferred": 1}
+        assert [row.kind for row in _pending(db_session, tutor)] == ["assignment_created"]
+        assert len(_outbox(db_session, tutor)) == 1
+        assert len(_outbox(db_session, student)) == 1
+
+    def test_user_preference_overrides_role_default(self, db_session):
+        """Test that an explicit preference wins over the role default"""
+        tutor, student = _make_user(db_session, Role.tutor), _make_user(db_session, Role.student)
+        db_session.add_all([
+            NotificationPreference(user_id=tutor.id, digest_enabled=False),
+            NotificationPreference(user_id=student.id, digest_enabled=True, digest_window_minutes=15),
+        ])
+        db_session.flush()
+
+        service = NotificationDigestService(db_session)
+        assert service.digest_windows([tutor, student]) == {tutor.id: None, student.id: 15}
+
+        service.route([_assignment(tutor), _assignment(student)])
+        db_session.flush()
+
+        assert len(_outbox(db_session, tutor)) == 1 and not _pending(db_session, tutor)
+        assert len(_pending(db_session, student)) == 1
+
+    def test_due_window_is_coalesced_into_one_email(self, db_session):
+        """Test that a recipient's pending notifications become a single rendered digest"""
+        tutor, other = _make_user(db_session, Role.tutor), _make_user(db_session, Role.tutor)
+        service = NotificationDigestService(db_session)
+        service.route([_assignment(tutor, "Equazioni"), _assignment(tutor, "Parabole"), _assignment(other)])
+        db_session.flush()
+        for row in _pending(db_session, tutor):
+            row.deliver_after = datetime.utcnow() - timedelta(minutes=1)
+        db_session.commit()
+
+        summary = service.flush_due()
+
+        emails = _outbox(db_session, tutor)
+        assert summary["recipients"] >= 1
+        assert len(emails) == 1
+        assert emails[0].subject == "Riepilogo notifiche - 2 aggiornamenti"
+        assert "Equazioni" in emails[0].html_content and "Parabole" in emails[0].html_content
+        assert not _pending(db_session, tutor)
+        assert len(_pending(db_session, other)) == 1  # finestra non ancora scaduta
+
+    def test_single_pending_notification_keeps_its_own_email(self, db_session):
+        """Test that a window with one notification sends the regular email instead of a digest"""
+        tutor = _make_user(db_session, Role.tutor)
+        service = NotificationDigestService(db_session)
+        service.route([_assignment(tutor, "Frazioni")])
+        db_session.flush()
+        _pending(db_session, tutor)[0].deliver_after = datetime.utcnow() - timedelta(minutes=1)
+        db_session.commit()
+
+        service.flush_due()
+
+        emails = _outbox(db_session, tutor)
+        assert [email.subject for email in emails] == ["Nuovo compito assegnato - Frazioni"]
@@ -0,0 +1,60 @@
+import pickle
+from datetime import date, datetime
+from types import SimpleNamespace
+import pytest
+from app.services import pdf
+from app.core.templates import render_document
+from app.services.pdf import PDFRenderer, PDFRenderingError, monthly_report_context
+
+
+def _report(**overrides):
+    values = dict(
+        period_start=date(2026, 3, 1),
+        lessons_count=2,
+        text="Buon mese.\n\nCostante <b>impegno</b>.",
+        key_achievements='["Equazioni", "Metodo di studio"]',
+        areas_for_improvement=None,
+        recommendations="Più esercizi",
+    )
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def _lessons():
+    return [
+        SimpleNamespace(start_at=datetime(2026, 3, 2, 15), subject="Matematica", tutor_notes="Parabole"),
+        SimpleNamespace(start_at=datetime(2026, 3, 9, 15), subject="Fisica", tutor_notes=None),
+    ]
+
+
+class TestPDFTemplates:
+    def test_monthly_report_context_is_plain_data(self):
+        """Test that the context can be sent to the rendering processes"""
+        context = monthly_report_context(_report(), _lessons(), "Mario Rossi")
+
+        assert pickle.loads(pickle.dumps(context)) == context
+        assert context["month"] == "03" and context["year"] == "2026"
+        assert context["subjects_count"] == 2
+        assert "<li>Equazioni</li>" in context["strengths"]
+        assert context["overview"] == "<p>Buon mese.</p><p>Costante &lt;b&gt;impegno&lt;/b&gt;.</p>"
+
+    def test_monthly_report_template_renders(self):
+        """Test that the report template receives every variable it uses"""
+        html = render_document("monthly_report.html", monthly_report_context(_report(), _lessons(), "<Mario>"))
+
+        assert "&lt;Mario&gt;" in html
+        assert "Parabole" in html
+        assert "<style>" not in html  # lo stile arriva dal CSS analizzato una volta per processo
+
+    def test_missing_weasyprint_raises_rendering_error(self, monkeypatch):
+        """Test that a missing WeasyPrint is reported instead of returning HTML as PDF"""
+        monkeypatch.setattr(pdf, "_weasyprint", None)
+        monkeypatch.setattr(pdf, "_weasyprint_error", None)
+
+        def broken():
+            raise OSError("cannot load library 'pango-1.0-0'")
+
+        monkeypatch.setattr(pdf, "_load_weasyprint", broken)
+
+        with pytest.raises(PDFRenderingError, match="pango"):
+            PDFRenderer(workers=0).render_lesson_notes({"subject": "Matematica", "notes_html": ""})
@@ -0,0 +1,195 @@
+import uuid
+from datetime import date, datetime, timedelta
+import pytest
+from sqlalchemy.exc import IntegrityError
+from app.models.report import Report, ReportStatus
+from app.models.user import User, Role, StudentProfile
+from app.services import reports
+from app.services.reports import ReportService, _period, generate_monthly_reports_task
+
+
+def _make_student(db_session):
+    user = User(
+        email=f"student-{uuid.uuid4().hex[:8]}@test.com",
+        hashed_password="hashed_password",
+        role=Role.student,
+        is_active=True
+    )
+    db_session.add(user)
+    db_session.flush()
+    db_session.add(StudentProfile(user_id=user.id, first_name="Nome", last_name="Studente"))
+    db_session.flush()
+    return user
+
+
+def _make_report(db_session, student, year, month, status):
+    period_start, period_end = _period(year, month)
+    db_session.add(Report(student_id=student.id, period_start=period_start, period_end=period_end,
+                          title="Report", status=status))
+    db_session.flush()
+
+
+class TestMonthlyReportFanOut:
+    def test_period_handles_short_months(self):
+        """Test that the period ends on the real last day of the month"""
+        assert _period(2026, 2)[1].day == 28
+        assert _period(2028, 2)[1].day == 29
+        assert _period(2026, 4)[1].day == 30
+        assert _period(2026, 4) == (date(2026, 4, 1), date(2026, 4, 30))
+
+    def test_first_of_january_reports_previous_december(self, monkeypatch):
+        """Test that the run on 1 January dispatches December of the previous year"""
+        class NewYear(date):
+            @classmethod
+            def today(cls):
+                return cls(2027, 1, 1)
+
+        dispatched = []
+        monkeypatch.setattr(reports, "date", NewYear)
+        monkeypatch.setattr(
+            ReportService, "dispatch_monthly_reports",
+            lambda self, year, month: dispatched.append((year, month)) or {"students": 0, "chunks": 0}
+        )
+
+        result = generate_monthly_reports_task()
+
+        assert dispatched == [(2026, 12)]
+        assert result["status"] == "dispatched" and (result["year"], result["month"]) == (2026, 12)
+
+    def test_pending_skips_published_reports(self, db_session):
+        """Test that a resumed run skips students whose report is already published"""
+        done, failed, todo = (_make_student(db_session) for _ in range(3))
+        _make_report(db_session, done, 2026, 4, ReportStatus.published)
+        _make_report(db_session, failed, 2026, 4, ReportStatus.failed)
+
+        pending = ReportService(db_session).pending_student_ids(2026, 4)
+
+        assert done.id not in pending
+        assert failed.id in pending
+        assert todo.id in pending
+
+    def test_chunk_regenerates_failed_reports_in_place(self, db_session):
+        """Test that a failed report is retried on the same row"""
+        ok, retried = _make_student(db_session), _make_student(db_session)
+        _make_report(db_session, retried, 2026, 4, ReportStatus.failed)
+
+        result = ReportService(db_session).generate_reports_for([ok.id, retried.id], 2026, 4)
+
+        assert result == {"published": 2, "failed": []}
+        statuses = dict(db_session.query(Report.student_id, Report.status).filter(
+            Report.student_id.in_([ok.id, retried.id])
+        ).all())
+        assert statuses == {ok.id: ReportStatus.published, retried.id: ReportStatus.published}
+        assert db_session.query(Report).filter(Report.student_id == retried.id).count() == 1
+
+    def test_chunk_isolates_failures(self, db_session, monkeypatch):
+        """Test that one failing student does not stop the rest of the chunk"""
+        broken_id, ok_id = _make_student(db_session).id, _make_student(db_session).id
+        original = ReportService.generate_monthly_report
+
+        def generate(self, student_id, month, year):
+            if student_id == broken_id:
+                raise RuntimeError("OpenAI down")
+            return original(self, student_id, month, year)
+
+        monkeypatch.setattr(ReportService, "generate_monthly_report", generate)
+        result = ReportService(db_session).generate_reports_for([broken_id, ok_id], 2026, 4)
+
+        assert result == {"published": 1, "failed": [broken_id]}
+
+    def test_dispatch_builds_chunked_chord(self, db_session, monkeypatch):
+        """Test that pending students are fanned out in chunks with a summary callback"""
+        for _ in range(5):
+            _make_student(db_session)
+        dispatched = {}
+
+        def fake_chord(header):
+            dispatched["header"] = list(header)
+            return lambda body: dispatched.setdefault("body", body)
+
+        monkeypatch.setattr(reports, "chord", fake_chord)
+        monkeypatch.setattr(reports.settings, "REPORTS_CHUNK_SIZE", 2)
+        service = ReportService(db_session)
+        pending = service.pending_student_ids(2026, 5)
+
+        run = service.dispatch_monthly_reports(2026, 5)
+
+        chunks = [signature.args[0] for signature in dispatched["header"]]
+        assert [student_id for chunk in chunks for student_id in chunk] == pending
+        assert all(len(chunk) <= 2 for chunk in chunks)
+        assert dispatched["body"].task == "app.services.reports.summarize_monthly_reports"
+        assert run["chunks"] == len(chunks)
+        assert service.monthly_progress(2026, 5)["run"]["status"] == "running"
+
+    def test_progress_counts_reports_by_status(self, db_session):
+        """Test that progress is derived from the reports of the period"""
+        students = [_make_student(db_session) for _ in range(3)]
+        _make_report(db_session, students[0], 2026, 6, ReportStatus.published)
+        _make_report(db_session, students[1], 2026, 6, ReportStatus.failed)
+
+        progress = ReportService(db_session).monthly_progress(2026, 6)
+
+        assert progress["published"] == 1
+        assert progress["failed"] == 1
+        assert progress["pending"] == progress["total_students"] - 2
+        assert progress["run"] is None
+
+    def test_run_summary_is_visible_from_another_session(self, db_session, monkeypatch):
+        """Test that the run state written by the worker is read back from the database by the API"""
+        _make_student(db_session)
+        monkeypatch.setattr(reports, "chord", lambda header: (list(header), lambda body: None)[1])
+        ReportService(db_session).dispatch_monthly_reports(2026, 8)
+
+        ReportService(db_session).complete_monthly_run(2026, 8, [{"published": 1, "failed": [99]}])
+        db_session.expire_all()
+        run = ReportService(db_session).monthly_progress(2026, 8)["run"]
+
+        assert run["status"] == "completed" and "finished_at" in run
+        assert run["published"] == 1 and run["failed_student_ids"] == [99]
+
+
+class TestReportClaim:
+    def test_claim_creates_row_once(self, db_session):
+        """Test that only the first claim for a student and month wins"""
+        student = _make_student(db_session)
+        service = ReportService(db_session)
+
+        report, claimed = service._claim_report(student.id, 2026, 7)
+        again, claimed_again = service._claim_report(student.id, 2026, 7)
+
+        assert claimed and not claimed_again
+        assert again.id == report.id
+        assert report.status == ReportStatus.generating
+        assert db_session.query(Report).filter(Report.student_id == student.id).count() == 1
+
+    def test_claim_resumes_failed_and_stale_reports(self, db_session):
+        """Test that failed or abandoned reports can be claimed again"""
+        failed, stale = _make_student(db_session), _make_student(db_session)
+        _make_report(db_session, failed, 2026, 8, ReportStatus.failed)
+        _make_report(db_session, stale, 2026, 8, ReportStatus.generating)
+        db_session.query(Report).filter(Report.student_id == stale.id).update(
+            {"updated_at": datetime.utcnow() - timedelta(hours=2)}
+        )
+        service = ReportService(db_session)
+
+        assert service._claim_report(failed.id, 2026, 8)[1]
+        assert service._claim_report(stale.id, 2026, 8)[1]
+
+    def test_published_report_is_returned_without_regenerating(self, db_session):
+        """Test that a published report is never claimed again"""
+        student = _make_student(db_session)
+        _make_report(db_session, student, 2026, 9, ReportStatus.published)
+
+        report = ReportService(db_session).generate_monthly_report(student.id, 9, 2026)
+
+        assert report.status == ReportStatus.published
+        assert report.text is None
+
+    def test_unique_period_per_student(self, db_session):
+        """Test that the database rejects a second report for the same period"""
+        student = _make_student(db_session)
+        _make_report(db_session, student, 2026, 10, ReportStatus.failed)
+
+        with pytest.raises(IntegrityError):
+            with db_session.begin_nested():
+                _make_report(db_session, student, 2026, 10, ReportStatus.draft)
@@ -0,0 +1,103 @@
+import pytest
+import uuid
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from app.models.assignment import Assignment
+from app.models.lesson import Lesson, LessonStatus
+from app.models.user import User, Role
+from app.services.search import SENTINEL_START, SENTINEL_STOP, SearchService, snippet_html, tokenize
+
+
+def _make_user(db_session, role):
+    user = User(
+        email=f"{role.value}-{uuid.uuid4().hex[:8]}@test.com",
+        hashed_password="hashed_password",
+        role=role,
+        is_active=True
+    )
+    db_session.add(user)
+    db_session.flush()
+    return user
+
+
+def _make_lesson(db_session, student, tutor, subject, notes):
+    lesson = Lesson(
+        student_id=student.id,
+        tutor_id=tutor.id,
+        subject=subject,
+        start_at=datetime.utcnow() - timedelta(days=1),
+        end_at=datetime.utcnow() - timedelta(days=1) + timedelta(hours=1),
+        status=LessonStatus.completed,
+        notes_text=notes
+    )
+    db_session.add(lesson)
+    db_session.flush()
+    return lesson
+
+
+class TestSearch:
+    def test_tokenize_folds_accents_and_stopwords(self):
+        """Test that tokens are normalized for the fallback index"""
+        assert tokenize("Le Equazioni di secondo grado") == tokenize("equazione secondo gradò")
+
+    def test_search_ranks_and_highlights(self, db_session):
+        """Test that matches are ranked and highlighted"""
+        student = _make_user(db_session, Role.student)
+        tutor = _make_user(db_session, Role.tutor)
+        strong = _make_lesson(db_session, student, tutor, "Matematica",
+                              "Equazioni di secondo grado: il discriminante delle equazioni")
+        weak = _make_lesson(db_session, student, tutor, "Fisica",
+                            "Moto rettilineo uniforme, cenni alle equazioni orarie e ai grafici")
+        _make_lesson(db_session, student, tutor, "Storia", "Rivoluzione francese")
+        assignment = Assignment(
+            title="Esercizi sulle equazioni",
+            description="Risolvi le equazioni proposte",
+            instructions="Mostra tutti i passaggi",
+            subject="Matematica",
+            due_date=datetime.utcnow() + timedelta(days=7),
+            tutor_id=tutor.id,
+            student_id=student.id
+        )
+        db_session.add(assignment)
+        db_session.flush()
+
+        hits = SearchService(db_session).search(student, "equazione")
+
+        kinds = {(hit.kind, hit.id) for hit in hits}
+        assert kinds == {("lesson", strong.id), ("lesson", weak.id), ("assignment", assignment.id)}
+        lesson_ids = [hit.id for hit in hits if hit.kind == "lesson"]
+        assert lesson_ids == [strong.id, weak.id]
+        assert all("<mark>" in hit.snippet for hit in hits)
+
+    def test_search_is_scoped_to_user(self, db_session):
+        """Test that users only see their own lessons"""
+        student = _make_user(db_session, Role.student)
+        other = _make_user(db_session, Role.student)
+        tutor = _make_user(db_session, Role.tutor)
+        _make_lesson(db_session, other, tutor, "Chimica", "Legami covalenti e ionici")
+
+        service = SearchService(db_session)
+        assert service.search(student, "covalenti") == []
+        assert len(service.search(tutor, "covalenti")) == 1
+
+        parent = _make_user(db_session, Role.parent)
+        with pytest.raises(HTTPException) as exc:
+            service.search(parent, "covalenti")
+        assert exc.value.status_code == 403
+
+    def test_snippets_escape_document_text(self, db_session):
+        """Test that note text is HTML-escaped and only the highlight markers are tags"""
+        student = _make_user(db_session, Role.student)
+        tutor = _make_user(db_session, Role.tutor)
+        _make_lesson(db_session, student, tutor, "Fisica", 'Attrito <img src=x onerror="alert(1)"> e attrito viscoso')
+
+        hit = SearchService(db_session).search(student, "attrito")[0]
+
+        assert "<img" not in hit.snippet and "&lt;img" in hit.snippet
+        assert "<mark>Attrito</mark>" in hit.snippet
+
+    def test_headline_markers_are_applied_after_escaping(self):
+        """Test that ts_headline output is escaped before the sentinels become <mark>"""
+        headline = f"{SENTINEL_START}moto{SENTINEL_STOP} <script>x</script>"
+
+        assert snippet_html(headline) == "<mark>moto</mark> &lt;script&gt;x&lt;/script&gt;"
@@ -0,0 +1,186 @@
+import asyncio
+import hashlib
+import io
+import os
+import queue
+import threading
+import time
+import boto3
+import pytest
+from botocore.stub import ANY, Stubber
+from minio import Minio
+from app.core import storage as storage_module
+from app.core.config import settings
+from app.core.storage import (
+    FileSystemStorage, InMemoryStorage, MinIOStorage, S3MultipartUploadWriter, S3Storage, UploadTooLarge,
+    _QueueReader, get_storage, run_storage, storage, stream_upload
+)
+
+
+class _Source:
+    """Sorgente asincrona come UploadFile; registra la dimensione massima richiesta"""
+
+    def __init__(self, content: bytes):
+        self._stream = io.BytesIO(content)
+        self.largest_read = 0
+
+    async def read(self, size: int = -1) -> bytes:
+        self.largest_read = max(self.largest_read, size)
+        return self._stream.read(size)
+
+
+def _s3_writer(part_size):
+    client = boto3.client("s3", region_name="us-east-1", aws_access_key_id="x", aws_secret_access_key="x")
+    return S3MultipartUploadWriter(client, "uploads/test.pdf", "application/pdf", part_size=part_size), Stubber(client)
+
+
+class TestStreamingUpload:
+    def test_upload_is_copied_in_chunks_with_checksum(self, tmp_path, monkeypatch):
+        """Test that the upload is written chunk by chunk with size and SHA-256 computed on the fly"""
+        monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 1024)
+        content = os.urandom(10 * 1024 + 7)
+        source = _Source(content)
+        target = FileSystemStorage(base_path=str(tmp_path))
+
+        stored = asyncio.run(stream_upload(source, "scheda.pdf", "application/pdf", max_bytes=1 << 20, target=target))
+
+        assert stored.size == len(content)
+        assert stored.sha256 == hashlib.sha256(content).hexdigest()
+        assert stored.path.startswith("uploads/") and stored.path.endswith(".pdf")
+        assert (tmp_path / stored.path.replace("uploads/", "")).read_bytes() == content
+        assert source.largest_read == 1024
+
+    def test_oversized_upload_is_aborted(self, tmp_path, monkeypatch):
+        """Test that crossing the limit stops the copy and removes the partial object"""
+        monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 1024)
+        target = FileSystemStorage(base_path=str(tmp_path))
+
+        with pytest.raises(UploadTooLarge):
+            asyncio.run(stream_upload(_Source(b"x" * 5000), "grande.pdf", "application/pdf", max_bytes=4096, target=target))
+
+        assert os.listdir(tmp_path) == []
+
+    def test_small_s3_upload_uses_single_put(self):
+        """Test that a file smaller than one part skips the multipart protocol"""
+        writer, stubber = _s3_writer(part_size=16)
+        stubber.add_response("put_object", {}, {
+            "Bucket": settings.S3_BUCKET, "Key": "uploads/test.pdf", "Body": b"piccolo", "ContentType": "application/pdf"
+        })
+
+        with stubber:
+            writer.write(b"piccolo")
+            assert writer.commit() == "uploads/test.pdf"
+        stubber.assert_no_pending_responses()
+
+    def test_large_s3_upload_sends_parts_as_they_fill(self):
+        """Test that parts are sent as soon as the buffer reaches the part size"""
+        writer, stubber = _s3_writer(part_size=4)
+        stubber.add_response("create_multipart_upload", {"UploadId": "u1"}, {
+            "Bucket": settings.S3_BUCKET, "Key": "uploads/test.pdf", "ContentType": "application/pdf"
+        })
+        for number, body in ((1, b"abcd"), (2, b"efghi"), (3, b"j")):
+            stubber.add_response("upload_part", {"ETag": f"e{number}"}, {
+                "Bucket": settings.S3_BUCKET, "Key": "uploads/test.pdf", "UploadId": "u1",
+                "PartNumber": number, "Body": body
+            })
+        stubber.add_response("complete_multipart_upload", {}, {
+            "Bucket": settings.S3_BUCKET, "Key": "uploads/test.pdf", "UploadId": "u1", "MultipartUpload": ANY
+        })
+
+        with stubber:
+            for chunk in (b"ab", b"cd", b"efg", b"hi", b"j"):
+                writer.write(chunk)
+                assert len(writer._buffer) < 4  # mai più di una parte in memoria
+            writer.commit()
+        stubber.assert_no_pending_responses()
+        assert [part["PartNumber"] for part in writer._parts] == [1, 2, 3]
+
+    def test_aborted_s3_upload_releases_parts(self):
+        """Test that aborting a started multipart upload tells S3 to drop the parts"""
+        writer, stubber = _s3_writer(part_size=2)
+        stubber.add_response("create_multipart_upload", {"UploadId": "u2"}, None)
+        stubber.add_response("upload_part", {"ETag": "e1"}, None)
+        stubber.add_response("abort_multipart_upload", {}, {
+            "Bucket": settings.S3_BUCKET, "Key": "uploads/test.pdf", "UploadId": "u2"
+        })
+
+        with stubber:
+            writer.write(b"ab")
+            writer.abort()
+        stubber.assert_no_pending_responses()
+
+    def test_queue_reader_serves_requested_sizes(self):
+        """Test that the MinIO stream adapter regroups queued chunks into the sizes put_object asks for"""
+        chunks = queue.Queue()
+        for item in (b"abc", b"defg", b"h", None):
+            chunks.put(item)
+        reader = _QueueReader(chunks)
+
+        assert [reader.read(3), reader.read(3), reader.read(3), reader.read(3)] == [b"abc", b"def", b"gh", b""]
+
+
+class TestStorageBackends:
+    def test_in_memory_round_trip(self):
+        """Test that the in-memory backend supports chunked uploads, stat and ranges"""
+        target = InMemoryStorage()
+        content = os.urandom(5000)
+
+        stored = asyncio.run(stream_upload(_Source(content), "scheda.pdf", "application/pdf", target=target))
+
+        assert target.stat(stored.path).size == len(content)
+        assert target.download_range(stored.path, 100, 199).read() == content[100:200]
+        assert target.download_stream(stored.path).read() == content
+        assert target.delete_file(stored.path)
+        with pytest.raises(FileNotFoundError):
+            target.stat(stored.path)
+
+    def test_shared_storage_is_created_on_first_use(self, monkeypatch):
+        """Test that the module-level storage builds the backend lazily, once"""
+        monkeypatch.setattr(storage_module, "_storage", None)
+        monkeypatch.setattr(settings, "STORAGE_BACKEND", "memory")
+
+        assert storage_module._storage is None
+        path = storage.upload_file(io.BytesIO(b"ciao"), "a.txt", "text/plain")
+
+        assert isinstance(get_storage(), InMemoryStorage) and get_storage() is get_storage()
+        assert get_storage().download_stream(path).read() == b"ciao"
+
+    def test_minio_checks_bucket_only_when_asked(self, monkeypatch):
+        """Test that creating the MinIO backend makes no network call and only prepare creates the bucket"""
+        calls = []
+        monkeypatch.setattr(settings, "S3_ENDPOINT_URL", "http://localhost:9000")
+        monkeypatch.setattr(Minio, "bucket_exists", lambda self, bucket: calls.append(bucket) or False)
+        monkeypatch.setattr(Minio, "make_bucket", lambda self, bucket: calls.append(f"make:{bucket}"))
+
+        target = MinIOStorage()
+        assert calls == []
+
+        with pytest.raises(Exception, match="does not exist"):
+            target.check_ready()
+        assert calls == [settings.S3_BUCKET]
+
+        target.prepare()
+        assert calls == [settings.S3_BUCKET, settings.S3_BUCKET, f"make:{settings.S3_BUCKET}"]
+
+    def test_s3_client_pool_matches_concurrency(self):
+        """Test that the boto3 client pool is sized for the storage threads"""
+        assert S3Storage().client.meta.config.max_pool_connections == settings.STORAGE_MAX_CONNECTIONS
+
+    def test_run_storage_bounds_concurrency(self, monkeypatch):
+        """Test that no more than STORAGE_MAX_CONNECTIONS storage calls run at once"""
+        monkeypatch.setattr(settings, "STORAGE_MAX_CONNECTIONS", 2)
+        active, peak, lock = [0], [0], threading.Lock()
+
+        def call():
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+
+        async def main():
+            await asyncio.gather(*(run_storage(call) for _ in range(6)))
+
+        asyncio.run(main())
+        assert peak[0] == 2
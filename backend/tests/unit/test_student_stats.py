@@ -0,0 +1,140 @@
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app.models.assignment import Assignment, AssignmentSubmission, AssignmentStatus
+from app.models.feedback import Feedback
+from app.models.lesson import Lesson, LessonStatus
+from app.models.user import User, Role, StudentProfile, ParentProfile
+from app.schemas.assignment import AssignmentGrading
+from app.services.assignments import AssignmentService
+from app.services.lessons import LessonService
+from app.services.reports import ReportService
+from app.services.student_stats import StudentMonthStatsService
+
+
+def _make_user(db_session, role):
+    user = User(
+        email=f"{role.value}-{uuid.uuid4().hex[:8]}@test.com",
+        hashed_password="hashed_password",
+        role=role,
+        is_active=True
+    )
+    db_session.add(user)
+    db_session.flush()
+    return user
+
+
+def _make_lesson(db_session, student, tutor, start, subject="Matematica", minutes=60):
+    lesson = Lesson(
+        student_id=student.id,
+        tutor_id=tutor.id,
+        subject=subject,
+        start_at=start,
+        end_at=start + timedelta(minutes=minutes),
+        status=LessonStatus.confirmed
+    )
+    db_session.add(lesson)
+    db_session.flush()
+    return lesson
+
+
+def _make_submission(db_session, student, tutor):
+    assignment = Assignment(
+        title="Esercizi", description="Descrizione", instructions="Istruzioni",
+        subject="Matematica", due_date=datetime.utcnow() + timedelta(days=7),
+        is_published=True, tutor_id=tutor.id, student_id=student.id
+    )
+    db_session.add(assignment)
+    db_session.flush()
+    submission = AssignmentSubmission(
+        assignment_id=assignment.id, student_id=student.id, content="Svolgimento",
+        status=AssignmentStatus.submitted, submitted_at=datetime.utcnow()
+    )
+    db_session.add(submission)
+    db_session.flush()
+    return submission
+
+
+class TestStudentMonthStats:
+    def test_lesson_completion_updates_month_row(self, db_session):
+        """Test that completing lessons increments the student's month row"""
+        student, tutor = _make_user(db_session, Role.student), _make_user(db_session, Role.tutor)
+        march = datetime(2026, 3, 10, 15)
+        lessons = [
+            _make_lesson(db_session, student, tutor, march),
+            _make_lesson(db_session, student, tutor, march + timedelta(days=2), minutes=90),
+            _make_lesson(db_session, student, tutor, march + timedelta(days=3), subject="Fisica", minutes=45),
+        ]
+
+        service = LessonService(db_session)
+        for lesson in lessons:
+            service.complete_lesson(lesson.id, tutor.id, "Note")
+
+        stats = StudentMonthStatsService(db_session).get(student.id, 2026, 3)
+        assert stats.lessons_completed == 3
+        assert stats.minutes == 195
+        assert stats.subject_counts == {"Fisica": 1, "Matematica": 2}
+
+    def test_grading_and_regrading(self, db_session):
+        """Test that a regrade replaces the previous grade instead of adding one"""
+        student, tutor = _make_user(db_session, Role.student), _make_user(db_session, Role.tutor)
+        first, second = _make_submission(db_session, student, tutor), _make_submission(db_session, student, tutor)
+        service = AssignmentService(db_session)
+
+        service.grade_submission(first.id, AssignmentGrading(grade=60, feedback="Rivedi"), tutor.id)
+        service.grade_submission(second.id, AssignmentGrading(grade=80, feedback="Bene"), tutor.id)
+        service.grade_submission(first.id, AssignmentGrading(grade=70, feedback="Meglio"), tutor.id)
+
+        now = datetime.utcnow()
+        stats = StudentMonthStatsService(db_session).get(student.id, now.year, now.month)
+        assert stats.assignments_graded == 2
+        assert stats.grade_sum == 150
+        assert stats.average_grade == 75.0
+
+    def test_rebuild_matches_incremental_updates(self, db_session):
+        """Test that rebuilding from history yields the incrementally maintained row"""
+        student, tutor = _make_user(db_session, Role.student), _make_user(db_session, Role.tutor)
+        parent_user = _make_user(db_session, Role.parent)
+        parent = ParentProfile(user_id=parent_user.id, first_name="Genitore", last_name="Test")
+        db_session.add(parent)
+        db_session.flush()
+
+        service = StudentMonthStatsService(db_session)
+        april = datetime(2026, 4, 30, 18)  # ultimo giorno del mese, sera
+        for offset, rating in ((0, 5), (-1, 3)):
+            lesson = _make_lesson(db_session, student, tutor, april + timedelta(days=offset))
+            lesson.status = LessonStatus.completed
+            service.lesson_completed(lesson)
+            db_session.add(Feedback(parent_id=parent.id, tutor_id=tutor.id, lesson_id=lesson.id, rating=rating))
+        db_session.flush()
+
+        incremental = {
+            column: getattr(service.get(student.id, 2026, 4), column)
+            for column in ("lessons_completed", "minutes", "subjects")
+        }
+        service.rebuild(student.id, 2026, 4)
+        rebuilt = service.get(student.id, 2026, 4)
+
+        assert {column: getattr(rebuilt, column) for column in incremental} == incremental
+        assert (rebuilt.rating_sum, rebuilt.rating_count) == (8, 2)
+        assert rebuilt.average_rating == 4.0
+
+    def test_report_reads_stats_row_instead_of_lessons(self, db_session):
+        """Test that a month without lessons never scans the lessons table"""
+        student = _make_user(db_session, Role.student)
+        db_session.add(StudentProfile(user_id=student.id, first_name="Nome", last_name="Studente"))
+        db_session.flush()
+        statements = []
+
+        def track(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        engine = db_session.get_bind().engine
+        event.listen(engine, "before_cursor_execute", track)
+        try:
+            report = ReportService(db_session).generate_monthly_report(student.id, 5, 2026)
+        finally:
+            event.remove(engine, "before_cursor_execute", track)
+
+        assert report.lessons_count == 0
+        assert not any("FROM lessons" in statement for statement in statements)
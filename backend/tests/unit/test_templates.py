@@ -0,0 +1,57 @@
+import os
+import pytest
+from app.core.emailer import email_service
+from app.core.templates import (
+    InlinedEmailLoader, bytecode_cache, create_env, document_env, email_env, inline_styles, render_email
+)
+
+
+class TestTemplates:
+    def test_email_layout_styles_are_inlined(self):
+        """Test that base.html rules reach the elements as style attributes"""
+        html = render_email("lesson_confirmed.html", {"student_name": "<Mario>", "room_url": None})
+
+        assert '<div class="highlight" style="background-color: #f0f9ff;' in html
+        assert "<body style=\"font-family: 'Segoe UI'" in html
+        assert "&lt;Mario&gt;" in html  # autoescape attivo anche per le email
+        assert "<style>" in html  # :hover e affini restano nel blocco di stile
+
+    def test_existing_inline_style_wins(self):
+        """Test that a style already written in the template is kept after the layout rules"""
+        rules = {".info-box": "padding: 15px", "ul": "margin: 0"}
+
+        html = inline_styles('<ul class="info-box" style="padding: 0;"><li>x</li></ul>', rules)
+
+        assert html == '<ul class="info-box" style="margin: 0; padding: 15px; padding: 0"><li>x</li></ul>'
+
+    def test_templates_are_compiled_once(self):
+        """Test that the process-wide environments cache compiled templates"""
+        assert email_env() is email_env() and document_env() is document_env()
+        assert document_env().get_template("lesson_notes.html") is document_env().get_template("lesson_notes.html")
+
+    def test_new_process_loads_bytecode_instead_of_compiling(self, tmp_path, monkeypatch):
+        """Test that a fresh environment reuses the bytecode written by another one"""
+        cache_dir = str(tmp_path)
+        warm = create_env(InlinedEmailLoader(), bytecode_cache(cache_dir))
+        for name in ("base.html", "lesson_reminder.html"):
+            warm.get_template(name)
+        assert os.listdir(cache_dir)
+
+        fresh = create_env(InlinedEmailLoader(), bytecode_cache(cache_dir))
+
+        def compile_again(*args, **kwargs):
+            pytest.fail("template compilato di nuovo nonostante la cache del bytecode")
+
+        monkeypatch.setattr(fresh, "compile", compile_again)
+        assert "Promemoria" in fresh.get_template("lesson_reminder.html").render(hours_before=1)
+
+    def test_assignment_notification_email_renders(self):
+        """Test that the new assignment email renders its template instead of the error fallback"""
+        email = email_service.assignment_notification_email(
+            to="studente@test.com", student_name="Mario", tutor_name="Anna",
+            assignment_title="Equazioni <2° grado>", due_date="05/03/2026"
+        )
+
+        assert "Error rendering template" not in email.html_content
+        assert "Equazioni &lt;2° grado&gt;" in email.html_content
+        assert "05/03/2026" in email.html_content and "Anna" in email.html_content
@@ -0,0 +1,94 @@
+import asyncio
+import json
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy.orm import undefer
+from app.models.lesson import Lesson, LessonStatus
+from app.models.user import User, Role
+from app.routers.video import stream_lesson_notes
+
+
+def _make_lesson(db_session):
+    users = []
+    for role in (Role.student, Role.tutor):
+        user = User(
+            email=f"{role.value}-{uuid.uuid4().hex[:8]}@test.com",
+            hashed_password="hashed_password",
+            role=role,
+            is_active=True
+        )
+        db_session.add(user)
+        users.append(user)
+    db_session.flush()
+    lesson = Lesson(
+        student_id=users[0].id,
+        tutor_id=users[1].id,
+        subject="Matematica",
+        start_at=datetime.utcnow() - timedelta(hours=1),
+        end_at=datetime.utcnow(),
+        status=LessonStatus.confirmed
+    )
+    db_session.add(lesson)
+    db_session.flush()
+    return lesson.id
+
+
+class FakeUpstream:
+    """Stream di token finto che registra la chiusura"""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.tokens:
+            raise StopAsyncIteration
+        await asyncio.sleep(0)
+        return self.tokens.pop(0)
+
+    async def aclose(self):
+        self.closed = True
+
+
+def _parse(event):
+    name, data = event.strip().split("\n")
+    return name.removeprefix("event: "), json.loads(data.removeprefix("data: "))
+
+
+class TestNotesStreaming:
+    def test_stream_relays_tokens_and_persists(self, db_session):
+        """Test that tokens are relayed as SSE and the final text is saved"""
+        lesson_id = _make_lesson(db_session)
+        upstream = FakeUpstream(["# Appunti", "\n", "\\( x^2 \\)"])
+
+        async def collect():
+            return [e async for e in stream_lesson_notes(lesson_id, upstream, lambda: db_session)]
+
+        events = [_parse(e) for e in asyncio.run(collect())]
+
+        assert [name for name, _ in events] == ["token", "token", "token", "done"]
+        assert events[2][1]["delta"] == "\\( x^2 \\)"
+        saved = db_session.query(Lesson).options(undefer(Lesson.notes_text)).get(lesson_id)
+        assert saved.notes_text == "# Appunti\n\\( x^2 \\)"
+        assert upstream.closed
+
+    def test_disconnect_closes_upstream_without_saving(self, db_session):
+        """Test that a client disconnect cancels the upstream call"""
+        lesson_id = _make_lesson(db_session)
+        upstream = FakeUpstream(["uno", "due", "tre"])
+
+        async def consume_one():
+            stream = stream_lesson_notes(lesson_id, upstream, lambda: db_session)
+            first = await stream.__anext__()
+            await stream.aclose()  # come fa Starlette alla disconnessione
+            return first
+
+        first = asyncio.run(consume_one())
+
+        assert _parse(first) == ("token", {"delta": "uno"})
+        assert upstream.closed
+        saved = db_session.query(Lesson).options(undefer(Lesson.notes_text)).get(lesson_id)
+        assert saved.notes_text is None
@@ -11,6 +11,10 @@ export interface AssignmentCreate {
   student_id: number;
 }
 
+export interface AssignmentBulkCreate extends Omit<AssignmentCreate, 'student_id'> {
+  student_ids: number[];
+}
+
 export interface AssignmentResponse {
   id: number;
   title: string;
@@ -29,6 +33,29 @@ export interface AssignmentResponse {
   submission_grade?: number;
 }
 
+export interface AssignmentGenerateRequest {
+  topic: string;
+  difficulty: string;
+  subject: string;
+  student_id: number;
+}
+
+export interface AssignmentDraft {
+  title: string;
+  description: string;
+  instructions: string;
+  solutions: string;
+}
+
+export interface AssignmentGenerateJob {
+  job_id?: string;
+  status: 'pending' | 'running' | 'completed' | 'failed';
+  draft?: AssignmentDraft;
+  error?: string;
+}
+
+const sleep = (ms: number) => new Promise(resolve => setTimeout(resolve, ms));
+
 export const assignmentApi = {
   // Crea un nuovo compito
   create: async (assignmentData: AssignmentCreate): Promise<AssignmentResponse> => {
@@ -38,6 +65,27 @@ export const assignmentApi = {
     return response.data;
   },
 
+  // Assegna lo stesso compito a più studenti con una sola richiesta
+  createBulk: async (assignmentData: AssignmentBulkCreate): Promise<AssignmentResponse[]> => {
+    console.log('📝 [AssignmentAPI] Creazione compito di classe:', assignmentData.student_ids.length, 'studenti');
+    const response = await apiClient.post('/assignments/bulk', assignmentData);
+    console.log('✅ [AssignmentAPI] Compiti creati:', response.data?.length);
+    return response.data || [];
+  },
+
+  // Genera una bozza AI: avvia un job in background e ne attende il risultato
+  generateDraft: async (payload: AssignmentGenerateRequest, timeoutMs = 90000): Promise<AssignmentDraft> => {
+    let { data: job } = await apiClient.post<AssignmentGenerateJob>('/assignments/generate/jobs', payload);
+    const deadline = Date.now() + timeoutMs;
+    while (job.status === 'pending' || job.status === 'running') {
+      if (Date.now() > deadline) throw new Error('Generazione AI scaduta, riprova');
+      await sleep(1500);
+      ({ data: job } = await apiClient.get<AssignmentGenerateJob>(`/assignments/generate/jobs/${job.job_id}`));
+    }
+    if (job.status !== 'completed' || !job.draft) throw new Error(job.error || 'Errore generazione AI');
+    return job.draft;
+  },
+
   // Ottieni i compiti per tutor
   getTutorAssignments: async (): Promise<AssignmentResponse[]> => {
     console.log('📝 [AssignmentAPI] Recupero compiti tutor');
@@ -10,6 +10,13 @@ export interface StudentLesson {
   tutor_name?: string;
   room_slug?: string;
   price?: number;
+  has_notes?: boolean;
+  notes_preview?: string;
+}
+
+export interface StudentLessonDetail extends StudentLesson {
+  notes_text?: string;
+  objectives?: string;
 }
 
 export interface StudentLessonsResponse {
@@ -46,6 +53,12 @@ export const studentApi = {
     }
   },
 
+  // Dettaglio lezione con appunti completi (le liste contengono solo l'anteprima)
+  getLesson: async (lessonId: number): Promise<StudentLessonDetail> => {
+    const response = await apiClient.get(`/lessons/${lessonId}`);
+    return response.data as StudentLessonDetail;
+  },
+
   // Ottieni i compiti dello studente (recenti)
   getAssignments: async (): Promise<StudentAssignment[]> => {
     const response = await apiClient.get('/assignments/student');
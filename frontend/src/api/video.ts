@@ -122,5 +122,58 @@ export const videoApi = {
   getNotes: async (lessonId: number): Promise<NotesState> => {
     const { data } = await apiClient.get(`/video/room/${lessonId}/notes`);
     return data;
+  },
+
+  /**
+   * Genera gli appunti finali in streaming (SSE): onDelta riceve i token man mano,
+   * onProgress l'avanzamento del riassunto per parti delle trascrizioni lunghe.
+   * Usa fetch perché axios nel browser non espone il body in streaming.
+   */
+  streamLessonNotes: async (
+    lessonId: number,
+    transcript: string,
+    onDelta: (delta: string) => void,
+    signal?: AbortSignal,
+    onProgress?: (progress: { stage: 'map' | 'reduce'; done: number; total: number }) => void
+  ): Promise<string> => {
+    const token = localStorage.getItem('token') || localStorage.getItem('access_token');
+    const response = await fetch(`${apiClient.defaults.baseURL}/video/generate-notes/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        ...(token ? { Authorization: `Bearer ${token}` } : {}),
+      },
+      body: JSON.stringify({ lesson_id: lessonId, transcript }),
+      signal,
+    });
+    if (!response.ok || !response.body) {
+      throw new Error(`Errore generazione appunti (${response.status})`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let notes = '';
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const raw = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        const event = raw.match(/^event: (.*)$/m)?.[1];
+        const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || '{}');
+        if (event === 'token') {
+          notes += data.delta;
+          onDelta(data.delta);
+        } else if (event === 'progress') {
+          onProgress?.(data);
+        } else if (event === 'error') {
+          throw new Error(data.detail || 'Errore generazione appunti');
+        }
+      }
+    }
+    return notes.trim();
   }
 };
@@ -757,14 +757,16 @@ const VideoRoom: React.FC = () => {
         
         // Genera appunti con OpenAI
         try {
-          console.log('📤 Invio richiesta a /video/generate-notes...');
-          const response = await apiClient.post('/video/generate-notes', {
-            lesson_id: Number(lessonId),
-            transcript: fullTranscript
+          console.log('📤 Invio richiesta a /video/generate-notes/stream...');
+          let streamed = '';
+          setGeneratedNotes('');
+          const result = await videoApi.streamLessonNotes(Number(lessonId), fullTranscript, (delta) => {
+            streamed += delta;
+            setGeneratedNotes(streamed);
+            setNotesEditable(streamed);
           });
           
-          console.log('📥 Risposta ricevuta:', response.data);
-          const notes = response.data?.notes || fullTranscript;
+          const notes = result || fullTranscript;
           setGeneratedNotes(notes);
           setNotesEditable(notes);
           setIsGeneratingNotes(false);
@@ -1191,8 +1193,8 @@ const VideoRoom: React.FC = () => {
                 </div>
               </div>
 
-              {/* Loading State */}
-              {isGeneratingNotes ? (
+              {/* Loading State: sparisce al primo token ricevuto in streaming */}
+              {isGeneratingNotes && !generatedNotes ? (
                 <div className="flex flex-col items-center justify-center py-20">
                   <div className="relative">
                     <div className="w-20 h-20 border-4 border-blue-200 border-t-blue-600 rounded-full animate-spin"></div>
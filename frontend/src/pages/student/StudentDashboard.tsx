@@ -38,7 +38,8 @@ interface Lesson {
   status: string;
   tutor_name: string;
   room_slug?: string;
-  notes_text?: string;
+  has_notes?: boolean;
+  notes_preview?: string;
 }
 
 interface Assignment {
@@ -63,6 +64,15 @@ const StudentDashboard: React.FC = () => {
     return user.first_name || user.email?.split('@')[0] || 'Utente';
   })();
 
+  const openNotes = async (lesson: Lesson) => {
+    try {
+      const detail = await studentApi.getLesson(lesson.id);
+      setSelectedNotes({lesson, notes: detail.notes_text || ''});
+    } catch (error) {
+      console.error('❌ Errore caricamento appunti:', error);
+    }
+  };
+
   const loadData = async () => {
       try {
         setLoading(true);
@@ -80,7 +90,8 @@ const StudentDashboard: React.FC = () => {
             status: lesson.status,
             tutor_name: lesson.tutor_name || 'Tutor',
             room_slug: lesson.room_slug,
-            notes_text: lesson.notes_text // Aggiunto per mostrare appunti
+            has_notes: lesson.has_notes,
+            notes_preview: lesson.notes_preview // Anteprima: il testo completo si carica on demand
           }));
           
           setUpcomingLessons(lessons);
@@ -469,10 +480,10 @@ const StudentDashboard: React.FC = () => {
               Appunti Recenti
             </h2>
             
-            {upcomingLessons.filter(l => l.status === 'completed' && l.notes_text).length > 0 ? (
+            {upcomingLessons.filter(l => l.status === 'completed' && l.has_notes).length > 0 ? (
               <div className="space-y-4 max-h-96 overflow-y-auto">
                 {upcomingLessons
-                  .filter(l => l.status === 'completed' && l.notes_text)
+                  .filter(l => l.status === 'completed' && l.has_notes)
                   .slice(0, 5)
                   .map((lesson: any) => (
                     <div key={lesson.id} className="bg-white/5 rounded-xl p-4 border border-white/10 hover:border-green-400/30 transition-all duration-300 cursor-pointer group">
@@ -490,10 +501,10 @@ const StudentDashboard: React.FC = () => {
                         </span>
                       </div>
                       <p className="text-white/70 text-sm line-clamp-2">
-                        {lesson.notes_text?.substring(0, 150)}...
+                        {lesson.notes_preview?.substring(0, 150)}...
                       </p>
                       <button 
-                        onClick={() => setSelectedNotes({lesson, notes: lesson.notes_text || ''})}
+                        onClick={() => openNotes(lesson)}
                         className="mt-3 text-green-400 text-sm hover:text-green-300 transition-colors flex items-center gap-1"
                       >
                         <span>Leggi appunti</span>
@@ -576,7 +576,7 @@ const AssignmentsPage: React.FC = () => {
                           try{
                             if (!selectedStudent) { alert('Seleziona uno studente'); return; }
                             setIsGenerating(true);
-                            const { data } = await apiClient.post('/assignments/generate', {
+                            const data = await assignmentApi.generateDraft({
                               topic: newAssignment.title || '',
                               difficulty: aiDifficulty,
                               subject: newAssignment.subject || 'Matematica',
@@ -597,7 +597,7 @@ const AssignmentsPage: React.FC = () => {
                             }
                           } catch (err:any) {
                             console.error('AI generate error', err);
-                            alert(err?.response?.data?.detail || 'Errore generazione AI');
+                            alert(err?.response?.data?.detail || err?.message || 'Errore generazione AI');
                           } finally { setIsGenerating(false); }
                         }}
                         className={`min-w-[150px] px-4 py-2 rounded-lg flex items-center justify-center gap-2 ${isGenerating? 'bg-white/20 text-white/60':'bg-purple-600 hover:bg-purple-700 text-white'}`}